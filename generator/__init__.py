@@ -34,6 +34,7 @@ pijnu
         pijnuparser.py (pijnu meta parser)
         pijnu.pijnu (pijnu meta grammar)
         pijnuActions.py (specific transformations)
+        ruleCode.py (rule functions for generated parsers)
 '''
 
 ### import/export
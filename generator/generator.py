@@ -31,6 +31,7 @@ Parser generator.
 '''
 
 ### import/export
+from hashlib import sha1
 from pijnu.library.tools import fileText, writeFile
 # pattern types for getPattern
 from pijnu.library.pattern import *
@@ -39,6 +40,8 @@ from pijnu.library.pattern import *
 from pijnuParser import pijnuParser
 # pattern objects to parse pattern format --> getPattern
 from pijnuParser import pattern, patternDef
+# rule functions --> makeParser(ruleFunctions=True)
+from ruleCode import ruleCode
 
 __all__ = ["getPattern","makeParser","fileText"]
 
@@ -80,8 +83,11 @@ def getPattern(format):
 
 #
 ### parser generator
-def makeParser(grammarText, feedback=False):
-    ''' Write parser code file. '''
+def makeParser(grammarText, feedback=False, ruleFunctions=False):
+    ''' Write parser code file.
+        ~ If ruleFunctions is set, the parser module also defines
+          one python function per rule, which the parser then uses
+          for match & parse (see module ruleCode). '''
     ''' example:
         from pijnu import makeParser, fileText
         parser = makeParser(fileText("foo.pijnu")) '''
@@ -104,6 +110,18 @@ def makeParser(grammarText, feedback=False):
     parserName = "%sParser" % grammarTitle
     topPatternName = tree.topPatternName
     filename = "%s.py" % parserName
+    # grammar digest, eg to key cached results --see library module cache
+    if isinstance(grammarText, unicode):
+        grammarHash = sha1(grammarText.encode("utf8")).hexdigest()
+    else:
+        grammarHash = sha1(grammarText).hexdigest()
+    # rule functions
+    if ruleFunctions:
+        rulesCode = ruleCode(tree.value, topPatternName)
+        rulesCode = '\n    %s\n\n    parser._setRules(rules_from_grammar())\n' \
+                    % '\n    '.join(rulesCode.splitlines())
+    else:
+        rulesCode = ''
 
     code = ('''%(definitionCopy)s
 from pijnu.library import *
@@ -133,13 +151,16 @@ def make_parser(actions=None):
     parser._setTopPattern("%(topPatternName)s")
     parser.grammarTitle = "%(grammarTitle)s"
     parser.filename = "%(filename)s"
-
+    parser.grammarHash = "%(grammarHash)s"
+%(rulesCode)s
     return parser\n''' %
     dict(definitionCopy='""" %s\n%s\n"""\n' % (grammarTitle, tree.definition),
          parserName=parserName,
          topPatternName=topPatternName,
          grammarTitle=grammarTitle,
          filename=filename,
+         grammarHash=grammarHash,
+         rulesCode=rulesCode,
          grammarCode='\n    '.join(tree.value.splitlines())))
 
     ### write parser module --possible feedback on stdout
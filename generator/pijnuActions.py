@@ -183,6 +183,20 @@ def repetitionCode(node):
 	node.value = "Repetition(%s, %s, expression=%s)" \
 					% (pattern, suffix, expr)
 
+def untilCode(node):
+	''' Change until node value to expr of repetition with stop condition. '''
+	# example: 	[a..z]+>"HALT"
+	# --> 		untilRepetition:[String(Klass(...), numMin=1,numMax=False)  Word("HALT")]
+	# --> 		Until(String(Klass(...), numMin=1,numMax=False), Word("HALT"))
+	#
+	# original format expr for pattern output
+	expr = repr(node.snippet)
+	# repetition, stop condition
+	(repetition,stop) = (node[0].value,node[1].value)
+	# new node value
+	node.value = "Until(%s, %s, expression=%s)" \
+					% (repetition, stop, expr)
+
 def lookaheadCode(node):
 	''' Change lookahead node value to lookahead expr. '''
 	# example: 	!"foo"
@@ -197,6 +211,17 @@ def lookaheadCode(node):
 	expr = repr(node.snippet)
 	node.value = "%s(%s, expression=%s)" % (lookaheadTyp,pattern,expr)
 
+def cutCode(node):
+	''' Change cut node value to cut expr. '''
+	# example: 	^
+	# --> 		CUT:^
+	# --> 		Cut(expression='^')
+	#
+	# new node value
+	# original format expr for pattern output
+	expr = repr(node.snippet)
+	node.value = "Cut(expression=%s)" % expr
+
 ### combination: sequence & choice
 def sequenceCode(node):
 	''' Change sequence node value to Sequence() expr. '''
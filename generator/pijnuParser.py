@@ -293,9 +293,12 @@ if True:	### tokens
 	ONEORMORE = Char('+')
 	LREPETE = Char('{')(drop)
 	RREPETE = Char('}')(drop)
+	UNTIL = Char('>')(drop)
 	OPTION = Char('?')(drop)
 	NEXT = Char('&')(drop)
 	NEXTNOT = Char('!')(drop)
+	# commit point
+	CUT = Char('^')
 	# major combination
 	LGROUP = Sequence([LPAREN, DROPSPACING])(drop)
 	RGROUP = Sequence([DROPSPACING, RPAREN])(drop)
@@ -345,7 +348,7 @@ if True:	### pattern definition
 	#@@ group recursion here @@
 	item = Choice([group, klass, word, char, name])
 
-	## affix term: lookahead, option, repetition
+	## affix term: lookahead, option, repetition + until
 	# option
 	option = Sequence([item, OPTION])(optionCode)
 	# numbered repetition {n} or {m..} or {m..n}
@@ -359,13 +362,17 @@ if True:	### pattern definition
 #~ 	genRepetition = Sequence([item, repetSuffix])(repetitionCode)
 #~ 	repetition = Choice([stringRepetition, genRepetition])
 	repetition = Sequence([item, repetSuffix])(repetitionCode)
+	# ...with possible until stop condition
+	untilRepetition = Sequence([repetition, UNTIL, item])(untilCode)
 	# lookahead
-	lookSuite = Choice([repetition, option, item])
+	lookSuite = Choice([untilRepetition, repetition, option, item])
 	next = Sequence([NEXT, lookSuite])
 	nextNot = Sequence([NEXTNOT, lookSuite])
 	lookahead = Choice([nextNot, next])(liftValue, lookaheadCode)
+	# cut
+	cut = copy(CUT)(cutCode)
 	# item --> term
-	term = Choice([lookahead, repetition, option, item])
+	term = Choice([lookahead, untilRepetition, repetition, option, item, cut])
 
 	## format: term combination
 	# group>format>term>item>   circular recursion
@@ -0,0 +1,507 @@
+# -*- coding: utf8 -*-
+
+'''
+© 2009 Denis Derman (former developer) <denis.spir@gmail.com>
+© 2011 Peter Potrowl (current developer) <peter017@gmail.com>
+
+This file is part of PIJNU.
+
+PIJNU is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PIJNU is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PIJNU: see the file called 'GPL'.
+If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+Rule code
+
+Writes, for a generated parser, one python function per grammar rule.
+~ Terminals (word, char, klass, string) are inlined as string operations,
+  and patterns lowered to a regex (see library module analysis)
+  as a single regex match.
+~ Sequences, choices, options, lookaheads & repetitions are written
+  as straight-line code instead of walking the pattern graph.
+~ Named, recursive & shared patterns get their own function,
+  as well as patterns that may be checked twice at the same position
+  (see library module analysis). The latter memoize their results
+  per position like _memoCheck does.
+~ Rule functions return a node or None: on failure, the parser
+  falls back to its patterns to yield detailed errors.
+~ Nodes are built from the parser's own pattern objects,
+  so that trees & match actions are the same.
+'''
+
+### import/export
+from pijnu.library import *
+import pijnu.library as library
+from pijnu.library.analysis import selectMemo, selectRegex
+
+__all__ = ["ruleCode"]
+
+# Max nesting of inlined compound patterns inside a rule function:
+# deeper ones get their own function
+# (python allows at most 20 statically nested blocks).
+MAX_DEPTH = 12
+INDENT = "    "
+# Patterns checking a single position are cheaper to check again
+# than to memoïze: they are inlined anyway.
+SINGLE = (Word, Char, Klass, AnyChar)
+
+
+class Toolset(dict):
+    ''' toolset stand-in used to build the pattern graph
+        ~ Actions passed to make_parser are not known yet:
+          any missing one is replaced by a no-op.
+    '''
+    def __missing__(self, name):
+        return noAction
+
+
+def noAction(node):
+    pass
+
+
+def grammarPatterns(grammarCode):
+    ''' Build the patterns defined by grammar code.
+        Return {name:pattern} for the grammar's own patterns.
+    '''
+    scope = dict(vars(library))
+    libraryNames = set(scope)
+    scope["toolset"] = Toolset(scope)
+    scope["actions"] = {}
+    scope["parser"] = Parser()
+    scope["state"] = scope["parser"].state
+    exec grammarCode in scope
+    return dict((name, obj) for (name, obj) in scope.items()
+                if isinstance(obj, Pattern) and name not in libraryNames)
+
+
+def subPatterns(pattern):
+    ''' Return [(path, sub-pattern)] for pattern, where path is
+        the attribute expression reaching sub-pattern from pattern.
+    '''
+    if isinstance(pattern, (Sequence, Choice)):
+        return [(".patterns[%s]" % i, p)
+                for (i, p) in enumerate(pattern.patterns)]
+    if isinstance(pattern, (Option, Next, NextNot,
+                            ZeroOrMore, OneOrMore, Repetition, Recursive)):
+        return [(".pattern", pattern.pattern)]
+    if isinstance(pattern, Until):
+        return [(".pattern", pattern.pattern), (".stop", pattern.stop)]
+    return []
+
+
+class RuleCoder(object):
+    ''' Writer of rule functions for a pattern graph.
+        ~ Generated code's result is always in variable 'r'.
+        ~ Each inlined compound pattern numbers its own variables.
+    '''
+    def __init__(self, patterns, topPatternName):
+        ''' Walk the pattern graph from top pattern:
+            record paths to patterns & count references. '''
+        self.names = {}
+        for (name, pattern) in patterns.items():
+            self.names.setdefault(id(pattern), name)
+        top = patterns[topPatternName]
+        selectMemo(top)
+        if Parser.LOWER_REGEX:
+            selectRegex(top)
+        # paths & references
+        self.patterns = [top]
+        self.paths = {id(top): topPatternName}
+        self.refs = {id(top): 1}
+        stack = [top]
+        while stack:
+            pattern = stack.pop()
+            for (path, sub) in subPatterns(pattern):
+                key = id(sub)
+                self.refs[key] = self.refs.get(key, 0) + 1
+                if key in self.paths:
+                    continue
+                self.paths[key] = self.names.get(key,
+                                    self.paths[id(pattern)] + path)
+                self.patterns.append(sub)
+                stack.append(sub)
+        # patterns coded as functions, in order
+        self.functions = {}
+        self.queue = []
+        for pattern in self.patterns:
+            key = id(pattern)
+            if (key in self.names or self.refs[key] > 1
+                    or isinstance(pattern, Recursive)
+                    or (pattern.memoize and not isinstance(pattern, SINGLE))):
+                self._function(pattern)
+        # module-level objects needed by code
+        self.bindings = {}
+        self.count = 0
+
+    def _function(self, pattern):
+        ''' Return name of the function matching pattern. '''
+        key = id(pattern)
+        if key not in self.functions:
+            self.functions[key] = "_rule%s" % len(self.functions)
+            self.queue.append(pattern)
+        return self.functions[key]
+
+    def _ref(self, pattern):
+        ''' Return name of variable referencing pattern in code. '''
+        key = id(pattern)
+        if key not in self.bindings:
+            self.bindings[key] = ("_pattern%s" % len(self.bindings),
+                                  self.paths[key], pattern)
+        return self.bindings[key][0]
+
+    def _charset(self, pattern):
+        ''' Return name of variable holding pattern's charset. '''
+        name = "_charset%s" % self._ref(pattern)[len("_pattern"):]
+        return name
+
+    def _regex(self, pattern):
+        ''' Return name of variable holding pattern's regex match method. '''
+        name = "_regex%s" % self._ref(pattern)[len("_pattern"):]
+        return name
+
+    def _ascii(self, pattern):
+        ''' Return name of variable holding pattern's ascii char set. '''
+        name = "_ascii%s" % self._ref(pattern)[len("_pattern"):]
+        return name
+
+    def code(self):
+        ''' Return code of func rules_from_grammar. '''
+        functionLines = []
+        i = 0
+        while i < len(self.queue):
+            pattern = self.queue[i]
+            functionLines += self._functionLines(pattern)
+            i += 1
+        # bind patterns & charsets
+        lines = ['def rules_from_grammar():',
+                 INDENT + '"""Return functions matching the grammar\'s rules."""',
+                 INDENT + 'NIL = Node.NIL']
+        bindings = sorted(self.bindings.values(),
+                          key=lambda binding: int(binding[0][len("_pattern"):]))
+        if any(pattern.regex is not None for (_, _, pattern) in bindings):
+            lines.append(INDENT + "import re")
+        for (name, path, pattern) in bindings:
+            lines.append(INDENT + "%s = %s" % (name, path))
+            if pattern.regex is not None:
+                lines.append(INDENT + "%s = re.compile(%r, re.DOTALL).match"
+                             % (self._regex(pattern), pattern.regex.source))
+            if isinstance(pattern, (Klass, String)):
+                lines.append(INDENT + "%s = %s.charset"
+                             % (self._charset(pattern), name))
+                lines.append(INDENT + "%s = %s.ascii"
+                             % (self._ascii(pattern), self._charset(pattern)))
+        lines.append("")
+        lines += [INDENT + line if line else line for line in functionLines]
+        # rules by name
+        rules = ["%r: %s" % (self.names[id(p)], self.functions[id(p)])
+                 for p in self.queue if id(p) in self.names]
+        lines.append(INDENT + "return {%s}" % (",\n" + 2 * INDENT).join(rules))
+        return '\n'.join(lines)
+
+    def _functionLines(self, pattern):
+        ''' Code of function matching pattern, with memo. '''
+        name = self.names.get(id(pattern), self.paths[id(pattern)])
+        lines = ["def %s(source, pos, memo):" % self._function(pattern),
+                 INDENT + "# %s" % name]
+        if pattern.memoize:
+            lines += [INDENT + "table = memo[%r]" % self._function(pattern),
+                      INDENT + "if pos in table:",
+                      2 * INDENT + "return table[pos]"]
+        lines.append(INDENT + "length = len(source)")
+        self._body(pattern, "pos", 0, 1, lines)
+        if pattern.memoize:
+            lines.append(INDENT + "table[pos] = r")
+        lines += [INDENT + "return r",
+                  ""]
+        return lines
+
+    ### pattern code
+    def _check(self, pattern, pos, depth, level, lines):
+        ''' Code matching pattern at pos: call or inline. '''
+        key = id(pattern)
+        if key not in self.functions and depth >= MAX_DEPTH \
+                and subPatterns(pattern):
+            self._function(pattern)
+        if key in self.functions:
+            lines.append(level * INDENT + "r = %s(source, %s, memo)"
+                         % (self.functions[key], pos))
+        else:
+            self._body(pattern, pos, depth, level, lines)
+
+    def _node(self, pattern, args, level, lines):
+        ''' Code creating node for pattern: actions may invalidate it. '''
+        code = "r = Node(%s, %s, source)" % (self._ref(pattern), args)
+        if pattern.actions is None:
+            lines.append(level * INDENT + code)
+        else:
+            lines += [level * INDENT + "try:",
+                      (level + 1) * INDENT + code,
+                      level * INDENT + "except Invalidation:",
+                      (level + 1) * INDENT + "r = None"]
+
+    def _actions(self, pattern, level, lines):
+        ''' Code applying choice's actions to child node r, inside
+            the loop on alternatives: done if they do not invalidate it,
+            else next alternative. '''
+        lines += [level * INDENT + "if r is not None:",
+                  (level + 1) * INDENT + "try:",
+                  (level + 2) * INDENT + "r.doActions(%s.actions)"
+                                          % self._ref(pattern),
+                  (level + 2) * INDENT + "break",
+                  (level + 1) * INDENT + "except Invalidation:",
+                  (level + 2) * INDENT + "r = None"]
+
+    def _body(self, pattern, pos, depth, level, lines):
+        ''' Inline code matching pattern at pos. '''
+        ind = level * INDENT
+        self.count += 1
+        n = self.count
+        # lowered patterns: nil node on empty match
+        # (strings: at end of text only, as when not lowered)
+        if pattern.regex is not None:
+            lines += [ind + "r = None",
+                      ind + "m = %s(source, %s)" % (self._regex(pattern), pos),
+                      ind + "if m is not None:",
+                      ind + INDENT + "e = m.end()"]
+            empty = "%s < length" % pos if type(pattern) is String \
+                    else "e > %s" % pos
+            self._node(pattern, "source[%s:e] if %s else NIL, %s, e"
+                                % (pos, empty, pos), level + 1, lines)
+        # terminals
+        elif isinstance(pattern, Word):
+            word = pattern.word
+            test = "source.startswith(%r, %s)" % (word, pos) if word \
+                    else "%s < length" % pos
+            lines += [ind + "r = None",
+                      ind + "if %s:" % test]
+            self._node(pattern, "%r, %s, %s + %s" % (word, pos, pos, len(word)),
+                       level + 1, lines)
+        elif isinstance(pattern, Char):
+            lines += [ind + "r = None",
+                      ind + "if %s < length and source[%s] == %r:"
+                            % (pos, pos, pattern.char)]
+            self._node(pattern, "%r, %s, %s + 1" % (pattern.char, pos, pos),
+                       level + 1, lines)
+        elif isinstance(pattern, Klass):
+            lines += [ind + "r = None",
+                      ind + "if %s < length:" % pos,
+                      ind + INDENT + "c = source[%s]" % pos,
+                      ind + INDENT + "if c in %s or (c > '\\x7f' and c in %s):"
+                                     % (self._ascii(pattern),
+                                        self._charset(pattern))]
+            self._node(pattern, "c, %s, %s + 1" % (pos, pos), level + 2, lines)
+        elif isinstance(pattern, String):
+            numMin, numMax = pattern.numMin, pattern.numMax
+            stop = "min(%s + %s, length)" % (pos, numMax) if numMax \
+                    else "length"
+            lines += [ind + "r = None",
+                      ind + "if %s >= length:" % pos]
+            if numMin:
+                lines.append(ind + INDENT + "pass")
+            else:
+                self._node(pattern, "NIL, %s, %s" % (pos, pos), level + 1, lines)
+            lines += [ind + "else:",
+                      ind + INDENT + "e = %s.span(source, %s, %s)"
+                                     % (self._charset(pattern), pos, stop)]
+            if numMin:
+                lines.append(ind + INDENT + "if e - %s >= %s:" % (pos, numMin))
+                self._node(pattern, "source[%s:e], %s, e" % (pos, pos),
+                           level + 2, lines)
+            else:
+                self._node(pattern, "source[%s:e], %s, e" % (pos, pos),
+                           level + 1, lines)
+        elif isinstance(pattern, AnyChar):
+            # AnyChar.KLASS is only known at match time
+            lines += [ind + "r = None",
+                      ind + "if %s < length:" % pos,
+                      ind + INDENT + "KLASS = AnyChar.KLASS",
+                      ind + INDENT + "if KLASS is None:"]
+            self._node(pattern, "source[%s], %s, %s + 1" % (pos, pos, pos),
+                       level + 2, lines)
+            lines += [ind + INDENT + "elif source[%s] in KLASS.charset:" % pos,
+                      ind + 2 * INDENT + "try:",
+                      ind + 3 * INDENT + "r = Node(KLASS, source[%s], %s, %s + 1, "
+                                         "source)" % (pos, pos, pos),
+                      ind + 2 * INDENT + "except Invalidation:",
+                      ind + 3 * INDENT + "r = None"]
+        # combinations
+        elif isinstance(pattern, Sequence):
+            (children, end) = ("c%s" % n, "q%s" % n)
+            lines += [ind + "%s = Nodes()" % children,
+                      ind + "%s = %s" % (end, pos),
+                      ind + "while True:"]
+            for sub in pattern.patterns:
+                self._check(sub, end, depth + 1, level + 1, lines)
+                lines += [ind + INDENT + "if r is None:",
+                          ind + 2 * INDENT + "break",
+                          ind + INDENT + "%s.append(r)" % children,
+                          ind + INDENT + "%s = r.end" % end]
+            self._node(pattern, "%s, %s, %s" % (children, pos, end),
+                       level + 1, lines)
+            lines.append(ind + INDENT + "break")
+        elif isinstance(pattern, Choice):
+            lines.append(ind + "while True:")
+            last = len(pattern.patterns) - 1
+            for (number, sub) in enumerate(pattern.patterns):
+                self._check(sub, pos, depth + 1, level + 1, lines)
+                if pattern.actions is not None:
+                    self._actions(pattern, level + 1, lines)
+                elif number < last:
+                    lines += [ind + INDENT + "if r is not None:",
+                              ind + 2 * INDENT + "break"]
+            lines.append(ind + INDENT + "break")
+        elif isinstance(pattern, Option):
+            self._check(pattern.pattern, pos, depth + 1, level, lines)
+            lines.append(ind + "if r is None:")
+            self._node(pattern, "NIL, %s, %s" % (pos, pos), level + 1, lines)
+            if pattern.actions is not None:
+                lines += [ind + "else:",
+                          ind + INDENT + "try:",
+                          ind + 2 * INDENT + "r.doActions(%s.actions)"
+                                             % self._ref(pattern),
+                          ind + INDENT + "except Invalidation:",
+                          ind + 2 * INDENT + "r = None"]
+        elif isinstance(pattern, Next):
+            self._check(pattern.pattern, pos, depth + 1, level, lines)
+            lines.append(ind + "if r is not None:")
+            self._node(pattern, "NIL, %s, %s" % (pos, pos), level + 1, lines)
+        elif isinstance(pattern, NextNot):
+            self._check(pattern.pattern, pos, depth + 1, level, lines)
+            lines.append(ind + "if r is None:")
+            self._node(pattern, "NIL, %s, %s" % (pos, pos), level + 1, lines)
+            lines += [ind + "else:",
+                      ind + INDENT + "r = None"]
+        # repetitions
+        elif isinstance(pattern, (ZeroOrMore, OneOrMore, Repetition)):
+            if isinstance(pattern, Repetition):
+                (numMin, numMax) = (pattern.numMin, pattern.numMax)
+            else:
+                (numMin, numMax) = (isinstance(pattern, OneOrMore), False)
+            (children, end) = ("c%s" % n, "q%s" % n)
+            lines += [ind + "%s = Nodes()" % children,
+                      ind + "%s = %s" % (end, pos),
+                      ind + "while True:"]
+            self._check(pattern.pattern, end, depth + 1, level + 1, lines)
+            lines += [ind + INDENT + "if r is None:",
+                      ind + 2 * INDENT + "break",
+                      ind + INDENT + "%s.append(r)" % children,
+                      ind + INDENT + "%s = r.end" % end]
+            if numMax:
+                lines += [ind + INDENT + "if len(%s) == %s:" % (children, numMax),
+                          ind + 2 * INDENT + "break"]
+            if numMin:
+                lines += [ind + "r = None",
+                          ind + "if len(%s) >= %s:" % (children, numMin)]
+                self._node(pattern, "%s, %s, %s" % (children, pos, end),
+                           level + 1, lines)
+            else:
+                self._node(pattern, "%s, %s, %s" % (children, pos, end),
+                           level, lines)
+        elif isinstance(pattern, Until):
+            self._until(pattern, pos, depth, level, lines)
+        elif isinstance(pattern, Recursive):
+            # the recursive wrapper simply returns wrapped pattern's node
+            self._check(pattern.pattern, pos, depth + 1, level, lines)
+        elif isinstance(pattern, Cut):
+            message = "Rule functions do not support cut patterns."
+            raise PijnuError(message)
+        # other pattern types: use their own check
+        else:
+            lines += [ind + "try:",
+                      ind + INDENT + "r = %s._realCheck(source, %s)"
+                                     % (self._ref(pattern), pos),
+                      ind + "except Invalidation:",
+                      ind + INDENT + "r = None",
+                      ind + "if not isinstance(r, Node):",
+                      ind + INDENT + "r = None"]
+
+    def _until(self, pattern, pos, depth, level, lines):
+        ''' Inline code matching until pattern at pos:
+            ~ a string jumps to the stop, found by the pattern itself
+              (next literal stop, or run of klass chars minus stop's)
+            ~ else stop is tried before each repeated item.
+        '''
+        ind = level * INDENT
+        n = self.count
+        (value, end, stop) = ("c%s" % n, "q%s" % n, "s%s" % n)
+        repetition = pattern.pattern
+        (numMin, numMax) = (pattern.numMin, pattern.numMax)
+        isString = isinstance(repetition, String)
+        if isString and (pattern.words is not None
+                         or pattern.charset is not None):
+            limit = "min(%s + %s, length)" % (pos, numMax) if numMax \
+                    else "length"
+            if pattern.words is not None:
+                limit = "min(%s, %s._next(source, %s))" \
+                        % (limit, self._ref(pattern), pos)
+                charset = self._charset(repetition)
+            else:
+                charset = "%s.charset" % self._ref(pattern)
+            lines.append(ind + "%s = %s.span(source, %s, %s)"
+                               % (end, charset, pos, limit))
+            count = "%s - %s" % (end, pos)
+        else:
+            lines += [ind + "%s = Nodes()" % value,
+                      ind + "%s = %s" % (end, pos),
+                      ind + "while True:"]
+            if numMax:
+                count = "%s - %s" % (end, pos) if isString \
+                        else "len(%s)" % value
+                lines += [ind + INDENT + "if %s == %s:" % (count, numMax),
+                          ind + 2 * INDENT + "break"]
+            self._check(pattern.stop, end, depth + 1, level + 1, lines)
+            lines += [ind + INDENT + "if r is not None:",
+                      ind + 2 * INDENT + "break"]
+            if isString:
+                charset = self._charset(repetition)
+                lines += [ind + INDENT + "if %s >= length or source[%s] "
+                                         "not in %s:" % (end, end, charset),
+                          ind + 2 * INDENT + "break",
+                          ind + INDENT + "%s += 1" % end]
+            else:
+                self._check(pattern.item, end, depth + 1, level + 1, lines)
+                lines += [ind + INDENT + "if r is None:",
+                          ind + 2 * INDENT + "break",
+                          ind + INDENT + "%s.append(r)" % value,
+                          ind + INDENT + "%s = r.end" % end]
+            count = "%s - %s" % (end, pos) if isString else "len(%s)" % value
+        if isString:
+            lines.append(ind + "%s = source[%s:%s] if %s > %s else NIL"
+                               % (value, pos, end, end, pos))
+        lines.append(ind + "r = None")
+        if numMin:
+            lines.append(ind + "if %s >= %s:" % (count, numMin))
+            (level, ind) = (level + 1, ind + INDENT)
+        self._check(pattern.stop, end, depth + 1, level, lines)
+        lines += [ind + "if r is not None:",
+                  ind + INDENT + "%s = r" % stop,
+                  ind + INDENT + "try:",
+                  ind + 2 * INDENT + "r = Node(%s, Nodes(Node(%s, %s, %s, %s, "
+                                     "source), %s), %s, %s.end, source)"
+                                     % (self._ref(pattern),
+                                        self._ref(repetition), value, pos,
+                                        end, stop, pos, stop),
+                  ind + INDENT + "except Invalidation:",
+                  ind + 2 * INDENT + "r = None"]
+
+
+def ruleCode(grammarCode, topPatternName):
+    ''' Return code of func rules_from_grammar, which returns
+        {name:function} for the rules of the grammar defined by code.
+        ~ A rule function is called as f(source, pos, memo),
+          where memo maps function names to {pos:result} tables.
+        ~ It returns the rule's node at pos, or None.
+    '''
+    patterns = grammarPatterns(grammarCode)
+    return RuleCoder(patterns, topPatternName).code()
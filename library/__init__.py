@@ -32,10 +32,22 @@ dependance structure:
         tools.py (used everywhere)
         library
             parser.py
+            machine.py (compiled engine)
+            tree.py (parse tree as parallel arrays)
+            batch.py (parsing in worker processes)
+            binary.py (compact binary node trees)
+            cache.py (persistent parse results)
+            incremental.py (reparse after an edit)
+            tail.py (parse text appended to a growing source)
+            push.py (parse a source pushed in chunks)
+            analysis.py (pattern graph analysis)
             pattern.py
                 node.py (includes builtin transform funcs)
                 error.py (pijnu exception classes)
                 charset.py (parse Klass expression)
+                memo.py (compact memo tables)
+                charmap.py (klass rows per source)
+                context.py (parse state, per thread)
             preprocess.py
 
         generator <-- library
@@ -45,4 +57,12 @@ dependance structure:
 # pattern imports node & error
 from pattern import *           # pattern types & match checking methods
 from parser import Parser       # Parser type
+from context import ParseContext # parse state
+from machine import Machine     # compiled engine
+from tree import Tree, TreeNode # parse tree as parallel arrays
+from batch import ParseResult, BatchStats   # batch parsing results
+import binary                   # binary.dumps & loads of node trees
+from cache import ParseCache    # persistent parse results
+from tail import TailParser     # parse of appended text
+from push import PushParser     # parse of pushed chunks
 from preprocess import *        # builtin preprocessing funcs
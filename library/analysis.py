@@ -0,0 +1,481 @@
+# -*- coding: utf8 -*-
+
+'''
+© 2009 Denis Derman (former developer) <denis.spir@gmail.com>
+© 2011 Peter Potrowl (current developer) <peter017@gmail.com>
+
+This file is part of PIJNU.
+
+PIJNU is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PIJNU is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PIJNU: see the file called 'GPL'.
+If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+Analysis
+
+Static analysis of a parser's pattern graph.
+
+~ graphOf: flat list of the patterns of a graph, walked once
+  (a parser keeps it as its pattern registry); the passes below
+  run over this list.
+
+~ selectMemo: find which patterns may be checked twice
+  at the same position during a parse; only these ones need
+  packrat memoïzation -- the others set memoize=False
+  and _memoCheck calls _realCheck directly for them.
+
+A pattern is tried several times at the same position only if:
+    ~ it is referenced by several wrapping patterns
+      (or several times by the same one), or
+    ~ it is reached at a variable offset from its wrapping pattern,
+      so that trials of the latter at different positions may
+      lead to the same position for the former:
+      repeted pattern, or item of a sequence following a pattern
+      with variable match length.
+Otherwise, it is tried once per trial of its (only) wrapping pattern,
+always at the same offset -- and the latter is itself either memoïzed
+or tried once per position.
+
+~ selectDispatch: compute, for each choice, which alternatives
+  may match at a position according to the char found there
+  (FIRST sets); Choice._realCheck then skips the other ones.
+  Order of alternatives is kept: this is still a PEG ordered choice.
+
+An alternative is always tried when it may match without consuming
+any char (nullable), or when its first char is unknown:
+any char (AnyChar), cut, recursion loop or unknown pattern type.
+Tables only hold ascii chars (which are the same as str & unicode);
+all alternatives are tried for other chars.
+
+~ selectRegex: lower regular sub-graphs to compiled regexes;
+  _memoCheck then matches them with a single regex.match call.
+
+A pattern is lowered when its match result is a plain string:
+    ~ a String: its node value is the run of matched chars
+    ~ a sequence, choice, option, repetition or until whose first action
+      is join or restore, and whose whole sub-graph is made only of
+      words, chars, klasses, strings, AnyChar (without KLASS),
+      lookaheads & the above combinations, none having actions
+      but join (so that no action may transform or invalidate
+      a sub-node: join only turns it into its own matched text).
+      Inside lookaheads, nodes are dropped: standard actions
+      (from module node) are allowed, since they never invalidate.
+Node values then stay the same: the node is simply built from
+the matched text (its form too, which was the child nodes).
+PEG semantics are kept: ordered choices, options & repetitions
+never backtrack once matched, so they are written as atomic groups
+(?=(?P<gN>...))(?P=gN) unless nothing follows them in the regex.
+On failure, the pattern is checked again as usual, so that failures
+recorded for error messages stay the same
+(not inside lookaheads, where failures are not recorded).
+'''
+
+### import/export
+import re
+from pattern import *
+from charset import regexChar
+import node
+from node import join, restore
+
+__all__ = ["graphOf", "selectMemo", "fixedLength", "firstSet", "selectDispatch",
+           "regexOf", "selectRegex", "Regex"]
+
+
+def fixedLength(pattern):
+    ''' Length of any match of pattern, or None if it may vary.
+        ~ Recursive patterns are not looked into (avoids cycles).
+    '''
+    if isinstance(pattern, Word):
+        return pattern.length
+    if isinstance(pattern, (Char, Klass, AnyChar)):
+        return 1
+    if isinstance(pattern, (Next, NextNot, Cut)):
+        return 0
+    if isinstance(pattern, String):
+        if pattern.numMax and pattern.numMin == pattern.numMax:
+            return pattern.numMax
+        return None
+    if isinstance(pattern, Sequence):
+        lengths = [fixedLength(p) for p in pattern.patterns]
+        if None in lengths:
+            return None
+        return sum(lengths)
+    if isinstance(pattern, Choice):
+        lengths = set(fixedLength(p) for p in pattern.patterns)
+        if len(lengths) == 1:
+            return lengths.pop()
+        return None
+    if isinstance(pattern, Repetition):
+        if pattern.numMax and pattern.numMin == pattern.numMax:
+            length = fixedLength(pattern.pattern)
+            if length is not None:
+                return length * pattern.numMax
+        return None
+    return None
+
+
+def subPatterns(pattern):
+    ''' Return [(sub-pattern, isFixedOffset)] for pattern's wrapped patterns.
+        A sub-pattern has a fixed offset if it is always checked
+        at the same distance from pattern's own position.
+    '''
+    # sequence: offset is fixed while previous items' lengths are
+    if isinstance(pattern, Sequence):
+        subs = []
+        offset = 0
+        for sub in pattern.patterns:
+            subs.append((sub, offset is not None))
+            if offset is not None:
+                length = fixedLength(sub)
+                offset = None if length is None else offset + length
+        return subs
+    # wrapped pattern checked at pattern's own position
+    if isinstance(pattern, (Choice, Option, Next, NextNot,
+                            Recursive, AnyChar)):
+        return [(sub, True) for sub in pattern.wrapped]
+    # until: repetition's items & stop are checked all along
+    if isinstance(pattern, Until):
+        return [(pattern.pattern, True), (pattern.stop, False)]
+    # repetitions & unknown pattern types
+    return [(sub, False) for sub in pattern.wrapped]
+
+
+def graphOf(topPattern):
+    ''' Return the list of patterns in top pattern's graph,
+        top pattern first (each one once, whatever its references).
+    '''
+    patterns = [topPattern]
+    seen = set([id(topPattern)])
+    i = 0
+    while i < len(patterns):
+        pattern = patterns[i]
+        i += 1
+        for (sub, isFixedOffset) in subPatterns(pattern):
+            if id(sub) not in seen:
+                seen.add(id(sub))
+                patterns.append(sub)
+    return patterns
+
+
+def selectMemo(topPattern, patterns=None):
+    ''' Set memoize flag on every pattern of top pattern's graph:
+        True only for patterns that may be checked twice
+        at the same position (see module doc).
+        Return the list of patterns in graph.
+        ~ patterns: graph already walked, if any --see graphOf
+    '''
+    if patterns is None:
+        patterns = graphOf(topPattern)
+    refs = {}
+    varying = set()
+    for pattern in patterns:
+        for (sub, isFixedOffset) in subPatterns(pattern):
+            key = id(sub)
+            refs[key] = refs.get(key, 0) + 1
+            if not isFixedOffset:
+                varying.add(key)
+    for pattern in patterns:
+        key = id(pattern)
+        pattern.memoize = refs.get(key, 0) > 1 or key in varying
+    return patterns
+
+
+def _first(pattern, visiting):
+    ''' (chars, nullable) for pattern: the set of chars a match may start
+        with (None if unknown/any), & whether it may match empty.
+    '''
+    if isinstance(pattern, Word):
+        if pattern.word:
+            return (set(pattern.word[0]), False)
+        return (set(), True)
+    if isinstance(pattern, Char):
+        return (set(pattern.char), False)
+    if isinstance(pattern, Klass):
+        return (set(pattern.charset.latin()), False)
+    if isinstance(pattern, String):
+        return (set(pattern.charset.latin()), not pattern.numMin)
+    # lookaheads do not consume: they are transparent
+    if isinstance(pattern, (Next, NextNot)):
+        return (set(), True)
+    if isinstance(pattern, (Sequence, Until)):
+        subs = pattern.patterns if isinstance(pattern, Sequence) \
+               else [pattern.pattern, pattern.stop]
+        chars = set()
+        for sub in subs:
+            (subChars, nullable) = _first(sub, visiting)
+            if subChars is None:
+                return (None, nullable)
+            chars |= subChars
+            if not nullable:
+                return (chars, False)
+        return (chars, True)
+    if isinstance(pattern, Choice):
+        (chars, nullable) = (set(), False)
+        for sub in pattern.patterns:
+            (subChars, subNullable) = _first(sub, visiting)
+            if subChars is None:
+                return (None, True)
+            chars |= subChars
+            nullable = nullable or subNullable
+        return (chars, nullable)
+    if isinstance(pattern, (Option, ZeroOrMore)):
+        return (_first(pattern.pattern, visiting)[0], True)
+    if isinstance(pattern, OneOrMore):
+        return _first(pattern.pattern, visiting)
+    if isinstance(pattern, Repetition):
+        (chars, nullable) = _first(pattern.pattern, visiting)
+        return (chars, nullable or not pattern.numMin)
+    if isinstance(pattern, Recursive) and pattern.isDefined:
+        if pattern in visiting:
+            return (None, True)
+        visiting.add(pattern)
+        result = _first(pattern.pattern, visiting)
+        visiting.remove(pattern)
+        return result
+    # AnyChar, Cut, unknown pattern types
+    return (None, True)
+
+
+def firstSet(pattern):
+    ''' Set of chars a match of pattern must start with,
+        or None if pattern may match empty, or first char is unknown.
+    '''
+    (chars, nullable) = _first(pattern, set())
+    if chars is None or nullable:
+        return None
+    return frozenset(chars)
+
+
+def selectDispatch(topPattern, patterns=None):
+    ''' Set dispatch tables on every choice of top pattern's graph
+        (see module doc):
+        ~ dispatch: {char:alternatives} for ascii chars,
+          or None if no alternative can ever be skipped
+        ~ dispatchEnd: alternatives to try at end of source
+        Return the list of patterns in graph.
+        ~ patterns: graph already walked, if any --see graphOf
+    '''
+    if patterns is None:
+        patterns = graphOf(topPattern)
+    for pattern in patterns:
+        if isinstance(pattern, Choice):
+            _setDispatch(pattern)
+    return patterns
+
+
+def _setDispatch(choice):
+    ''' Set dispatch tables on choice. '''
+    alternatives = tuple(choice.patterns)
+    firsts = [firstSet(alternative) for alternative in alternatives]
+    choice.dispatch = None
+    choice.dispatchEnd = alternatives
+    if all(first is None for first in firsts):
+        return
+    # equal tuples of alternatives are shared
+    tables = {}
+    dispatch = {}
+    for code in range(128):
+        char = chr(code)
+        selected = tuple(alternative
+                         for (alternative, first) in zip(alternatives, firsts)
+                         if first is None or char in first)
+        dispatch[char] = tables.setdefault(selected, selected)
+    choice.dispatch = dispatch
+    choice.dispatchEnd = tuple(alternative
+                         for (alternative, first) in zip(alternatives, firsts)
+                         if first is None)
+
+
+class Regex(object):
+    ''' compiled regex of a lowered pattern
+        ~ Pickled & copied as its source: compiled regexes cannot be
+          deep-copied, while nodes may be (with their pattern).
+    '''
+    __slots__ = ("source", "match")
+
+    def __init__(self, source):
+        ''' Define source & match method of compiled regex. '''
+        self.source = source
+        self.match = re.compile(source, re.DOTALL).match
+
+    def __getstate__(self):
+        return (self.source,)
+
+    def __setstate__(self, state):
+        self.__init__(state[0])
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return "Regex(%r)" % self.source
+
+
+# python's re module allows at most 100 groups
+MAX_GROUPS = 99
+# & counted repetitions up to 65535
+MAX_REPEAT = 65535
+
+
+def _text(text):
+    ''' regex source matching literal text (str is taken as latin-1) '''
+    return u"".join(regexChar(ord(char)) for char in text)
+
+
+def _repeat(numMin, numMax):
+    ''' regex repetition suffix '''
+    if not numMax:
+        return u"{%s,}" % (numMin or 0)
+    return u"{%s,%s}" % (numMin or 0, numMax)
+
+
+def _atomic(body, groups):
+    ''' atomic group matching body: matched once, never backtracked '''
+    groups[0] += 1
+    name = u"g%s" % groups[0]
+    return u"(?=(?P<%s>%s))(?P=%s)" % (name, body, name)
+
+
+def _regex(pattern, last, groups, inLookahead=False):
+    ''' Regex source for pattern's sub-graph, or None.
+        ~ last: nothing follows pattern inside the current atomic scope
+          (whole regex, group or lookahead), so that it may backtrack.
+        ~ groups: [number of atomic groups used so far]
+        ~ inLookahead: pattern is checked inside a lookahead
+    '''
+    if not _allowed(pattern, inLookahead):
+        return None
+    return _lowered(pattern, last, groups, inLookahead)
+
+
+def _allowed(pattern, inLookahead):
+    ''' whether pattern's actions allow lowering (see module doc) '''
+    if pattern.actions and list(pattern.actions) != [join]:
+        if not inLookahead:
+            return False
+        if any(getattr(action, "__module__", None) != node.__name__
+               for action in pattern.actions):
+            return False
+    return True
+
+
+def _lowered(pattern, last, groups, inLookahead=False):
+    ''' Regex source for pattern, whatever its actions, or None. '''
+    typ = type(pattern)
+    if typ is Word:
+        return _text(pattern.word)
+    if typ is Char:
+        return _text(pattern.char)
+    if typ is Klass:
+        return pattern.charset.regex()
+    if typ is AnyChar and AnyChar.KLASS is None:
+        return u"."
+    if typ is String:
+        if max(pattern.numMin, pattern.numMax) > MAX_REPEAT:
+            return None
+        body = pattern.charset.regex() \
+                + _repeat(pattern.numMin, pattern.numMax)
+    elif typ is Sequence:
+        items = []
+        for (i, sub) in enumerate(pattern.patterns):
+            item = _regex(sub, last and i == len(pattern.patterns) - 1,
+                          groups, inLookahead)
+            if item is None:
+                return None
+            items.append(item)
+        return u"".join(items)
+    elif typ is Choice or typ is WordChoice:
+        alternatives = [_regex(sub, True, groups, inLookahead)
+                        for sub in pattern.patterns]
+        if None in alternatives:
+            return None
+        body = u"|".join(u"(?:%s)" % item for item in alternatives)
+    elif typ is Option:
+        item = _regex(pattern.pattern, False, groups, inLookahead)
+        if item is None:
+            return None
+        body = u"(?:%s)?" % item
+    elif typ in (ZeroOrMore, OneOrMore, Repetition):
+        if typ is Repetition:
+            (numMin, numMax) = (pattern.numMin, pattern.numMax)
+        else:
+            (numMin, numMax) = (typ is OneOrMore, False)
+        if max(numMin, numMax) > MAX_REPEAT:
+            return None
+        item = _regex(pattern.pattern, False, groups, inLookahead)
+        if item is None:
+            return None
+        body = u"(?:%s)%s" % (item, _repeat(numMin, numMax))
+    elif typ is Next or typ is NextNot:
+        item = _regex(pattern.pattern, True, groups, True)
+        if item is None:
+            return None
+        return u"(?%s%s)" % ("=" if typ is Next else "!", item)
+    elif typ is Until:
+        # (!stop item){m,n} stop
+        repetition = pattern.pattern
+        if max(pattern.numMin, pattern.numMax) > MAX_REPEAT \
+                or not _allowed(repetition, inLookahead):
+            return None
+        if isinstance(repetition, String):
+            item = repetition.charset.regex()
+        else:
+            item = _regex(pattern.item, False, groups, inLookahead)
+        notStop = _regex(pattern.stop, True, groups, True)
+        stop = _regex(pattern.stop, last, groups, inLookahead)
+        if None in (item, notStop, stop):
+            return None
+        # no atomic group needed: stop never matches where fewer items
+        # would end, since it was checked not to match there
+        return u"(?:(?!%s)%s)%s%s" % (notStop, item,
+                                      _repeat(pattern.numMin, pattern.numMax),
+                                      stop)
+    else:
+        # Recursive, Cut, AnyChar with KLASS, unknown pattern types
+        return None
+    # choices, options & repetitions: no backtracking, unless last
+    if last:
+        return u"(?:%s)" % body
+    return _atomic(body, groups)
+
+
+def regexOf(pattern):
+    ''' Regex source matching like pattern, or None if it cannot be
+        lowered (see module doc).
+    '''
+    if type(pattern) is not String:
+        if type(pattern) not in (Sequence, Choice, WordChoice, Option,
+                                 ZeroOrMore, OneOrMore, Repetition, Until):
+            return None
+        if not pattern.actions or pattern.actions[0] not in (join, restore):
+            return None
+    groups = [0]
+    source = _lowered(pattern, True, groups)
+    if source is None or groups[0] > MAX_GROUPS:
+        return None
+    return source
+
+
+def selectRegex(topPattern, patterns=None):
+    ''' Set regex on every pattern of top pattern's graph
+        that can be lowered (see module doc), else None.
+        Return the list of patterns in graph.
+        ~ patterns: graph already walked, if any --see graphOf
+    '''
+    if patterns is None:
+        patterns = graphOf(topPattern)
+    for pattern in patterns:
+        source = regexOf(pattern)
+        pattern.regex = None if source is None else Regex(source)
+    return patterns
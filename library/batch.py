@@ -0,0 +1,214 @@
+# -*- coding: utf8 -*-
+
+'''
+© 2009 Denis Derman (former developer) <denis.spir@gmail.com>
+© 2011 Peter Potrowl (current developer) <peter017@gmail.com>
+
+This file is part of PIJNU.
+
+PIJNU is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PIJNU is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PIJNU: see the file called 'GPL'.
+If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+Batch
+
+Parsing of many independent sources with one parser,
+in a pool of worker processes (see Parser.parseMany).
+
+~ Each worker gets the parser once, at start:
+    ~ by default the parser itself, inherited by fork (Unix)
+    ~ else a factory: a picklable callable returning the parser,
+      eg the make_parser function of a generated parser module
+  Workers then only receive (index, source) items, by chunks.
+~ Nodes hold their patterns (& through them the whole grammar,
+  with its toolset functions): they are not sent back.
+  A worker rather converts each result tree, by default to a Tree
+  (parallel arrays, see module tree), else with a picklable
+  convert function of the node (eg binary.dumps, see module binary).
+~ Every source yields a ParseResult, in source order or as soon
+  as it is ready: failures (pijnu errors, or any error raised
+  by actions) are recorded in results instead of stopping the batch.
+~ A BatchStats object, if given, counts sources, failures & chars,
+  for a throughput report.
+~ With workers=1, sources are parsed in the calling process:
+  results are the same.
+'''
+
+### import/export
+# (multiprocessing is imported by batches only: not at each import
+# of pijnu)
+from time import time
+from tree import Tree
+
+__all__ = ["parseMany", "ParseResult", "BatchStats"]
+
+
+class ParseResult(object):
+    ''' outcome of the parse of one source of a batch
+        ~ index: position of source in batch
+        ~ value: converted result tree (None on failure)
+        ~ error, errorType: message & class name of failure, if any
+    '''
+    __slots__ = ("index", "value", "error", "errorType")
+
+    def __init__(self, index, value=None, error=None, errorType=None):
+        self.index = index
+        self.value = value
+        self.error = error
+        self.errorType = errorType
+
+    @property
+    def ok(self):
+        ''' whether source was parsed '''
+        return self.errorType is None
+
+    def __getstate__(self):
+        return (self.index, self.value, self.error, self.errorType)
+
+    def __setstate__(self, state):
+        (self.index, self.value, self.error, self.errorType) = state
+
+    def __repr__(self):
+        if self.ok:
+            return "<ParseResult #%s>" % self.index
+        return "<ParseResult #%s: %s>" % (self.index, self.errorType)
+
+
+class BatchStats(object):
+    ''' throughput of a batch parse
+    '''
+    def __init__(self):
+        self.workers = 0
+        self.sources = 0
+        self.failures = 0
+        self.chars = 0
+        self.start_time = None
+        self.stop_time = None
+
+    def time(self):
+        if self.start_time is None:
+            return 0.0
+        stop_time = self.stop_time if self.stop_time is not None else time()
+        return stop_time - self.start_time
+
+    def __str__(self):
+        runtime = self.time() or 1e-9
+        return ("\n=== batch statistics:\n"
+                "workers:               %s\n"
+                "sources:               %s\n"
+                "   failures:           %s\n"
+                "chars:                 %s\n"
+                "run time:              %.3f\n"
+                "sources/s:             %.1f\n"
+                "chars/s:               %.0f\n"
+                %(
+                self.workers,self.sources,self.failures,self.chars,
+                runtime,self.sources/runtime,self.chars/runtime
+                )
+        )
+
+
+class Worker(object):
+    ''' parses (index, source) items into ParseResult's
+    '''
+    def __init__(self, parser, convert=None):
+        self.parser = parser
+        self.convert = convert
+
+    def __call__(self, item):
+        (index, source) = item
+        try:
+            node = self.parser.parse(source)
+            if self.convert is None:
+                value = Tree(node)
+            else:
+                value = self.convert(node)
+        except Exception, error:
+            return ParseResult(index, None, str(error),
+                               error.__class__.__name__)
+        return ParseResult(index, value)
+
+
+# worker of current process, in a pool
+worker = None
+
+def _startWorker(parser, factory, convert):
+    ''' Build worker's parser, once per process. '''
+    global worker
+    if factory is not None:
+        parser = factory()
+    worker = Worker(parser, convert)
+
+def _work(item):
+    return worker(item)
+
+
+def parseMany(parser, sources, workers=None, chunksize=16, ordered=True,
+              factory=None, convert=None, stats=None):
+    ''' Parse every source of sources (any iterable) with parser,
+        in a pool of workers processes (by default one per cpu).
+        Yield a ParseResult per source, in order unless ordered is False.
+        ~ chunksize: number of sources sent to a worker at once
+        ~ factory: picklable callable returning the parser in workers
+          (needed where processes do not fork)
+        ~ convert: picklable function of result node, in workers
+          (default: Tree)
+        ~ stats: BatchStats object to update
+    '''
+    from multiprocessing import Pool, cpu_count
+    if workers is None:
+        workers = cpu_count()
+    if stats is not None:
+        stats.workers = workers
+        stats.start_time = time()
+        sources = _counted(sources, stats)
+    items = enumerate(sources)
+    if workers <= 1:
+        results = _inline(Worker(parser, convert), items)
+        pool = None
+    else:
+        pool = Pool(workers, _startWorker,
+                    (None if factory is not None else parser, factory,
+                     convert))
+        if ordered:
+            results = pool.imap(_work, items, chunksize)
+        else:
+            results = pool.imap_unordered(_work, items, chunksize)
+    try:
+        for result in results:
+            if stats is not None and not result.ok:
+                stats.failures += 1
+            yield result
+        if pool is not None:
+            pool.close()
+            pool.join()
+            pool = None
+    finally:
+        # case batch left before its end
+        if pool is not None:
+            pool.terminate()
+        if stats is not None:
+            stats.stop_time = time()
+
+def _inline(worker, items):
+    for item in items:
+        yield worker(item)
+
+def _counted(sources, stats):
+    ''' Count sources & chars while they are read. '''
+    for source in sources:
+        stats.sources += 1
+        stats.chars += len(source)
+        yield source
@@ -0,0 +1,304 @@
+# -*- coding: utf8 -*-
+
+'''
+© 2009 Denis Derman (former developer) <denis.spir@gmail.com>
+© 2011 Peter Potrowl (current developer) <peter017@gmail.com>
+
+This file is part of PIJNU.
+
+PIJNU is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PIJNU is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PIJNU: see the file called 'GPL'.
+If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+Binary
+
+Compact binary encoding of node trees, to move parse results
+between processes or into caches:
+    data = dumps(node)
+    node = loads(data)
+Pickled nodes rather carry their pattern (& thus the grammar),
+the whole source each, & their custom attributes.
+
+~ The source is stored once (or not at all, with withSource=False:
+  then it must be given to loads).
+~ Tags are stored once, in a table: nodes refer to tags by index.
+~ Nodes follow in document order (preorder), each one as:
+  tag index, start, length (all varints) & a value code,
+  followed for a branch by its number of child nodes,
+  for other values by the value itself.
+~ A leaf which value is still its matched snippet costs only
+  its code: value is read back from the source.
+  Str, unicode, int, float, bool & None values have their own codes;
+  other ones (eg values set by custom actions) are pickled.
+~ Loaded nodes have no pattern (None); their form is their value,
+  & other attributes set by actions are not kept:
+  tag, value, kind, start & end, hence treeView, are the same.
+'''
+
+### import/export
+from cPickle import dumps as pickleDumps, loads as pickleLoads
+from struct import pack, unpack_from
+from node import Node, Nodes
+
+__all__ = ["dumps", "loads"]
+
+# format header: magic & version
+MAGIC = "PJN\x01"
+# source flags
+(NO_SOURCE, STR_SOURCE, UNICODE_SOURCE) = range(3)
+# value codes
+(BRANCH, SNIPPET, NIL, STR, UNICODE, INT, NEG_INT, FLOAT, TRUE, FALSE,
+ NONE, PICKLED) = range(12)
+
+
+### encoding
+def _varint(data, n):
+    ''' Append non-negative integer n to data, 7 bits per byte. '''
+    while n > 0x7f:
+        data.append((n & 0x7f) | 0x80)
+        n >>= 7
+    data.append(n)
+
+def _bytes(data, bytes):
+    ''' Append length & bytes to data. '''
+    _varint(data, len(bytes))
+    data.extend(bytes)
+
+def _value(data, value):
+    ''' Append code & content of value to data
+        (but snippets & branches). '''
+    kind = type(value)
+    if value is Node.NIL:
+        data.append(NIL)
+    elif kind is str:
+        data.append(STR)
+        _bytes(data, value)
+    elif kind is unicode:
+        data.append(UNICODE)
+        _bytes(data, value.encode("utf8"))
+    elif kind is bool:
+        data.append(TRUE if value else FALSE)
+    elif kind is int or kind is long:
+        if value >= 0:
+            data.append(INT)
+            _varint(data, value)
+        else:
+            data.append(NEG_INT)
+            _varint(data, -value)
+    elif kind is float:
+        data.append(FLOAT)
+        data.extend(pack("<d", value))
+    elif value is None:
+        data.append(NONE)
+    else:
+        data.append(PICKLED)
+        _bytes(data, pickleDumps(value, 2))
+
+def dumps(node, withSource=True):
+    ''' Return binary encoding of tree of nodes rooted at node
+        (as str) --see module doc. '''
+    source = node.source
+    data = bytearray(MAGIC)
+    # source
+    if not withSource:
+        data.append(NO_SOURCE)
+    elif isinstance(source, unicode):
+        data.append(UNICODE_SOURCE)
+        _bytes(data, source.encode("utf8"))
+    else:
+        data.append(STR_SOURCE)
+        _bytes(data, source)
+    # nodes, while collecting tags
+    tagIds = {}
+    tags = []
+    nodes = bytearray()
+    append = nodes.append
+    sourceType = type(source)
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        tag = node.tag
+        try:
+            tagId = tagIds[tag]
+        except (KeyError, TypeError):
+            tagId = len(tags)
+            tags.append(tag)
+            try:
+                tagIds[tag] = tagId
+            except TypeError:
+                # unhashable tag: stored each time
+                pass
+        (start, end) = (node.start, node.end)
+        # varints inline: tag, start, length
+        for n in (tagId, start, end - start):
+            while n > 0x7f:
+                append((n & 0x7f) | 0x80)
+                n >>= 7
+            append(n)
+        value = node.value
+        if node.kind is Node.BRANCH:
+            append(BRANCH)
+            _varint(nodes, len(value))
+            stack.extend(reversed(value))
+        elif type(value) is sourceType and value == source[start:end]:
+            append(SNIPPET)
+        else:
+            _value(nodes, value)
+    # tag table, then nodes
+    _varint(data, len(tags))
+    for tag in tags:
+        _value(data, tag)
+    data.extend(nodes)
+    return str(data)
+
+
+### decoding
+class Reader(object):
+    ''' reading position in encoded data '''
+    __slots__ = ("data", "pos")
+
+    def __init__(self, data):
+        self.data = bytearray(data)
+        self.pos = 0
+
+    def varint(self):
+        (data, pos) = (self.data, self.pos)
+        n = shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            n |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                self.pos = pos
+                return n
+            shift += 7
+
+    def bytes(self):
+        length = self.varint()
+        start = self.pos
+        self.pos = start + length
+        return str(self.data[start:self.pos])
+
+    def value(self, code):
+        ''' value of given code (but snippets & branches) '''
+        if code == NIL:
+            return Node.NIL
+        if code == STR:
+            return self.bytes()
+        if code == UNICODE:
+            return self.bytes().decode("utf8")
+        if code == INT:
+            return self.varint()
+        if code == NEG_INT:
+            return -self.varint()
+        if code == FLOAT:
+            self.pos += 8
+            return unpack_from("<d", buffer(self.data), self.pos - 8)[0]
+        if code == TRUE:
+            return True
+        if code == FALSE:
+            return False
+        if code == NONE:
+            return None
+        if code == PICKLED:
+            return pickleLoads(self.bytes())
+        raise ValueError("Invalid value code %s in node tree data." % code)
+
+def loads(data, source=None):
+    ''' Return root node of tree encoded in data --see module doc.
+        ~ source is needed if it was not encoded with the tree
+          (else it replaces the encoded one).
+    '''
+    if not data.startswith(MAGIC):
+        raise ValueError("Data is not a node tree encoded by dumps.")
+    reader = Reader(data)
+    reader.pos = len(MAGIC)
+    flag = reader.data[reader.pos]
+    reader.pos += 1
+    if flag == NO_SOURCE:
+        if source is None:
+            message = "Node tree was encoded without source: give it."
+            raise ValueError(message)
+    else:
+        encoded = reader.bytes()
+        if source is None:
+            source = encoded.decode("utf8") if flag == UNICODE_SOURCE \
+                     else encoded
+    tags = []
+    for i in xrange(reader.varint()):
+        reader.pos += 1
+        tags.append(reader.value(reader.data[reader.pos - 1]))
+    return _nodes(reader, tags, source)
+
+def _nodes(reader, tags, source):
+    ''' Read nodes in preorder, linking them to their parent. '''
+    data = reader.data
+    pos = reader.pos
+    new = Node.__new__
+    (LEAF, BRANCH_KIND) = (Node.LEAF, Node.BRANCH)
+    root = None
+    # [child nodes, number still to read] of open branches
+    stack = []
+    while True:
+        # varints inline: tag, start, length
+        numbers = []
+        for i in (0, 1, 2):
+            n = shift = 0
+            while True:
+                byte = data[pos]
+                pos += 1
+                n |= (byte & 0x7f) << shift
+                if byte < 0x80:
+                    break
+                shift += 7
+            numbers.append(n)
+        (tagId, start, length) = numbers
+        node = new(Node)
+        node.tag = tags[tagId]
+        node.pattern = None
+        node.source = source
+        node.start = start
+        node.end = end = start + length
+        code = data[pos]
+        pos += 1
+        count = 0
+        if code == BRANCH:
+            reader.pos = pos
+            count = reader.varint()
+            pos = reader.pos
+            node.kind = BRANCH_KIND
+            node.value = Nodes()
+        else:
+            node.kind = LEAF
+            if code == SNIPPET:
+                node.value = source[start:end]
+            else:
+                reader.pos = pos
+                node.value = reader.value(code)
+                pos = reader.pos
+        node._form = node.value
+        # link to parent
+        if stack:
+            top = stack[-1]
+            top[0].append(node)
+            top[1] -= 1
+            if top[1] == 0:
+                stack.pop()
+        else:
+            root = node
+        if count:
+            stack.append([node.value, count])
+        if not stack:
+            return root
@@ -0,0 +1,202 @@
+# -*- coding: utf8 -*-
+
+'''
+© 2009 Denis Derman (former developer) <denis.spir@gmail.com>
+© 2011 Peter Potrowl (current developer) <peter017@gmail.com>
+
+This file is part of PIJNU.
+
+PIJNU is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PIJNU is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PIJNU: see the file called 'GPL'.
+If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+Cache
+
+Persistent cache of parse results, in a local sqlite file,
+an opt-in layer around Parser.parse:
+    cache = ParseCache(parser, "results.db")
+    node = cache.parse(source)
+Unchanged sources of a batch parsed again are then read back
+instead of being parsed.
+
+~ Results are keyed by a digest of the grammar & of the source.
+  The grammar digest is computed from the parser's pattern graph:
+  names, formats & actions of patterns, & for generated parsers
+  the digest of their grammar text (grammarHash) too.
+  Actions are told apart by module, name & code (bytecode, constants
+  & names used): parsers made from the same grammar with other
+  actions (eg make_parser(actions)) get results of their own.
+  (Globals or closure variables an action reads are not part of it.)
+~ Trees are stored in binary form, without source (see module binary):
+  a hit yields a tree which tag, value, kind & span of nodes,
+  hence treeView, are the ones of a fresh parse. Nodes have no pattern.
+~ Failures are not cached: sources that fail are parsed each time,
+  & raise their usual error.
+~ Size-based eviction: when stored trees exceed maxSize bytes,
+  least recently used ones are dropped.
+~ Counters: hits, misses, & size of stored trees --see __str__.
+'''
+
+### import/export
+# (sqlite3 is imported by caches only: not at each import of pijnu)
+from hashlib import sha1
+from time import time
+import binary
+
+__all__ = ["ParseCache"]
+
+
+class ParseCache(object):
+    ''' persistent cache of parse results --see module doc
+    '''
+    # default limit of stored trees size, in bytes
+    MAX_SIZE = 256 * 2**20
+
+    def __init__(self, parser, path, maxSize=None):
+        ''' Open (or create) cache file at path for parser. '''
+        import sqlite3
+        self.parser = parser
+        self.path = path
+        self.maxSize = ParseCache.MAX_SIZE if maxSize is None else maxSize
+        self.grammarHash = self._graphHash(parser)
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(path)
+        self.db.text_factory = str
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS trees "
+                        "(key TEXT PRIMARY KEY, data BLOB, "
+                        "size INTEGER, used REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS trees_used "
+                        "ON trees (used)")
+        self.db.commit()
+        self.size = self._storedSize()
+
+    @staticmethod
+    def _graphHash(parser):
+        ''' digest of parser's grammar text (if any) & pattern graph,
+            actions included '''
+        digest = sha1("%s\n" % parser.grammarHash)
+        for pattern in parser.registry:
+            actions = [_actionText(action)
+                       for action in pattern.actions or ()]
+            text = "%s %s %s\n" % (pattern.__class__.__name__,
+                                   pattern, " ".join(actions))
+            if isinstance(text, unicode):
+                text = text.encode("utf8")
+            digest.update(text)
+        return digest.hexdigest()
+
+    def _key(self, source):
+        ''' digest of grammar & source '''
+        if isinstance(source, unicode):
+            text = "u" + source.encode("utf8")
+        else:
+            text = "s" + source
+        return sha1("%s %s\n%s" % (binary.MAGIC, self.grammarHash,
+                                   text)).hexdigest()
+
+    def _storedSize(self):
+        (size,) = self.db.execute("SELECT SUM(size) FROM trees").fetchone()
+        return size or 0
+
+    ### parse through cache
+    def parse(self, source):
+        ''' Return result tree for source: cached one, or fresh parse
+            (then stored). Failures raise as with Parser.parse. '''
+        key = self._key(source)
+        row = self.db.execute("SELECT data FROM trees WHERE key=?",
+                              (key,)).fetchone()
+        if row is not None:
+            self.hits += 1
+            self.db.execute("UPDATE trees SET used=? WHERE key=?",
+                            (time(), key))
+            self.db.commit()
+            return binary.loads(str(row[0]), source)
+        self.misses += 1
+        node = self.parser.parse(source)
+        self.store(key, binary.dumps(node, withSource=False))
+        return node
+
+    def store(self, key, data):
+        ''' Store tree data under key, then evict if needed. '''
+        from sqlite3 import Binary
+        self.db.execute("INSERT OR REPLACE INTO trees VALUES (?,?,?,?)",
+                        (key, Binary(data), len(data), time()))
+        self.size += len(data)
+        if self.size > self.maxSize:
+            self._evict()
+        self.db.commit()
+
+    def _evict(self):
+        ''' Drop least recently used trees, down to 3/4 of maxSize. '''
+        # (other processes may use the file as well)
+        self.size = self._storedSize()
+        target = self.maxSize * 3 // 4
+        rows = self.db.execute("SELECT key, size FROM trees "
+                               "ORDER BY used")
+        keys = []
+        size = self.size
+        for (key, treeSize) in rows:
+            if size <= target:
+                break
+            keys.append((key,))
+            size -= treeSize
+        self.db.executemany("DELETE FROM trees WHERE key=?", keys)
+        self.size = size
+
+    ### management
+    def __len__(self):
+        ''' number of stored trees '''
+        return self.db.execute("SELECT COUNT(*) FROM trees").fetchone()[0]
+
+    def clear(self):
+        ''' Drop all stored trees & reset counters. '''
+        self.db.execute("DELETE FROM trees")
+        self.db.commit()
+        (self.size, self.hits, self.misses) = (0, 0, 0)
+
+    def close(self):
+        self.db.close()
+
+    def __str__(self):
+        return ("\n=== parse cache:\n"
+                "file:                  %s\n"
+                "hits:                  %s\n"
+                "misses:                %s\n"
+                "stored size:           %s\n"
+                % (self.path, self.hits, self.misses, self.size))
+
+
+def _actionText(action):
+    ''' identity of action, stable from run to run:
+        module, name & digest of code '''
+    name = "%s.%s" % (getattr(action, "__module__", None),
+                      getattr(action, "__name__", action.__class__.__name__))
+    code = getattr(action, "func_code", None)
+    if code is None:
+        code = getattr(getattr(action, "__call__", None), "func_code", None)
+    if code is None:
+        return name
+    return "%s:%s" % (name, sha1(_codeText(code)).hexdigest())
+
+def _codeText(code):
+    ''' text of code object: bytecode, constants (nested code
+        included) & names '''
+    consts = [_codeText(const) if hasattr(const, "co_code") else repr(const)
+              for const in code.co_consts]
+    return "%s\n%s\n%s" % (code.co_code, "\n".join(consts),
+                           " ".join(code.co_names))
@@ -0,0 +1,129 @@
+# -*- coding: utf8 -*-
+
+'''
+© 2009 Denis Derman (former developer) <denis.spir@gmail.com>
+© 2011 Peter Potrowl (current developer) <peter017@gmail.com>
+
+This file is part of PIJNU.
+
+PIJNU is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PIJNU is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PIJNU: see the file called 'GPL'.
+If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+Char map
+
+Per-source map of char klasses, an optional pre-pass
+(used when Pattern.CHAR_MAP is set).
+
+~ A char map is created for each source by _resetMemo,
+  & held by the parse context (see module context).
+  Klass & String patterns get the rows of their charset
+  (charRows), computed once for the whole source:
+    ~ members: one byte per position, 1 if source char is a member
+      (0 at end of source)
+    ~ runEnds: for each position, end of the run of member chars
+      starting there (the position itself for a non-member)
+  Klass checks then read a byte, and String checks jump to the end
+  of their run in one step.
+~ Patterns with the same charset share rows.
+~ With NumPy, rows are computed in a few vectorized operations.
+  Else, runs of member chars are found by a compiled regex;
+  only then are rows filled, one slice per run.
+  (NumPy also needs unicode chars to be single code units:
+  on narrow python builds, the regex is used for unicode sources.)
+
+Memory use is about 1 + 8 bytes per char of source & charset:
+the pre-pass suits repeated checks over large sources.
+'''
+
+### import/export
+from array import array
+import re
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = ["CharMap"]
+
+
+class CharMap(object):
+    ''' char klass rows for one source
+    '''
+    def __init__(self, source):
+        ''' Define source & empty row cache. '''
+        self.source = source
+        self.codes = None           # --> _codes, case NumPy
+        self.rowCache = {}
+
+    def rows(self, charset):
+        ''' (members, runEnds) for charset -- see module doc. '''
+        key = tuple(charset.ranges)
+        if key not in self.rowCache:
+            codes = self._codes()
+            if codes is None:
+                self.rowCache[key] = self._regexRows(charset)
+            else:
+                self.rowCache[key] = self._numpyRows(charset, codes)
+        return self.rowCache[key]
+
+    def _codes(self):
+        ''' NumPy array of source char ordinals, or None. '''
+        if numpy is None:
+            return None
+        if self.codes is None:
+            source = self.source
+            if isinstance(source, unicode):
+                codes = numpy.frombuffer(source.encode("utf-32-le"),
+                                         dtype="<u4")
+                # case narrow build: chars beyond BMP are 2 code units
+                if len(codes) != len(source):
+                    return None
+            else:
+                codes = numpy.frombuffer(source, dtype=numpy.uint8)
+            self.codes = codes
+        return self.codes
+
+    def _numpyRows(self, charset, codes):
+        ''' rows computed by NumPy array operations '''
+        length = len(codes)
+        table = numpy.frombuffer(str(charset.table), dtype=numpy.uint8)
+        latin = codes < 256
+        members = latin & (table[numpy.where(latin, codes, 0)] == 1)
+        if charset.starts:
+            starts = numpy.array(charset.starts)
+            ends = numpy.array(charset.ends)
+            i = numpy.searchsorted(starts, codes, side="right") - 1
+            members |= (i >= 0) & (codes <= ends[numpy.maximum(i, 0)])
+        # run end: first non-member position at or after pos
+        stops = numpy.append(numpy.flatnonzero(~members), length)
+        runEnds = stops[numpy.searchsorted(stops, numpy.arange(length + 1))]
+        memberBytes = bytearray(members.astype(numpy.uint8).tostring())
+        memberBytes.append(0)
+        ends = array('l')
+        ends.fromstring(runEnds.astype('l').tostring())
+        return (memberBytes, ends)
+
+    def _regexRows(self, charset):
+        ''' rows filled from runs found by a regex '''
+        length = len(self.source)
+        members = bytearray(length + 1)
+        runEnds = array('l', xrange(length + 1))
+        regex = re.compile(u"%s+" % charset.regex(), re.DOTALL)
+        for match in regex.finditer(self.source):
+            (start, end) = match.span()
+            members[start:end] = "\x01" * (end - start)
+            runEnds[start:end] = array('l', [end]) * (end - start)
+        return (members, runEnds)
@@ -46,6 +46,7 @@ Character klass parsing & expansion to produce a character set
     valid character formats by default:
     * literal 'safe' char: no \, TAB, NL, CR, ', ", ]
     * hex ordinal: '\x2f'  -- 2 hex digits
+    * unicode ordinal: '\u4e00' or '\U0001f600'  -- 4 or 8 hex digits
     * dec ordinal: '\047'  -- 3 dec digits
     * python-like code: \t \n \r \\ \] \' \"
 
@@ -55,6 +56,17 @@ range expression:
     * If the second char's ordinal is less than the first one's,
         the expansion returns an empty set (no exception).
 
+char sets:
+    A klass pattern holds its chars in a CharSet:
+    * ascii chars in a frozenset -- constant-time membership
+    * other latin-1 chars in a byte table indexed by ordinal
+      (a set cannot hold both '\xe9' & u'\xe9': they compare unequal
+      with a warning, while their hashes are equal)
+    * chars beyond latin-1 as sorted code ranges, looked up by bisection
+    Ranges are never expanded: [\u0100..\U0010ffff] holds 1 range.
+    ranges(expression) returns the ranges of a klass expression;
+    charset(expression) still returns the expanded string of chars.
+
 use of double space as visual separator:
     "a..e  1..9"		--> "abcde123456879_ "
     "abc  _  +-*/"		--> "abc_+- */"
@@ -84,9 +96,10 @@ char klass expression in python code:
 
 # import export
 from sys import exit as end, stderr as error
+from bisect import bisect_right
 import re
 pattern = re.compile
-__all__ = ["charset_names", "charset", "seqCharset"]
+__all__ = ["charset_names", "charset", "ranges", "CharSet"]
 charset_names = __all__
 
 
@@ -94,65 +107,122 @@ charset_names = __all__
 FROM_TEXT = True
 
 # regex pattern for any valid char format:
-# hex ordinal | dec ordinal | range code | literal char
+# hex ordinal | unicode ordinal | dec ordinal | range code | literal char
 #	~ hex ordinal	:	\\x[\da-fA-F]{2}
+#	~ unicode ord.	:	\\u[\da-fA-F]{4}|\\U[\da-fA-F]{8}
 #	~ dec ordinal	:	\\[\d]{3}
 #	~ range code	:	\.\.
 #	~ literal char	:	\n|.
 # Coded characters (\\ \t \n \r \] \' \") are replaced directly.
-char = pattern(r"(\\x[\da-fA-F]{2})|(\\[\d]{3})|(\.\.)|(.|\n)")
+char = pattern(r"(\\x[\da-fA-F]{2})|(\\u[\da-fA-F]{4}|\\U[\da-fA-F]{8})"
+               r"|(\\[\d]{3})|(\.\.)|(.|\n)")
 
 # character format converter
-RANGE_MEMO = ""		# used to "remember" range code position
+RANGE_MEMO = None		# used to "remember" range code position
 
 
-def literalChar(result):
-    ''' return literal character from any valid character format:
+def literalCode(result):
+    ''' return ordinal of character from any valid character format:
         * hex ordinal: \Xhh
+        * unicode ordinal: \uhhhh or \Uhhhhhhhh
         * dec ordinal: \ddd
-        * range code: '..'
+        * range code: '..' (RANGE_MEMO)
         * literal safe char: any non-escaped char '''
-    hex, dec, range, lit = result
-    if hex:
-        return chr(int(hex[2:], 16))
+    hex, uni, dec, range, lit = result
+    if hex or uni:
+        return int(hex[2:] or uni[2:], 16)
     elif dec:
-        return chr(int(dec[1:]))
+        return int(dec[1:])
     elif range:
         return RANGE_MEMO
     else:
-        return lit
-
-
-# range expansion
-def expandedSeq(seq):
-    ''' return character sequence with expanded ranges '''
-    while RANGE_MEMO in seq[1:-1]:
-        pos = seq.index(RANGE_MEMO, 1, -1)
-        (pos1, pos2) = (pos - 1, pos + 1)
-        (ord1, ord2) = (ord(seq[pos1]), ord(seq[pos2]))
-        char_range = [chr(n) for n in range(ord1, ord2 + 1)]
-        seq[pos1:pos2 + 1] = char_range
-        #~~print "range: pos=%s [%s..%s] [%s..%s] =>\n%s" \
-        #% (pos,seq[pos1],seq[pos2],ord1,ord2,char_range)
-    return seq
-
-
-# production of charset from cleant expression
+        return ord(lit)
+
+
+def codeChar(code):
+    ''' char of given ordinal: str for latin-1, else unicode '''
+    if code < 256:
+        return chr(code)
+    return unichr(code)
+
+
+def regexChar(code):
+    ''' regex source for char of given ordinal '''
+    char = codeChar(code)
+    if code < 128 and char.isalnum():
+        return unicode(char)
+    if code == 0:
+        return u"\\000"
+    return u"\\" + unichr(code)
+
+
+# ranges
+def codeRanges(codes):
+    ''' return [(first, last)] code ranges from a sequence of codes
+        with possible range codes '..' in between
+        (a char at either end of a range only belongs to the range) '''
+    ranges = []
+    i = 0
+    while i < len(codes):
+        code = codes[i]
+        if code is RANGE_MEMO:
+            if ranges and i + 1 < len(codes) \
+                    and codes[i + 1] is not RANGE_MEMO:
+                (first, last) = ranges[-1]
+                if first == last:
+                    ranges.pop()
+                ranges.append((last, codes[i + 1]))
+                i += 1
+        else:
+            ranges.append((code, code))
+        i += 1
+    return ranges
+
+
+def normalRanges(ranges):
+    ''' return sorted & merged list of ranges, without empty ones '''
+    merged = []
+    for (first, last) in sorted(ranges):
+        if first > last:
+            continue
+        if merged and first <= merged[-1][1] + 1:
+            if last > merged[-1][1]:
+                merged[-1] = (merged[-1][0], last)
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def excludedRanges(ranges, excluded):
+    ''' return normal ranges minus excluded ones '''
+    result = []
+    for (first, last) in normalRanges(ranges):
+        for (exFirst, exLast) in normalRanges(excluded):
+            if exLast < first or exFirst > last:
+                continue
+            if exFirst > first:
+                result.append((first, exFirst - 1))
+            first = exLast + 1
+        if first <= last:
+            result.append((first, last))
+    return result
+
+
+# production of ranges from cleant expression
 def production(expression):
     try:
         # regex parsing --> char sequence
         format_charseq = char.findall(expression)
-        # convert to literal character sequence
+        # convert to code sequence
         # (+ possible ranges codes)
-        charseq = [literalChar(c) for c in format_charseq]
-        # expand character ranges
-        expanded_charseq = expandedSeq(charseq)
-        # glue the seq into a string
+        codes = [literalCode(c) for c in format_charseq]
+        # gather codes into ranges
+        code_ranges = codeRanges(codes)
     except Exception, error_text:
         message = "Invalid charset expression:"
         cause = "%s\n   %s\n%s" % (message, expression, error_text)
         raise ValueError(cause)
-    return "".join(expanded_charseq)
+    return code_ranges
 
 
 #replace coded chars
@@ -167,18 +237,13 @@ def codesToChars(expression):
     return expression
 
 
-# exclusion
-def exclusionSet(inset, exset):
-    for c in exset:
-        inset = inset.replace(c, '')
-    return inset
-
 # global func
 EXCLUSION = "!!"
 SPACE2 = "  "
 
 
-def charset(expression):
+def ranges(expression):
+    ''' return normal code ranges of klass expression '''
     ### cleaning phase:
     #	~ double space separators are erased
     #	~ nesting brackets are dropped
@@ -195,10 +260,114 @@ def charset(expression):
     # then remove excluded characters
     if EXCLUSION in expression:
         (included, excluded) = expression.split(EXCLUSION)
-        (inset, exset) = (production(included), production(excluded))
-        return exclusionSet(inset, exset)
+        return excludedRanges(production(included), production(excluded))
     # else simply production whole whole
-    return production(expression)
+    return normalRanges(production(expression))
+
+
+def charset(expression):
+    ''' return string of all chars of klass expression
+        (latin-1 only: str, else unicode) '''
+    code_ranges = ranges(expression)
+    toChar = chr
+    if code_ranges and code_ranges[-1][1] > 255:
+        toChar = unichr
+    return "".join(toChar(code) for (first, last) in code_ranges
+                                for code in xrange(first, last + 1))
+
+
+class CharSet(object):
+    ''' set of chars for klass patterns (see module doc)
+        ~ ranges: normal [(first, last)] code ranges
+        ~ ascii: frozenset of ascii members (same for str & unicode)
+        ~ table: byte table of latin-1 members, indexed by ordinal
+        ~ starts, ends: bounds of ranges beyond latin-1
+    '''
+    __slots__ = ("ranges", "ascii", "table", "starts", "ends")
+
+    def __init__(self, ranges=()):
+        ''' Define ranges, ascii set, latin-1 table & wide range bounds. '''
+        self.ranges = normalRanges(ranges)
+        self.table = bytearray(256)
+        (self.starts, self.ends) = ([], [])
+        for (first, last) in self.ranges:
+            for code in xrange(first, min(last, 255) + 1):
+                self.table[code] = 1
+            if last > 255:
+                self.starts.append(max(first, 256))
+                self.ends.append(last)
+        self.ascii = frozenset(chr(code) for code in xrange(128)
+                               if self.table[code])
+
+    @staticmethod
+    def fromChars(chars):
+        ''' char set holding given chars '''
+        return CharSet((ord(c), ord(c)) for c in chars)
+
+    def __contains__(self, char):
+        if char in self.ascii:
+            return True
+        code = ord(char)
+        if code < 256:
+            return self.table[code] == 1
+        i = bisect_right(self.starts, code) - 1
+        return i >= 0 and code <= self.ends[i]
+
+    def span(self, source, pos, stop):
+        ''' end of the run of member chars in source from pos to stop '''
+        ascii = self.ascii
+        while True:
+            while pos < stop and source[pos] in ascii:
+                pos += 1
+            if pos >= stop or source[pos] <= '\x7f' or source[pos] not in self:
+                return pos
+            pos += 1
+
+    def regex(self):
+        ''' regex char class source matching members '''
+        if not self.ranges:
+            return u"(?!)"
+        items = []
+        for (first, last) in self.ranges:
+            if first == last:
+                items.append(regexChar(first))
+            else:
+                items.append(u"%s-%s"
+                             % (regexChar(first), regexChar(last)))
+        return u"[%s]" % u"".join(items)
+
+    def latin(self):
+        ''' string of latin-1 members '''
+        return "".join(chr(code) for code in xrange(256) if self.table[code])
+
+    def __or__(self, other):
+        return CharSet(self.ranges + other.ranges)
+
+    def __sub__(self, other):
+        return CharSet(excludedRanges(self.ranges, other.ranges))
+
+    def __iter__(self):
+        for (first, last) in self.ranges:
+            for code in xrange(first, last + 1):
+                yield codeChar(code)
+
+    def __len__(self):
+        return sum(last - first + 1 for (first, last) in self.ranges)
+
+    def __eq__(self, other):
+        return isinstance(other, CharSet) and self.ranges == other.ranges
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __getstate__(self):
+        return (self.ranges,)
+
+    def __setstate__(self, state):
+        self.__init__(state[0])
+
+    def __repr__(self):
+        return "CharSet(%r)" % (self.ranges,)
 
 
 # === test ==================================================
@@ -0,0 +1,215 @@
+# -*- coding: utf8 -*-
+
+'''
+© 2009 Denis Derman (former developer) <denis.spir@gmail.com>
+© 2011 Peter Potrowl (current developer) <peter017@gmail.com>
+
+This file is part of PIJNU.
+
+PIJNU is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PIJNU is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PIJNU: see the file called 'GPL'.
+If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+Context
+
+Mutable state of a parse, apart from the pattern graph.
+
+~ Patterns hold the grammar only: a parse never changes them.
+  Whatever it changes lives in a parse context instead:
+    ~ memo tables of patterns (packrat), made at first use
+      -- dicts, or tables of a memo store with config DENSE_MEMO
+    ~ char map rows of klasses & strings, with config CHAR_MAP
+    ~ farthest failure record, lookahead nesting level,
+      regex flags, position of last cut passed
+    ~ last literal stop search of untils
+    ~ statistics on match checks, with config DO_STATS
+  Thus one parser can be used by several threads at once.
+~ Match methods set a context as the running context of the
+  current thread (the thread's default one, unless one is given),
+  & leave it there after the match: the state of the last match
+  can be read (see also properties memo, memoStore & charRows
+  of patterns).
+~ A context may be reused for sequential matches: each one resets it.
+  Reset does not depend on the size of the grammar: it drops the
+  memo tables of the previous match at once (their cost was paid by
+  the match which made them). Tables are made at first check of their
+  pattern: matching many short sources does not cost a reset of every
+  pattern each time.
+~ A context holds the state of its last match only: patterns of other
+  matches (eg of parsers no longer used) are not kept alive by it.
+~ An incremental context records, for each result, the extent of
+  source text it depends on, so that a parse after an edit can reuse
+  the results of the previous one (see module incremental). It also
+  holds the tree of its last parse: the one to reparse.
+'''
+
+### import/export
+from threading import local
+from time import time
+from error import FailureRecord
+
+__all__ = ["ParseContext", "Stats"]
+
+
+# object used to collect statistics on match checks
+class Stats(object):
+    ''' object used to collect statistics on match checks
+    '''
+    def __init__(self, start_time=None):
+        self.start_time = start_time
+        self.stop_time = None
+        self.trials = 0
+        self.memos = 0
+        self.checks = 0
+        self.failures = 0
+        self.matchFailures = 0
+        self.invalids = 0
+        self.successes = 0
+        self.branches = 0
+        self.leaves = 0
+
+    def time(self):
+        if self.start_time is None or self.stop_time is None:
+            return ""
+        runtime = self.stop_time - self.start_time
+        return "\nrun time: %.3f" % runtime
+
+    def __str__(self):
+        return ("\n=== parsing statistics:\n"
+                "match trials:          %s\n"
+                "   memos:              %s\n"
+                "   checks:             %s\n"
+                "       failures:       %s\n"
+                "           matchFails: %s\n"
+                "           invalids:   %s\n"
+                "       successes:      %s\n"
+                "           branches:   %s\n"
+                "           leaves:     %s\n"
+                "%s"
+                %(
+                self.trials,self.memos,self.checks,
+                self.failures,self.matchFailures,self.invalids,
+                self.successes,self.branches,self.leaves,
+                self.time()
+                )
+        )
+
+
+class ParseContext(object):
+    ''' mutable state of a parse -- see module doc
+    '''
+    def __init__(self, incremental=False):
+        ''' Define empty state.
+            ~ incremental: whether matches record the extent of results,
+              for reparses (see module incremental)
+        '''
+        # memo: {pattern:table} --> table
+        # (tables of the current match only)
+        self.memos = dict()
+        self.source = None
+        self.memoStore = None
+        # char map rows: {pattern:rows} --> rows
+        self.charRows = dict()
+        # farthest failure --see class FailureRecord
+        self.failure = FailureRecord()
+        # until --> (source,pos,next stop pos) of last literal stop search
+        # (still valid for next matches of the same source)
+        self.found = dict()
+        # statistics on match checks, reset by parse --see class Stats
+        self.stats = Stats()
+        # incremental parse: entries {pattern:{pos:(result,span)}}
+        # recorded instead of memo tables, previous parses' entries,
+        # their history & last tree --see module incremental
+        self.incremental = incremental
+        self.entries = dict()
+        self.previous = None
+        self.history = None
+        self.tree = None
+        self.reset()
+
+    def reset(self, source=None, memoStore=None, charMap=None):
+        ''' Forget previous match: get ready for a match of source,
+            possibly with a memo store & a char map for this source.
+            ~ Tables of the previous match are dropped, not emptied:
+              no pattern of the grammar is visited --see table.
+        '''
+        # last stop searches are valid for the same source only
+        if source is not self.source:
+            self.found = dict()
+        self.source = source
+        if self.memos:
+            self.memos = dict()
+        self.memoStore = memoStore
+        self.charMap = charMap
+        if self.charRows:
+            self.charRows = dict()
+        self.failure.reset()
+        # nesting level of lookahead checks:
+        # failures inside lookaheads are not recorded, nor cuts passed
+        self.lookahead = 0
+        # whether a regex matched: then failures inside its match
+        # were not recorded -- see analysis.selectRegex
+        self.regexMatched = False
+        # regexes are not used while checking again for error messages
+        self.regexOff = False
+        # position of last cut passed --see pattern type Cut
+        self.cutPosition = 0
+        # incremental parse: new entries, end of source text examined
+        # by the check in progress --see Pattern._trackCheck
+        # (history is kept by reparses only)
+        if self.incremental:
+            self.entries = dict()
+            self.tree = None
+            if self.previous is None:
+                self.history = None
+        self.reach = 0
+
+    def table(self, pattern):
+        ''' Make & return pattern's memo table for current match:
+            {pos:result}, or a table of the memo store.
+        '''
+        if self.memoStore is not None and pattern.memoize:
+            table = self.memoStore.table(pattern)
+        else:
+            table = dict()
+        self.memos[pattern] = table
+        return table
+
+    def rows(self, pattern):
+        ''' char map rows of klass or string pattern
+            (None without char map) '''
+        if self.charMap is None:
+            return None
+        try:
+            return self.charRows[pattern]
+        except KeyError:
+            rows = self.charMap.rows(pattern.charset)
+            self.charRows[pattern] = rows
+            return rows
+
+
+class Running(local):
+    ''' running parse context, per thread
+        ~ Each thread has a default context of its own,
+          used by matches given none
+          (& an incremental one, for reparses given none).
+    '''
+    def __init__(self):
+        self.default = ParseContext()
+        self.context = self.default
+        # incremental context used by reparses given none
+        self.incremental = None
+
+running = Running()
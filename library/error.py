@@ -25,6 +25,12 @@ If not, see <http://www.gnu.org/licenses/>.
 Match errors
 
 pijnu errors -- with full information output
+
+~ During a match, failures are not error objects:
+  checks return the FAIL sentinel, and the engine only records
+  the farthest position where a failure occurred & the patterns
+  expected there (see FailureRecord).
+~ Errors are built from this record when a top-level match fails.
 '''
 
 
@@ -32,7 +38,48 @@ pijnu errors -- with full information output
 from tools import *
 
 __all__ = ["PijnuError", "ErrorLocation",
-           "MatchFailure", "EndOfText", "IncompleteParse", "Invalidation"]
+           "MatchFailure", "EndOfText", "IncompleteParse", "Invalidation",
+           "FAIL", "FailureRecord"]
+
+
+class Fail(object):
+    ''' failure sentinel type -- single instance FAIL '''
+    __slots__ = ()
+
+    def __repr__(self):
+        return "FAIL"
+
+# outcome of a failed check
+FAIL = Fail()
+
+
+class FailureRecord(object):
+    ''' farthest failure reached during a match
+        ~ pos: farthest position where a pattern failed (-1 if none)
+        ~ patterns: patterns that failed at this position
+    '''
+    __slots__ = ("pos", "patterns")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        ''' Forget failures (new match). '''
+        self.pos = -1
+        self.patterns = []
+
+    def record(self, pattern, pos):
+        ''' Record failure of pattern at pos, if farthest. '''
+        if pos > self.pos:
+            self.pos = pos
+            self.patterns = [pattern]
+        elif pos == self.pos and pattern not in self.patterns:
+            self.patterns.append(pattern)
+
+    def expectedText(self):
+        ''' "expected" message listing failed patterns '''
+        forms = [pattern._shortForm() for pattern in self.patterns]
+        return "Expected:   %s" % "  /  ".join(forms)
 
 
 class PijnuError(Exception):
@@ -102,22 +149,31 @@ class MatchFailure(PijnuError):
     ''' standard match failure exception
     Used mainly to provide worthful feedback.
     '''
-    def __init__(self, pattern, source, pos, wrap=False):
-        ''' Record data. '''
+    def __init__(self, pattern, source, pos, wrap=False, expected=None):
+        ''' Record data.
+            ~ expected: message about the patterns expected at pos
+              (farthest failure), replaces pattern's own message
+        '''
         self.pattern = pattern
         self.source = source
         self.pos = pos
         # wrap is used to avoid printing full error frame
         # for wrapped errors raised by wrapped pattern
         self.wrap = wrap
+        self.expected = expected
 
     def __str__(self):
         ''' failure feedback:
             ~ pattern
             ~ location
             ~ reason
-            Possibly information transfered from sub pattern failure(s). '''
-        self.message = self.pattern._message()
+            Possibly information about farthest failure. '''
+        if self.expected is None:
+            self.message = self.pattern._message()
+        else:
+            self.message = self.expected
+        if self.pos >= len(self.source):
+            self.message = "Reached end of source text.\n%s" % self.message
         self.location = ErrorLocation(self.source, self.pos)
         if self.wrap:
             return ("\nMatch failure for pattern\n"
@@ -146,37 +202,44 @@ class EndOfText(PijnuError):
     ''' standard parse failure exception
         Used to avoid worse placeholder and provide feedback.
         '''
-    def __init__(self, pattern, source, wrap=False):
-        ''' Record data. '''
+    def __init__(self, pattern, source, wrap=False, expected=None):
+        ''' Record data.
+            ~ expected: message about the patterns expected at end
+        '''
         self.pattern = pattern
         self.source = source
         # wrap is used to avoid printing full error frame
         # for wrapped errors raised by wrapped pattern
         self.wrap = wrap
+        self.expected = expected
 
     def __str__(self):
         ''' failure feedback:
             ~ pattern
             ~ reason
             ~ location
-            Possibly information transfer from sub pattern failure(s). '''
+            Possibly information about farthest failure. '''
         source = self.source
         self.location = ErrorLocation(source, len(source))
+        reason = "Reached end of source text."
+        if self.expected is not None:
+            reason = "%s\n%s" % (reason, self.expected)
         if self.wrap:
             return ("\nMatch failure for pattern:\n"
                     "%s%s\n"
                     "in source text at location\n"
                     "%s\n"
-                    "Reached end of source text."
-                    % (SPC3, self.pattern, self.location))
+                    "%s"
+                    % (SPC3, self.pattern, self.location, reason))
         return ("\n%s\n"
                 "Match failure for pattern:\n"
                 "%s%s\n"
                 "in source text at location\n"
                 "%s\n"
-                "Reached end of source text.\n"
+                "%s\n"
                 "%s"
-                % (self.LINE, SPC3, self.pattern, self.location, self.LINE))
+                % (self.LINE, SPC3, self.pattern, self.location, reason,
+                   self.LINE))
 
 
 class IncompleteParse(PijnuError):
@@ -185,18 +248,24 @@ class IncompleteParse(PijnuError):
         when not whole of text is matched.
         '''
 
-    def __init__(self, pattern, source, pos, result):
-        ''' Record data. '''
+    def __init__(self, pattern, source, pos, result, failure=None):
+        ''' Record data.
+            ~ failure: (wrapped) error for the farthest failure, if any
+        '''
         self.pattern = pattern
         self.source = source
         self.pos = pos
         self.result = result
+        self.failure = failure
 
     def __str__(self):
         ''' failure feedback:
             ~ pattern
-            ~ location '''
+            ~ location
+            ~ farthest failure, if any '''
         self.location = ErrorLocation(self.source, self.pos)
+        failure = "" if self.failure is None \
+                    else "Farthest failure:%s\n" % self.failure
         return ("\n%s\n"
                 "Parse failure for pattern\n"
                 "%s%s\n"
@@ -206,10 +275,12 @@ class IncompleteParse(PijnuError):
                 "Partial result is\n"
                 "%s%s\n"
                 "%s"
+                "%s"
                 % (self.LINE,
                   SPC3, self.pattern,
                   self.location,
                   SPC3, self.result,
+                  failure,
                   self.LINE))
 
 
@@ -0,0 +1,417 @@
+# -*- coding: utf8 -*-
+
+'''
+© 2009 Denis Derman (former developer) <denis.spir@gmail.com>
+© 2011 Peter Potrowl (current developer) <peter017@gmail.com>
+
+This file is part of PIJNU.
+
+PIJNU is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PIJNU is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PIJNU: see the file called 'GPL'.
+If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+Incremental
+
+Parse again after an edit of the source, reusing the results
+of the previous parses out of the edited text (see Parser.reparse):
+    tree = parser.reparse(tree, (start, oldEnd, newText))
+yields the tree of parser.parse for the edited source
+    tree.source[:start] + newText + tree.source[oldEnd:]
+
+~ Reparses run in an incremental parse context (given, or one per
+  thread): there, checks of wrapping patterns record their result
+  together with its extent, the end of source text examined
+  (sub patterns included, see Pattern._trackCheck & _reach).
+  No memo store, char map nor regex is used there.
+~ When the tree given is the last one the context yielded,
+  a result of the previous parses is still valid:
+    ~ at a position before the edit, if its extent does not reach
+      the edited text
+    ~ at a position after it, shifted by the change of length
+  Only checks the edit affects run again, eg for a list of items:
+  the edited item, its neighbours & the list itself.
+  Else (other tree, grammar with cuts) the source is parsed in full.
+~ No priming is needed: the first reparse of a tree its context did
+  not yield (eg of a plain parse) parses the new source in full, &
+  seeds the context for the next ones. To seed it at once, parse
+  in the context instead:
+    context = ParseContext(incremental=True)
+    tree = parser.parse(source, context)
+    tree = parser.reparse(tree, edit, context)
+~ Nothing is shifted ahead of use:
+    ~ Entries of previous parses are kept in layers, each one
+      on the source of its parse: a position is translated
+      through the edits since then when looked up (see History).
+      Layers are merged when the newer is not much smaller than
+      the older one: each entry is merged a few times only.
+    ~ A reused node is moved to its new position, but its child
+      nodes follow only when read: until then it is a Shifted node.
+~ The old tree is consumed: its nodes are moved to the new source
+  & reused in the new tree. It must not be used anymore (nodes
+  read through it may be on either source). A reused node is copied
+  only when a choice or option wrapping its pattern has actions,
+  which would change it.
+~ On failure, moved nodes are put back: the old tree is left as it
+  was, & remains the one to reparse. The error raised is the one
+  of a full parse.
+~ Cost: checks run again are the ones of the edited region, & of
+  the lists around it (their items are looked up); nodes are moved
+  when reused or read. Nothing else depends on the size of the
+  tree (see test/reparse.py).
+~ Limitations: results depend on source text only. Actions reading
+  source out of their node, or keeping state between calls, or
+  changing other nodes than their own, may yield trees that differ
+  from a full parse.
+'''
+
+### import/export
+from pattern import Choice, Option, Recursive, Cut
+from node import Node, Nodes
+from error import PijnuError
+from context import ParseContext, running
+from analysis import graphOf
+
+__all__ = ["reparse"]
+
+# slots of nodes, read & written without moving child nodes
+(VALUE, FORM) = (Node.__dict__["value"], Node.__dict__["_form"])
+
+
+def reparse(pattern, oldTree, edit, context=None, patterns=None):
+    ''' Parse source of oldTree after edit (start, oldEnd, newText)
+        with pattern, reusing what is still valid of the previous parses
+        in context (or in the thread's incremental context).
+        ~ oldTree is consumed: its nodes are reused by the new tree.
+        ~ Unless oldTree is the last tree of context (of a parse or
+          reparse there), the new source is parsed in full: this seeds
+          context for the next reparses.
+        ~ patterns: graph of pattern, if already known
+    '''
+    (start, oldEnd, text) = edit
+    oldSource = oldTree.source
+    if not 0 <= start <= oldEnd <= len(oldSource):
+        message = ("Edit (%s, %s) does not fit in source of length %s."
+                   % (start, oldEnd, len(oldSource)))
+        raise ValueError(message)
+    source = oldSource[:start] + text + oldSource[oldEnd:]
+    if context is None:
+        context = running.incremental
+        if context is None:
+            context = running.incremental = ParseContext(incremental=True)
+    if patterns is None:
+        patterns = graphOf(pattern)
+    # entries of previous parses are valid for the last tree only
+    # (with cuts, results also depend on the last cut passed)
+    previous = None
+    if context.incremental and context.tree is oldTree \
+            and not any(isinstance(p, Cut) for p in patterns):
+        history = context.history
+        if history is None:
+            history = context.history = History(oldSource)
+        previous = Previous(history, context.entries, edit, source,
+                            actedOn(patterns))
+    context.incremental = True
+    context.tree = None
+    context.previous = previous
+    try:
+        tree = pattern.parse(source, context)
+    except PijnuError:
+        context.previous = None
+        if previous is not None:
+            previous.revert()
+            context.entries = previous.entries
+            context.tree = oldTree
+        # failures inside reused results were not recorded:
+        # get the error of a full parse
+        return pattern.parse(source, ParseContext())
+    context.previous = None
+    if previous is not None:
+        previous.commit()
+    context.tree = tree
+    return tree
+
+
+def actedOn(patterns):
+    ''' patterns which result node may be changed by the actions
+        of a choice or option wrapping them '''
+    acted = set()
+    for pattern in patterns:
+        if isinstance(pattern, (Choice, Option)) \
+                and pattern.actions is not None:
+            wrapped = list(pattern.wrapped)
+            while wrapped:
+                pattern = wrapped.pop()
+                if pattern not in acted:
+                    acted.add(pattern)
+                    # (nodes passed through as well)
+                    if isinstance(pattern, (Choice, Option, Recursive)):
+                        wrapped.extend(pattern.wrapped)
+    return acted
+
+
+class History(object):
+    ''' sources & edits of the reparses of a context,
+        with entries of the parses before the last one
+        ~ Version n is the source after n edits: edits[n-1]
+          (start, oldEnd, delta) yields it from version n-1.
+        ~ Sources are told by identity: nodes hold theirs alive.
+    '''
+    def __init__(self, source):
+        ''' Define history of source, as version 0. '''
+        # {id(source):version}
+        self.versions = {id(source): 0}
+        self.edits = []
+        # entries of parses before the last one, newest first:
+        # [(tables {pattern:{pos:(result,span)}}, version, size)]
+        self.layers = []
+        # states of nodes moved by the reparse in progress:
+        # [(node, state)] --see Previous.revert
+        self.undo = None
+
+    def translate(self, pos, version, target):
+        ''' position at version target of a node at pos, on version
+            (valid in between: out of the edited texts) '''
+        for (start, oldEnd, delta) in self.edits[version:target]:
+            if pos >= oldEnd:
+                pos += delta
+        return pos
+
+
+class Previous(object):
+    ''' entries of the previous parses, after an edit of the source
+        of the last one: see lookup
+    '''
+    def __init__(self, history, entries, edit, source, acted):
+        ''' Define history, last parse's entries, edit, new source;
+            record the new version. '''
+        (self.start, self.oldEnd, text) = edit
+        self.newEnd = self.start + len(text)
+        self.delta = self.newEnd - self.oldEnd
+        (self.history, self.entries, self.source) = \
+            (history, entries, source)
+        # patterns which reused nodes are copied --see actedOn
+        self.acted = acted
+        # tables to look up, newest first, with their version
+        history.edits.append((self.start, self.oldEnd, self.delta))
+        self.version = len(history.edits)
+        self.layers = [(entries, self.version - 1)] \
+                      + [layer[:2] for layer in history.layers]
+        # (an empty edit may yield the very same source)
+        self.replaced = history.versions.get(id(source))
+        history.versions[id(source)] = self.version
+        history.undo = []
+
+    def lookup(self, pattern, pos):
+        ''' Return entry of pattern at pos of new source, if still valid
+            (with result moved to new source), else None.
+            ~ The position is translated back through the edits to
+              the version of each layer, newest first: the extent of an
+              entry before an edit must end before it (room).
+        '''
+        edits = self.history.edits
+        (newPos, index, room) = (pos, self.version, None)
+        for (tables, version) in self.layers:
+            while index > version:
+                index -= 1
+                (start, oldEnd, delta) = edits[index]
+                if pos < start:
+                    if room is None or start - pos < room:
+                        room = start - pos
+                elif pos >= oldEnd + delta:
+                    pos -= delta
+                else:
+                    return None
+            table = tables.get(pattern)
+            if table is None:
+                continue
+            entry = table.get(pos)
+            if entry is None:
+                continue
+            if room is not None and entry[1] > room:
+                return None
+            result = entry[0]
+            if isinstance(result,Node) and result.source is not self.source:
+                if pattern in self.acted:
+                    return (self.copy(result, newPos), entry[1])
+                self.history.undo.append((result, stateOf(result)))
+                shift(result, newPos - result.start, self.source,
+                      self.history)
+            return entry
+        return None
+
+    def copy(self, node, pos):
+        ''' Copy of node at pos of new source
+            (child nodes are shared, & moved when read). '''
+        new = Node.__new__(Node)
+        (new.tag, new.pattern, new.kind) = (node.tag, node.pattern, node.kind)
+        (new.source, new.start, new.end) = (node.source, node.start, node.end)
+        (value, form) = (VALUE.__get__(node, Node), FORM.__get__(node, Node))
+        new.value = copies(value)
+        new._form = new.value if form is value else copies(form)
+        if node.__dict__:
+            new.__dict__.update(node.__dict__)
+            if "_shift" in new.__dict__:
+                new.__class__ = Shifted
+        shift(new, pos - new.start, self.source, self.history)
+        return new
+
+    def revert(self):
+        ''' Put moved nodes back & forget the edit (reparse failed). '''
+        history = self.history
+        for (node, state) in reversed(history.undo):
+            (node.__class__, node.source, node.start, node.end, moving) = \
+                state
+            if moving is not None:
+                node._shift = moving
+            elif hasattr(node, "_shift"):
+                del node._shift
+        history.undo = None
+        history.edits.pop()
+        if self.replaced is None:
+            del history.versions[id(self.source)]
+        else:
+            history.versions[id(self.source)] = self.replaced
+
+    def commit(self):
+        ''' Keep entries of the previous parse as the newest layer
+            below the ones of the new parse (reparse succeeded);
+            merge layers while the newer is not much smaller. '''
+        history = self.history
+        history.undo = None
+        size = sum(len(table) for table in self.entries.itervalues())
+        layers = [(self.entries, self.version - 1, size)] + history.layers
+        while len(layers) > 1 and 2 * layers[0][2] >= layers[1][2]:
+            layers[:2] = [self.merge(layers[1], layers[0])]
+        history.layers = layers
+
+    def merge(self, older, newer):
+        ''' Add entries of layer older still valid at the version of
+            layer newer to its own (the newer ones prevail). '''
+        (tables, version, size) = newer
+        edits = self.history.edits[older[1]:version]
+        for (pattern, table) in older[0].iteritems():
+            into = tables.get(pattern)
+            if into is None:
+                into = tables[pattern] = dict()
+            for (pos, entry) in table.iteritems():
+                span = entry[1]
+                for (start, oldEnd, delta) in edits:
+                    if pos >= oldEnd:
+                        pos += delta
+                    elif pos + span > start or pos == start:
+                        break
+                else:
+                    if pos not in into:
+                        into[pos] = entry
+                        size += 1
+        return (tables, version, size)
+
+
+def copies(value):
+    ''' value, or copy of a sequence of child nodes '''
+    if not isinstance(value, Nodes):
+        return value
+    nodes = Nodes.__new__(Nodes)
+    list.extend(nodes, value)
+    return nodes
+
+
+def stateOf(node):
+    ''' what moving node changes (see Previous.revert) '''
+    moving = node._shift if node.__class__ is Shifted else None
+    return (node.__class__, node.source, node.start, node.end, moving)
+
+
+def shift(node, delta, source, history):
+    ''' Move node by delta, to source of history;
+        its child nodes follow when read (see Shifted). '''
+    if node.__class__ is Node and (
+            isinstance(VALUE.__get__(node, Node), Nodes)
+            or isinstance(FORM.__get__(node, Node), Nodes)):
+        # child nodes are on the version of node, at its start
+        node._shift = (history, history.versions.get(id(node.source)),
+                       node.start)
+        node.__class__ = Shifted
+    node.source = source
+    node.start += delta
+    node.end += delta
+
+
+def settle(node):
+    ''' Move child nodes of a shifted node to its source:
+        it is a plain node again. '''
+    (history, version, base) = node._shift
+    if history.undo is not None:
+        history.undo.append((node, stateOf(node)))
+    del node._shift
+    node.__class__ = Node
+    (source, delta, target) = (node.source, node.start - base, None)
+    value = VALUE.__get__(node, Node)
+    form = FORM.__get__(node, Node)
+    for nodes in (value, form) if form is not value else (value,):
+        if not isinstance(nodes, Nodes):
+            continue
+        for child in nodes:
+            if not isinstance(child, Node) or child.source is source:
+                continue
+            childVersion = history.versions.get(id(child.source))
+            if childVersion == version:
+                childDelta = delta
+            else:
+                # child moved on its own since (or not of this history)
+                if target is None:
+                    target = history.versions.get(id(source))
+                if childVersion is None or target is None \
+                        or childVersion > target:
+                    continue
+                childDelta = history.translate(child.start, childVersion,
+                                               target) - child.start
+            if history.undo is not None:
+                history.undo.append((child, stateOf(child)))
+            shift(child, childDelta, source, history)
+
+
+class Shifted(Node):
+    ''' node moved to a new source, which child nodes are not on yet:
+        they are moved when read (value & form)
+        ~ node._shift: (history, version, start) of node when its
+          child nodes were last on its source
+    '''
+    __slots__ = ()
+
+    @property
+    def value(self):
+        settle(self)
+        return self.value
+
+    @value.setter
+    def value(self, value):
+        settle(self)
+        self.value = value
+
+    @property
+    def _form(self):
+        settle(self)
+        return self._form
+
+    @_form.setter
+    def _form(self, form):
+        settle(self)
+        self._form = form
+
+    def __reduce_ex__(self, protocol):
+        ''' (pickle & copy of the plain node) '''
+        settle(self)
+        return self.__reduce_ex__(protocol)
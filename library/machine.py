@@ -0,0 +1,634 @@
+# -*- coding: utf8 -*-
+
+'''
+© 2009 Denis Derman (former developer) <denis.spir@gmail.com>
+© 2011 Peter Potrowl (current developer) <peter017@gmail.com>
+
+This file is part of PIJNU.
+
+PIJNU is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PIJNU is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PIJNU: see the file called 'GPL'.
+If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+Machine
+
+    An alternative engine for pattern matching.
+    The pattern graph is compiled into a flat instruction array,
+    then run in a single dispatch loop with an explicit stack of frames
+    (instead of recursive _memoCheck --> _realCheck method calls).
+
+    ~ Terminal patterns (Word, Char, Klass, String, AnyChar) are checked
+      inline, directly inside the loop, as well as patterns lowered
+      to a regex (see module analysis).
+    ~ Each wrapping pattern (Sequence, Choice, Option, repetitions,
+      Next, NextNot, Until, Recursive) gets its own block of instructions.
+    ~ A call pushes a frame holding caller's registers:
+      return address, pattern index, start & current position,
+      child nodes and repetition count.
+      Backtracking simply means restoring a frame's position.
+    ~ The stack is a list on the heap: nesting depth of the source
+      is only limited by memory, not by Python's recursion limit.
+    ~ Results are memoized like the interpreter does (packrat),
+      so that both engines yield the very same trees.
+    ~ Failures are recorded like the interpreter does as well
+      (farthest position, choice dispatch, lookaheads),
+      so that both engines raise the very same errors.
+    ~ Match state lives in a parse context, shared with patterns
+      checked by the interpreter (see module context):
+      one machine can be run by several threads at once.
+    ~ Pattern types unknown to the machine, and untils of strings,
+      are checked through their own _memoCheck method.
+      Lowered patterns that fail are checked again by _realCheck
+      to record expected patterns (regular sub-graphs do not nest).
+
+    Usage:
+        machine = parser.compile()      # or Machine(pattern)
+        tree = machine.parse(source)
+'''
+
+
+### import/export
+from tools import *
+from pattern import *
+from context import running
+# failure sentinel of the interpreter (FAIL is an opcode here)
+from error import FAIL as FAILED
+
+__all__ = ["Machine"]
+
+
+### instruction codes
+# Every instruction is a pair of items in code array: (opcode, argument).
+(
+    CALL,       # check pattern #arg at current position --> result
+    JUMPOK,     # jump to arg if result is a node
+    JUMPFAIL,   # jump to arg if result is a failure
+    JUMP,       # jump to arg
+    APPEND,     # append result to child nodes & move on
+    JUMPCOUNT,  # jump to arg if count reached repetition's numMax
+    SKIP,       # skip choice's alternative #arg if dispatch excludes it
+    LOOKIN,     # enter lookahead: failures are not recorded
+    LOOKOUT,    # leave lookahead
+    UNTIL,      # wrap child nodes into until's repetition node,
+                # or jump to arg if count is below numMin
+    ACT,        # apply pattern's actions to result,
+                # or jump to arg if they invalidate it
+    BRANCH,     # return branch node of child nodes
+    REPEAT,     # return branch node if count >= arg, else fail
+    PASS,       # return result as is
+    NIL,        # return nil node
+    FAIL,       # return failure, recorded according to arg (see below)
+    HALT,       # stop machine, output result
+) = range(17)
+
+# kinds of pattern for CALL
+# (CALL records failures of kinds up to ANY: others record their own)
+(WRAPPER, WORD, CHAR, KLASS, ANY, STRING, REGEX, OTHER) = range(8)
+
+# failures recorded by FAIL, as the interpreter does
+(
+    SELF,           # pattern itself at start (lookaheads)
+    ALTERNATIVES,   # choice's alternatives skipped by dispatch
+    STOP,           # until's stop at current position
+) = range(1, 4)
+
+# result of a failed check (memo holds it as well)
+FAILURE = None
+# memo lookup default
+UNKNOWN = object()
+
+
+class Machine(object):
+    ''' compiled pattern matching machine
+        ~ Built from a pattern (or from an object holding a top pattern,
+          such as a parser).
+        ~ Provides the same match methods as patterns.
+    '''
+
+    def __init__(self, pattern):
+        ''' Compile pattern graph. '''
+        self.pattern = getattr(pattern, "topPattern", pattern)
+        # pattern registry: index <--> pattern
+        self.patterns = []
+        self.indexes = {}
+        # per pattern data, by index
+        self.kinds = []
+        self.entries = []
+        self.looks = []         # lookahead?
+        self.skips = []         # choice's dispatch, by alternative number
+        # instruction array, starting with machine's "driver":
+        # call top pattern, then stop
+        self.code = [CALL, 0, HALT, None]
+        self._register(self.pattern)
+        self._compileAll()
+
+    ### compilation
+    def _register(self, pattern):
+        ''' Record pattern & return its index. '''
+        key = id(pattern)
+        if key in self.indexes:
+            return self.indexes[key]
+        index = len(self.patterns)
+        self.indexes[key] = index
+        self.patterns.append(pattern)
+        self.kinds.append(None)
+        self.entries.append(None)
+        self.looks.append(isinstance(pattern, (Next, NextNot)))
+        self.skips.append(None)
+        return index
+
+    def _compileAll(self):
+        ''' Compile every registered pattern
+            (the list grows as wrapped patterns are discovered). '''
+        index = 0
+        while index < len(self.patterns):
+            self._compile(index)
+            index += 1
+
+    def _compile(self, index):
+        ''' Define pattern kind & write pattern's instructions if needed. '''
+        pattern = self.patterns[index]
+        code = self.code
+        entry = len(code)
+        # terminal patterns are checked inline by CALL
+        typ = type(pattern)
+        if typ is Cut:
+            message = "The machine does not support cut patterns."
+            raise PijnuError(message)
+        if pattern.regex is not None:
+            self.kinds[index] = REGEX
+            return
+        if typ is Word:
+            self.kinds[index] = WORD
+            return
+        if typ is Char:
+            self.kinds[index] = CHAR
+            return
+        if typ is Klass:
+            self.kinds[index] = KLASS
+            return
+        if typ is String:
+            self.kinds[index] = STRING
+            return
+        if typ is AnyChar and AnyChar.KLASS is None:
+            self.kinds[index] = ANY
+            return
+        # wrapping patterns
+        self.kinds[index] = WRAPPER
+        self.entries[index] = entry
+        if typ is Sequence:
+            fixups = []
+            for p in pattern.patterns:
+                code.extend((CALL, self._register(p), JUMPFAIL, None))
+                fixups.append(len(code) - 1)
+                code.extend((APPEND, None))
+            code.extend((BRANCH, None))
+            self._fix(fixups, len(code))
+            code.extend((FAIL, None))
+        elif typ is Choice:
+            (fixups, starts) = ([], [])
+            dispatch = pattern.dispatch
+            if dispatch is not None:
+                self.skips[index] = self._skips(pattern)
+            for (number, p) in enumerate(pattern.patterns):
+                starts.append(len(code))
+                if dispatch is not None:
+                    code.extend((SKIP, number))
+                code.extend((CALL, self._register(p), JUMPOK, None))
+                fixups.append(len(code) - 1)
+            starts.append(len(code))
+            code.extend((FAIL, None if dispatch is None else ALTERNATIVES))
+            if pattern.actions is None:
+                self._fix(fixups, len(code))
+                code.extend((PASS, None))
+            else:
+                # actions invalidating an alternative's result:
+                # try the next one
+                for (number, place) in enumerate(fixups):
+                    code[place] = len(code)
+                    code.extend((ACT, starts[number + 1], PASS, None))
+        elif typ is Option:
+            # (actions invalidating wrapped pattern's result: nil node)
+            if pattern.actions is None:
+                code.extend((CALL, self._register(pattern.pattern),
+                             JUMPOK, len(code) + 6, NIL, None, PASS, None))
+            else:
+                code.extend((CALL, self._register(pattern.pattern),
+                             JUMPOK, len(code) + 6, NIL, None,
+                             ACT, len(code) + 4, PASS, None))
+        elif typ is Next:
+            code.extend((CALL, self._register(pattern.pattern),
+                         JUMPFAIL, len(code) + 6, NIL, None, FAIL, SELF))
+        elif typ is NextNot:
+            code.extend((CALL, self._register(pattern.pattern),
+                         JUMPOK, len(code) + 6, NIL, None, FAIL, SELF))
+        elif typ is Until and not isinstance(pattern.pattern, String):
+            # stop is checked as a lookahead before each item
+            (item, stop) = (self._register(pattern.item),
+                            self._register(pattern.stop))
+            loop = len(code)
+            fixups = []
+            if pattern.numMax:
+                code.extend((JUMPCOUNT, None))
+                fixups.append(len(code) - 1)
+            code.extend((LOOKIN, None, CALL, stop, LOOKOUT, None,
+                         JUMPOK, None))
+            fixups.append(len(code) - 1)
+            code.extend((CALL, item, JUMPFAIL, None, APPEND, None,
+                         JUMP, loop))
+            fixups.append(len(code) - 5)
+            self._fix(fixups, len(code))
+            # then stop must match
+            end = len(code)
+            code.extend((UNTIL, end + 10, CALL, stop, JUMPFAIL, end + 12,
+                         APPEND, None, BRANCH, None,
+                         FAIL, None, FAIL, STOP))
+        elif typ in (ZeroOrMore, OneOrMore, Repetition):
+            child = self._register(pattern.pattern)
+            if typ is ZeroOrMore:
+                (numMin, numMax) = (False, False)
+            elif typ is OneOrMore:
+                (numMin, numMax) = (1, False)
+            else:
+                (numMin, numMax) = (pattern.numMin, pattern.numMax)
+            loop = len(code)
+            code.extend((CALL, child, JUMPFAIL, None, APPEND, None))
+            fixups = [len(code) - 3]
+            if numMax:
+                code.extend((JUMPCOUNT, None))
+                fixups.append(len(code) - 1)
+            code.extend((JUMP, loop))
+            self._fix(fixups, len(code))
+            code.extend((REPEAT, numMin or 0))
+        elif typ is Recursive or typ is AnyChar:
+            # both simply pass wrapped pattern's result
+            wrapped = pattern.pattern if typ is Recursive else AnyChar.KLASS
+            code.extend((CALL, self._register(wrapped), PASS, None))
+        else:
+            # unknown pattern type: checked by the interpreter
+            self.kinds[index] = OTHER
+            self.entries[index] = None
+
+    def _fix(self, fixups, target):
+        ''' Set jump target of pending jump instructions. '''
+        for place in fixups:
+            self.code[place] = target
+
+    @staticmethod
+    def _skips(choice):
+        ''' Choice's dispatch as numbers of alternatives to try:
+            ({char:numbers}, numbers at end of source)
+            (see analysis.selectDispatch)
+        '''
+        def numbers(alternatives):
+            return frozenset(number for (number, pattern)
+                             in enumerate(choice.patterns)
+                             if pattern in alternatives)
+        table = dict((char, numbers(alternatives))
+                     for (char, alternatives) in choice.dispatch.items())
+        return (table, numbers(choice.dispatchEnd))
+
+    ### running
+    def _run(self, source, pos, memo):
+        ''' Check pattern at pos in source.
+            Return result node or FAILURE.
+        '''
+        code = self.code
+        patterns = self.patterns
+        kinds = self.kinds
+        entries = self.entries
+        looks = self.looks
+        skips = self.skips
+        length = len(source)
+        context = running.context
+        stack = []
+        # registers
+        pc = 0              # program counter
+        index = None        # current pattern index
+        start = pos         # current pattern start
+        children = None     # child nodes
+        count = 0           # repetition count
+        result = FAILURE    # last check result
+        op, arg = code[0], code[1]
+        while True:
+            if op == CALL:
+                # memoized result? (tables are made at first call)
+                table = memo[arg]
+                if table is None:
+                    table = memo[arg] = {}
+                result = table.get(pos, UNKNOWN)
+                if result is UNKNOWN:
+                    kind = kinds[arg]
+                    # case wrapping pattern: push frame, jump to entry
+                    if kind == WRAPPER:
+                        stack.append((pc, index, start, pos, children, count))
+                        (index, start, children, count) = (arg, pos, None, 0)
+                        if looks[index]:
+                            context.lookahead += 1
+                        pc = entries[arg]
+                        op, arg = code[pc], code[pc + 1]
+                        continue
+                    # case terminal pattern: check inline
+                    result = FAILURE
+                    pattern = patterns[arg]
+                    try:
+                        if kind == WORD:
+                            if pos < length:
+                                end = pos + pattern.length
+                                if source[pos:end] == pattern.word:
+                                    result = Node(pattern, pattern.word,
+                                                  pos, end, source)
+                        elif kind == CHAR:
+                            if pos < length and source[pos] == pattern.char:
+                                result = Node(pattern, pattern.char,
+                                              pos, pos + 1, source)
+                        elif kind == KLASS:
+                            if pos < length:
+                                char = source[pos]
+                                if char in pattern.charset.ascii or \
+                                        (char > '\x7f'
+                                         and char in pattern.charset):
+                                    result = Node(pattern, char,
+                                                  pos, pos + 1, source)
+                        elif kind == STRING:
+                            result = self._string(pattern, source, pos)
+                        elif kind == REGEX:
+                            result = self._regex(pattern, source, pos)
+                        elif kind == ANY:
+                            if pos < length:
+                                result = Node(pattern, source[pos],
+                                              pos, pos + 1, source)
+                        else:
+                            result = pattern._memoCheck(source, pos)
+                            if not isinstance(result, Node):
+                                # (top pattern's invalidation is raised)
+                                result = FAILURE if stack \
+                                         or result is FAILED else result
+                        if result is FAILURE and kind <= ANY:
+                            pattern._fail(pos)
+                    except Invalidation, error:
+                        result = FAILURE if stack else error
+                    table[pos] = result
+                pc += 2
+            elif op == SKIP:
+                (table, atEnd) = skips[index]
+                numbers = table.get(source[pos], None) if pos < length \
+                          else atEnd
+                if numbers is None or arg in numbers:
+                    pc += 2
+                else:
+                    # jump over CALL & JUMPOK
+                    pc += 6
+            elif op == LOOKIN:
+                context.lookahead += 1
+                pc += 2
+            elif op == LOOKOUT:
+                context.lookahead -= 1
+                pc += 2
+            elif op == UNTIL:
+                pattern = patterns[index]
+                if pattern.numMin and count < pattern.numMin:
+                    pattern._fail(pos)
+                    pc = arg
+                else:
+                    if children is None:
+                        children = Nodes()
+                    try:
+                        children = Nodes(Node(pattern.pattern, children,
+                                              start, pos, source))
+                        pc += 2
+                    except Invalidation:
+                        pc = arg
+            elif op == ACT:
+                try:
+                    result.doActions(patterns[index].actions)
+                    pc += 2
+                except Invalidation:
+                    result = FAILURE
+                    pc = arg
+            elif op == JUMPFAIL:
+                pc = arg if result is FAILURE else pc + 2
+            elif op == JUMPOK:
+                pc = pc + 2 if result is FAILURE else arg
+            elif op == APPEND:
+                if children is None:
+                    children = Nodes()
+                children.append(result)
+                pos = result.end
+                count += 1
+                pc += 2
+            elif op == JUMP:
+                pc = arg
+            elif op == JUMPCOUNT:
+                pc = arg if count == patterns[index].numMax else pc + 2
+            elif op == HALT:
+                return result
+            else:
+                # return instructions
+                pattern = patterns[index]
+                if looks[index]:
+                    context.lookahead -= 1
+                try:
+                    if op == BRANCH:
+                        if children is None:
+                            children = Nodes()
+                        result = Node(pattern, children, start, pos, source)
+                    elif op == PASS:
+                        pass
+                    elif op == NIL:
+                        result = Node(pattern, Node.NIL, start, start, source)
+                    elif op == REPEAT:
+                        if count < arg:
+                            result = FAILURE
+                        else:
+                            if children is None:
+                                children = Nodes()
+                            result = Node(pattern, children, start, pos,
+                                          source)
+                    else:   # FAIL
+                        result = FAILURE
+                        if arg is not None:
+                            self._record(arg, pattern, source, start, pos)
+                except Invalidation, error:
+                    # (top pattern's invalidation is raised)
+                    result = FAILURE if len(stack) > 1 else error
+                memo[index][start] = result
+                # pop frame --> caller's registers
+                (pc, index, start, pos, children, count) = stack.pop()
+                pc += 2
+            op, arg = code[pc], code[pc + 1]
+
+    @staticmethod
+    def _string(pattern, source, pos):
+        ''' String pattern check -- same as String._realCheck. '''
+        length = len(source)
+        numMin = pattern.numMin
+        if pos >= length:
+            if numMin:
+                pattern._fail(pos)
+                return FAILURE
+            return Node(pattern, Node.NIL, pos, pos, source)
+        numMax = pattern.numMax
+        stopPos = pos + numMax if numMax and pos + numMax <= length \
+                  else length
+        startPos = pos
+        pos = pattern.charset.span(source, pos, stopPos)
+        if numMin and pos - startPos < numMin:
+            pattern._fail(pos)
+            return FAILURE
+        return Node(pattern, source[startPos:pos], startPos, pos, source)
+
+    @staticmethod
+    def _regex(pattern, source, pos):
+        ''' Lowered pattern check -- same as Pattern._regexCheck.
+            ~ On failure (or when regexes are off), the interpreter
+              checks pattern again to record expected patterns.
+        '''
+        context = running.context
+        if not context.regexOff:
+            match = pattern.regex.match(source, pos)
+            if match is not None:
+                context.regexMatched = True
+                end = match.end()
+                # (an empty string is nil at end of text only)
+                value = source[pos:end] if end > pos \
+                        or (type(pattern) is String and pos < len(source)) \
+                        else Node.NIL
+                return Node(pattern, value, pos, end, source)
+            if context.lookahead:
+                return FAILURE
+        result = pattern._realCheck(source, pos)
+        if isinstance(result, Node):
+            return result
+        return FAILURE
+
+    @staticmethod
+    def _record(mode, pattern, source, start, pos):
+        ''' Record failure of pattern according to mode
+            -- same as the interpreter. '''
+        if mode == SELF:
+            pattern._fail(start)
+        elif mode == STOP:
+            pattern.stop._fail(pos)
+        elif running.context.lookahead == 0 \
+                and start >= running.context.failure.pos:
+            # ALTERNATIVES: skipped ones were expected as well
+            if start < len(source):
+                tried = pattern.dispatch.get(source[start], pattern.patterns)
+            else:
+                tried = pattern.dispatchEnd
+            for alternative in pattern.patterns:
+                if alternative not in tried:
+                    running.context.failure.record(alternative, start)
+
+    def _newMemo(self, source, context=None):
+        ''' Return fresh memo table slots, one per pattern, & reset match
+            state in context, or in the thread's default one: it becomes
+            the running context (patterns checked by the interpreter use it).
+        '''
+        self.pattern._resetMemo(source, context)
+        return [None] * len(self.patterns)
+
+    def _checkAgain(self, source):
+        ''' Check source again without regexes, so that failures
+            inside lowered patterns are recorded too (for errors).
+        '''
+        memo = self._newMemo(source, running.context)
+        context = running.context
+        context.regexOff = True
+        try:
+            return self._run(source, 0, memo)
+        finally:
+            context.regexOff = False
+
+    def _error(self, source, result):
+        ''' Error to raise for failed match outcome result. '''
+        return self.pattern._error(source,
+                                   FAILED if result is FAILURE else result)
+
+    ### match methods
+    def match(self, source, context=None):
+        ''' Match start of source text.
+            Return result tree/node or raise MatchFailure error.
+            ~ State is held by context, or by the thread's default one.
+        '''
+        result = self._run(source, 0, self._newMemo(source, context))
+        if not isinstance(result, Node):
+            if running.context.regexMatched:
+                result = self._checkAgain(source)
+            raise self._error(source, result)
+        return result
+
+    def parse(self, source, context=None):
+        ''' Match whole of source text.
+            Return result tree/node or raise MatchFailure error.
+            ~ State is held by context, or by the thread's default one.
+        '''
+        result = self._run(source, 0, self._newMemo(source, context))
+        # case failure or partial match: check again for exact failures
+        if (not isinstance(result, Node) or result.end < len(source)) \
+                and running.context.regexMatched:
+            result = self._checkAgain(source)
+        if not isinstance(result, Node):
+            raise self._error(source, result)
+        pos = result.end
+        if pos == len(source):
+            return result
+        # (farthest failure, if any, tells why)
+        failure = None
+        if running.context.failure.pos >= pos:
+            failure = self._error(source, FAILURE)
+            failure.wrap = True
+        raise IncompleteParse(self.pattern, source, pos, result, failure)
+
+    def findFirst(self, source, context=None):
+        ''' Find & return first match for pattern in source.
+            ~ case no match found, return None
+        '''
+        memo = self._newMemo(source, context)
+        context = running.context
+        for pos in range(len(source)):
+            result = self._run(source, pos, memo)
+            if isinstance(result, Node):
+                return result
+            context.cutPosition = 0
+        return None
+
+    def findAll(self, source, context=None):
+        ''' Find & return all matches for pattern in source.
+            ~ See Pattern.findAll.
+        '''
+        memo = self._newMemo(source, context)
+        context = running.context
+        nodes = Seq()
+        length = len(source)
+        pos = 0
+        while pos < length:
+            node = self._run(source, pos, memo)
+            if not isinstance(node, Node):
+                context.cutPosition = 0
+                pos += 1
+            elif node.value == Node.NIL:
+                pos += 1
+            else:
+                pos = node.end
+                nodes.append(node)
+        return nodes
+
+    ### output
+    def __str__(self):
+        ''' machine's output form '''
+        return "<Machine for %s: %s patterns, %s instructions>" \
+               % (self.pattern, len(self.patterns), len(self.code) // 2)
@@ -0,0 +1,226 @@
+# -*- coding: utf8 -*-
+
+'''
+© 2009 Denis Derman (former developer) <denis.spir@gmail.com>
+© 2011 Peter Potrowl (current developer) <peter017@gmail.com>
+
+This file is part of PIJNU.
+
+PIJNU is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PIJNU is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PIJNU: see the file called 'GPL'.
+If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+Memo
+
+Compact memo tables, an alternative to per-pattern memo dicts.
+(used when Pattern.DENSE_MEMO is set)
+
+~ A memo store is created for each source by _resetMemo,
+  & held by the parse context (see module context).
+  It gives every memoïzed pattern a table for this source,
+  at pattern's first check.
+~ Outcomes are kept sparse: positions checked in a sorted array,
+  & their outcomes (node, FAIL or error) in a parallel list.
+  A pattern is checked at few positions of a source, in general:
+  memory does not depend on source length, but on outcomes (about
+  16 bytes each, against 50 or more in a dict with its int keys).
+~ Failures are the bulk of outcomes of many patterns: once they
+  are dense enough (more than one per 128 chars), they are packed
+  as bits, one per position of source (see FAILURE_DENSITY).
+~ Outcomes behind a cut are dropped (see pattern type Cut).
+
+The tables support the mapping protocol used by _memoCheck:
+    pos in memo / memo[pos] / memo[pos] = result
+Memory use is reported by the store, see size() & __str__.
+'''
+
+### import/export
+from array import array
+from bisect import bisect_left
+from itertools import islice
+from sys import getsizeof
+from error import FAIL
+
+__all__ = ["MemoStore", "MemoTable"]
+
+# failures are packed as bits when more than 1 per FAILURE_DENSITY chars
+# (then bits take less memory than sparse entries: 1/8 byte per char,
+# against 16 bytes per entry)
+FAILURE_DENSITY = 128
+
+# no outcome at position
+MISSING = object()
+
+
+class MemoTable(object):
+    ''' memo table for one pattern & source: sparse outcomes,
+        failures packed as bits when dense
+    '''
+    __slots__ = ("pattern", "source", "positions", "results", "bits",
+                 "failures", "cleared", "found")
+
+    def __init__(self, pattern, source):
+        ''' Define pattern, source & empty table. '''
+        self.pattern = pattern
+        self.source = source
+        # sorted positions & their outcomes
+        self.positions = array('l')
+        self.results = []
+        # failure bits, once failures are dense
+        self.bits = None
+        # number of failures (in sparse outcomes, or all in bits)
+        self.failures = 0
+        # outcomes before this position are dropped --see drop
+        self.cleared = 0
+        # last outcome found by __contains__: (pos, result)
+        self.found = (-1, MISSING)
+
+    def _lookup(self, pos):
+        ''' outcome at pos, or MISSING '''
+        bits = self.bits
+        if bits is not None and bits[pos >> 3] & (1 << (pos & 7)):
+            return FAIL
+        positions = self.positions
+        i = bisect_left(positions, pos)
+        if i < len(positions) and positions[i] == pos:
+            return self.results[i]
+        return MISSING
+
+    def __contains__(self, pos):
+        result = self._lookup(pos)
+        self.found = (pos, result)
+        return result is not MISSING
+
+    def __getitem__(self, pos):
+        ''' Memoïzed outcome at pos: node, FAIL or error. '''
+        (found, result) = self.found
+        if found != pos:
+            result = self._lookup(pos)
+        if result is MISSING:
+            raise KeyError(pos)
+        return result
+
+    def __setitem__(self, pos, result):
+        ''' Memoïze outcome at pos. '''
+        self.found = (-1, MISSING)
+        if result is FAIL:
+            self.failures += 1
+            if self.bits is not None:
+                self.bits[pos >> 3] |= 1 << (pos & 7)
+                if pos < self.cleared:
+                    self.cleared = pos
+                return
+        positions = self.positions
+        # (positions are checked mostly in order)
+        if not positions or pos > positions[-1]:
+            positions.append(pos)
+            self.results.append(result)
+        else:
+            i = bisect_left(positions, pos)
+            if i < len(positions) and positions[i] == pos:
+                if self.results[i] is FAIL:
+                    self.failures -= 1
+                self.results[i] = result
+            else:
+                positions.insert(i, pos)
+                self.results.insert(i, result)
+        if result is FAIL and self.bits is None \
+                and self.failures * FAILURE_DENSITY > len(self.source):
+            self._packFailures()
+
+    def _packFailures(self):
+        ''' Move failures from sparse outcomes to bits. '''
+        self.bits = bits = bytearray((len(self.source) >> 3) + 1)
+        (positions, results) = (array('l'), [])
+        for (pos, result) in zip(self.positions, self.results):
+            if result is FAIL:
+                bits[pos >> 3] |= 1 << (pos & 7)
+            else:
+                positions.append(pos)
+                results.append(result)
+        (self.positions, self.results) = (positions, results)
+
+    def drop(self, pos):
+        ''' Forget outcomes at positions before pos.
+            ~ Bits are cleared from the previous drop on only:
+              the cost of drops does not depend on the size of source.
+        '''
+        self.found = (-1, MISSING)
+        i = bisect_left(self.positions, pos)
+        dropped = sum(1 for result in islice(self.results, i)
+                      if result is FAIL)
+        del self.positions[:i]
+        del self.results[:i]
+        bits = self.bits
+        if bits is not None and pos > self.cleared:
+            (first, last) = (self.cleared >> 3, pos >> 3)
+            dropped += sum(bin(byte).count("1") for byte in bits[first:last])
+            bits[first:last] = bytearray(last - first)
+            if last < len(bits):
+                mask = (1 << (pos & 7)) - 1
+                dropped += bin(bits[last] & mask).count("1")
+                bits[last] &= ~mask & 0xff
+        self.cleared = max(self.cleared, pos)
+        self.failures -= dropped
+
+    def __len__(self):
+        ''' number of memoïzed outcomes '''
+        if self.bits is None:
+            return len(self.positions)
+        # (failures are all in bits then)
+        return len(self.positions) + self.failures
+
+    def size(self):
+        ''' memory size of table in bytes
+            (nodes & errors themselves are not counted:
+            they belong to the tree, or are shared)
+        '''
+        size = getsizeof(self) + getsizeof(self.positions) \
+                + getsizeof(self.results)
+        if self.bits is not None:
+            size += getsizeof(self.bits)
+        return size
+
+
+class MemoStore(object):
+    ''' memo tables for all memoïzed patterns, for one source
+    '''
+    def __init__(self, source):
+        ''' Define source & table list. '''
+        self.source = source
+        self.tables = []
+
+    def table(self, pattern):
+        ''' Make & return pattern's new table. '''
+        table = MemoTable(pattern, self.source)
+        self.tables.append(table)
+        return table
+
+    def entries(self):
+        ''' number of memoïzed outcomes in all tables '''
+        return sum(len(table) for table in self.tables)
+
+    def size(self):
+        ''' memory size of all tables in bytes '''
+        return sum(table.size() for table in self.tables)
+
+    def __str__(self):
+        return ("\n=== memo tables:\n"
+                "source length:         %s\n"
+                "tables:                %s\n"
+                "entries:               %s\n"
+                "size (bytes):          %s\n"
+                % (len(self.source), len(self.tables),
+                   self.entries(), self.size()))
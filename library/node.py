@@ -41,6 +41,11 @@ If not, see <http://www.gnu.org/licenses/>.
 
     Notes:
         ~ Holds all useful information, including type & interval in source.
+        ~ Nodes are slotted objects, for parse trees may hold millions:
+          the matched snippet is not stored, but computed on access
+          (see property snippet); the initial value form is a reference
+          to the value the node was created with.
+          Other attributes can still be set on a node (eg by actions).
         ~ Node is a recursive type, i.e. image of a parse tree:
         ~ You can use standard or custom action methods to modify a node.
         ~ Several output formats.
@@ -145,6 +150,10 @@ class Node(object):
             ~ __repr__: type:value format or full output
             ~ treeView: excellent for design/setup/debug
     '''
+    # '__dict__' allows custom attributes;
+    # the dict itself is only created when one is set
+    __slots__ = ("tag", "value", "pattern", "kind",
+                 "source", "start", "end", "_form", "__dict__")
 
     ### output config
     TREE_VIEW = False
@@ -163,16 +172,15 @@ class Node(object):
         # base info
         self.tag = pattern.name         # the most important information?
         self.value = value              # node value -- can be transformed
+        self._form = value              # initial value form (a reference)
 
         # additional info
         self.pattern = pattern          # this node's generator
-        self.form = value               # initial value form -- case doActions
         self.defineKind()               # LEAF / BRANCH
 
         # source
         self.source = source               # whole source text
         self.start, self.end = start, end  # interval in source -- end excluded
-        self.snippet = source[start:end]   # matched source text snippet
 
         # clean up branch node's sequential value
         if self.kind is Node.BRANCH:
@@ -182,6 +190,32 @@ class Node(object):
         if pattern.actions is not None:
             self.doActions(pattern.actions)
 
+    @property
+    def snippet(self):
+        ''' matched source text snippet '''
+        return self.source[self.start:self.end]
+
+    @property
+    def form(self):
+        ''' initial value form, before match actions '''
+        return self._form
+
+    @form.setter
+    def form(self, form):
+        self._form = form
+
+    def __getstate__(self):
+        ''' state for pickle & copy: slots & custom attributes '''
+        state = dict(getattr(self, "__dict__", {}))
+        for name in Node.__slots__[:-1]:
+            if hasattr(self, name):
+                state[name] = getattr(self, name)
+        return state
+
+    def __setstate__(self, state):
+        for (name, value) in state.items():
+            setattr(self, name, value)
+
     def defineKind(self):
         ''' Define node's kind, meaning whether it is
             leaf (single) or branch (sequential).
@@ -197,9 +231,12 @@ class Node(object):
         ''' Clean up branch node's sequential value.
         '''
         # Drop nil values.
+        # (slot read: a reused child node does not move its own
+        # child nodes for that --see Shifted in module incremental)
+        value = Node.value.__get__
         childNodes = Nodes()
         for childNode in self.value:
-            if childNode.value != Node.NIL:
+            if value(childNode) != Node.NIL:
                 childNodes.append(childNode)
         self.value = childNodes
         # If then empty, change kind to LEAF & value to nil.
@@ -253,15 +290,43 @@ class Node(object):
 
     ### output
     def leaf(self):
-        if isinstance(self.value, Nodes):
-            value = ''.join(item.leaf() for item in self.value)
-            return value
-        return self.value
+        if not isinstance(self.value, Nodes):
+            return self.value
+        # (explicit stack: nesting depth is not limited)
+        values = []
+        stack = list(reversed(self.value))
+        while stack:
+            item = stack.pop()
+            if isinstance(item.value, Nodes):
+                stack.extend(reversed(item.value))
+            else:
+                values.append(item.value)
+        return ''.join(values)
 
     def __repr__(self):
         ''' output format "type:value"
+            (explicit stack: nesting depth is not limited)
         '''
-        return "%s:%s" % (self.tag, repr(self.value))
+        texts = []
+        # (isText, item) pairs
+        stack = [(False, self)]
+        while stack:
+            (isText, item) = stack.pop()
+            if isText:
+                texts.append(item)
+            elif not isinstance(item, Node):
+                texts.append(repr(item))
+            elif not isinstance(item.value, Nodes):
+                texts.append("%s:%s" % (item.tag, repr(item.value)))
+            # child nodes in Seq format
+            else:
+                texts.append("%s:[" % item.tag)
+                stack.append((True, "]"))
+                for (number, child) in reversed(list(enumerate(item.value))):
+                    stack.append((False, child))
+                    if number > 0:
+                        stack.append((True, "  "))
+        return "".join(texts)
 
     def __str__(self):
         ''' output format "type:value", or whole information, or treeView(),
@@ -275,47 +340,55 @@ class Node(object):
         return repr(self)
 
     def treeView(self, level=0):
-        ''' recursive tree view
+        ''' tree view
+            (explicit stack: nesting depth is not limited)
         '''
         TAB = "   "
-        indent = level * TAB
-        # format according to WHOLE_INFO
-        if Node.WHOLE_INFO:
-            format = "%s%s:" \
-                     "\n%s%srange: <%s..%s>" \
-                     "\n%s%stext : %s" \
-                     "\n%s%sform : %s" \
-                     "\n%s%svalue: " \
-                    % (indent, self.tag,
-                       indent, TAB, self.start, self.end,
-                       indent, TAB, repr(self.snippet),
-                       indent, TAB, repr(self.form),
-                       indent, TAB)
-            level += 1
-        else:
-            format = "%s%s:" % (indent, self.tag)
-        # value according to LEAF / BRANCH kind
-        if self.kind is Node.LEAF:
-            value = self.value
-        else:
-            value = ""
-            for child in self.value:
-                value += "\n%s" % (child.treeView(level + 1))
+        lines = []
+        stack = [(self, level)]
+        while stack:
+            (node, level) = stack.pop()
+            indent = level * TAB
+            # format according to WHOLE_INFO
+            if Node.WHOLE_INFO:
+                format = "%s%s:" \
+                         "\n%s%srange: <%s..%s>" \
+                         "\n%s%stext : %s" \
+                         "\n%s%sform : %s" \
+                         "\n%s%svalue: " \
+                        % (indent, node.tag,
+                           indent, TAB, node.start, node.end,
+                           indent, TAB, repr(node.snippet),
+                           indent, TAB, repr(node.form),
+                           indent, TAB)
+                level += 1
+            else:
+                format = "%s%s:" % (indent, node.tag)
+            # value according to LEAF / BRANCH kind:
+            # child views follow, one per line
+            if node.kind is Node.LEAF:
+                lines.append("%s%s" % (format, node.value))
+            else:
+                lines.append(format)
+                stack.extend((child, level + 1)
+                             for child in reversed(node.value))
         # whole tree
-        return "%s%s" % (format, value)
+        return "\n".join(lines)
 
     def leaves(self):
-        '''Recursively returns the leaves of the node tree'''
-        if self.kind is Node.LEAF:
-            value = self.value
-        else:
-            value = ""
-            for child in self.value:
-                if isinstance(child, Node):
-                    value += "%s" % (child.leaves())
-                else:
-                    value += "%s" % child
-        return "%s" % (value)
+        '''Returns the leaves of the node tree
+           (explicit stack: nesting depth is not limited)'''
+        texts = []
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if not isinstance(item, Node):
+                texts.append("%s" % item)
+            elif item.kind is Node.LEAF:
+                texts.append("%s" % item.value)
+            else:
+                stack.extend(reversed(item.value))
+        return "".join(texts)
 
 ################## match actions ####################
 ### debug
@@ -457,16 +530,23 @@ def toLeaves(node):
     '''
     if node.kind is Node.LEAF:
         return
-    childNodes = Nodes()
-    for childNode in node.value:
-        # recursion: first doActions branch child to leaves itself
-        if childNode.kind == Node.LEAF:
-            childNodes.append(childNode)
-        # recursion: first doActions branch child to leaves itself
+    # explicit stack of (branch node, its leaves, remaining children):
+    # nesting depth is not limited
+    stack = [(node, Nodes(), iter(node.value))]
+    while stack:
+        (branch, childNodes, children) = stack[-1]
+        for childNode in children:
+            if childNode.kind == Node.LEAF:
+                childNodes.append(childNode)
+            # first set branch child to leaves itself
+            else:
+                stack.append((childNode, Nodes(), iter(childNode.value)))
+                break
         else:
-            toLeaves(childNode)
-            childNodes.extend(childNode.value)
-    node.value = childNodes
+            stack.pop()
+            branch.value = childNodes
+            if stack:
+                stack[-1][1].extend(childNodes)
 
 
 def intoList(node):
@@ -41,6 +41,13 @@ from tools import *
 # needed to tests
 from pattern import *
 from error import PijnuError
+from machine import Machine
+from tree import Tree
+from batch import parseMany
+from incremental import reparse
+from tail import iterparse, CHUNK_SIZE
+from analysis import graphOf, selectMemo, selectDispatch, selectRegex
+from collections import defaultdict
 
 
 class State(object):
@@ -82,6 +89,17 @@ class Parser(object):
     # attributes:   grammarTitle, fileName, topPatternName,
     #               and every pattern.
 
+    ### config
+    # memoïze only patterns that may be checked twice at the same position
+    # (see module analysis)
+    SELECTIVE_MEMO = True
+    # let choices skip alternatives that cannot start with current char
+    # (see module analysis)
+    FIRST_DISPATCH = True
+    # match regular sub-graphs with compiled regexes
+    # (see module analysis)
+    LOWER_REGEX = True
+
     ### creation
 
     def __init__(self, scope=None,
@@ -111,8 +129,12 @@ class Parser(object):
         # additional info
         self.fileName = fileName
         self.grammarTitle = grammarTitle
+        # digest of grammar text, set by generated parsers
+        self.grammarHash = None
         # state -- for context-dependant operations
         self.state = State()
+        # rule functions -- see _setRules
+        self.rules = None
 
     def _recordPatterns(self, scope):
         ''' Collect and name patterns found in given scope.
@@ -128,6 +150,11 @@ class Parser(object):
 
     def _setTopPattern(self, topPatternName):
         ''' Define parser's top pattern.
+            ~ Record the flat registry of patterns in its graph,
+              walked once for the analysis passes & tools.
+            ~ Then select patterns needing memoïzation,
+              set choice dispatch tables & lower regular patterns
+              to regexes, if config says so.
         '''
         try:
             self.topPattern = getattr(self, topPatternName)
@@ -135,21 +162,55 @@ class Parser(object):
         except (AttributeError, TypeError):
             message = "Cannot find top pattern called '%s'." % topPatternName
             raise PijnuError(message)
+        self.registry = graphOf(self.topPattern)
+        if Parser.SELECTIVE_MEMO:
+            selectMemo(self.topPattern, self.registry)
+        if Parser.FIRST_DISPATCH:
+            selectDispatch(self.topPattern, self.registry)
+        if Parser.LOWER_REGEX:
+            selectRegex(self.topPattern, self.registry)
+
+    def _setRules(self, rules):
+        ''' Record rule functions {name:function} written by the generator.
+            ~ Then match & parse use the top pattern's rule function
+              instead of the patterns themselves.
+            ~ See generator module ruleCode.
+        '''
+        self.rules = rules
+
+    def _ruleCheck(self, source, method_name, context=None):
+        ''' Match source using top pattern's rule function.
+            ~ Patterns checked by their own methods (inside rule functions)
+              use context, or the thread's default one.
+            ~ On failure, run top pattern's own method,
+              which yields the detailed error.
+        '''
+        context = self.topPattern._resetMemo(source, context)
+        rule = self.rules[self.topPattern.name]
+        node = rule(source, 0, defaultdict(dict))
+        if node is not None:
+            if method_name == "match" or node.end == len(source):
+                return node
+        return getattr(self.topPattern, method_name)(source, context)
 
     ### parser match & test methods
     # --> delegate to top pattern
     # ~ A top pattern must have been defined...
     # ~ ...or pattern methods can be directly invoked.
-    def match(self, source):
+    def match(self, source, context=None):
         ''' Match start of source text against parser's top pattern.
             Return result tree/node or raise Failure error.
+            ~ State is held by context, or by the thread's default one
+              (see module context): one parser may serve several threads.
         '''
         if not self.canMatch:
             message = "This parser cannot match directly (yet).\n" \
                         "Either first define a top pattern\n" \
                         "or invoke one of its pattern attributes."
             raise AttributeError(message)
-        return self.topPattern.match(source)
+        if self.rules is not None:
+            return self._ruleCheck(source, "match", context)
+        return self.topPattern.match(source, context)
 
     def matchTest(self, source):
         ''' Match in test mode.
@@ -159,18 +220,28 @@ class Parser(object):
                         "Either first define a top pattern\n" \
                         "or invoke one of its pattern attributes."
             raise AttributeError(message)
+        if self.rules is not None:
+            try:
+                return self.match(source)
+            except PijnuError, e:
+                print (e)
+                return None
         return self.topPattern.matchTest(source)
 
-    def parse(self, source):
+    def parse(self, source, context=None):
         ''' Match whole of source text against parser's top pattern.
             Return result tree/node or raise Failure error.
+            ~ State is held by context, or by the thread's default one
+              (see module context): one parser may serve several threads.
         '''
         if not self.canMatch:
             message = "This parser cannot match directly (yet).\n" \
                         "Either first define a top pattern\n" \
                         "or invoke one of its pattern attributes."
             raise AttributeError(message)
-        return self.topPattern.parse(source)
+        if self.rules is not None:
+            return self._ruleCheck(source, "parse", context)
+        return self.topPattern.parse(source, context)
 
     def parseTest(self, source):
         ''' Parse in test mode.
@@ -180,9 +251,15 @@ class Parser(object):
                         "Either first define a top pattern\n" \
                         "or invoke one of its pattern attributes."
             raise AttributeError(message)
+        if self.rules is not None:
+            try:
+                return self.parse(source)
+            except PijnuError, e:
+                print (e)
+                return None
         return self.topPattern.parseTest(source)
 
-    def findAll(self, source):
+    def findAll(self, source, context=None):
         ''' Find & return all matches for parser's top pattern in source.
             ~ Case none is found, result is empty sequence.
             ~ Overlapping matches are not handled.
@@ -193,9 +270,9 @@ class Parser(object):
                         "Either first define a top pattern\n" \
                         "or invoke one of its pattern attributes."
             raise AttributeError(message)
-        return self.topPattern.findAll(source)
+        return self.topPattern.findAll(source, context)
 
-    def replace(self, source, value):
+    def replace(self, source, value, context=None):
         ''' Find all matches for parser's top pattern in source
             & replace them with given value.
             ~ uses findAll
@@ -205,7 +282,7 @@ class Parser(object):
                         "Either first define a top pattern\n" \
                         "or invoke one of its pattern attributes."
             raise AttributeError(message)
-        return self.topPattern.replace(source, value)
+        return self.topPattern.replace(source, value, context)
 
     def test(self, source, method_name="matchTest"):
         ''' Try performing test match on source text;
@@ -277,6 +354,89 @@ class Parser(object):
             raise AttributeError(message)
         return self.topPattern.testSuiteMultiline(sources, results, method_name, verbose)
 
+    ### compiled engine
+    def compile(self):
+        ''' Return a machine running parser's top pattern.
+            ~ The machine yields the same results as the parser,
+              using a compiled form of the pattern graph.
+            ~ See module machine.
+        '''
+        if not self.canMatch:
+            message = "This parser cannot match directly (yet).\n" \
+                        "Either first define a top pattern\n" \
+                        "or invoke one of its pattern attributes."
+            raise AttributeError(message)
+        return Machine(self.topPattern)
+
+    ### batch of sources
+    def parseMany(self, sources, workers=None, chunksize=16, ordered=True,
+                  factory=None, convert=None, stats=None):
+        ''' Parse independent sources in a pool of worker processes.
+            Yield a ParseResult per source: converted tree, or failure.
+            ~ See module batch.
+        '''
+        if not self.canMatch:
+            message = "This parser cannot match directly (yet).\n" \
+                        "Either first define a top pattern\n" \
+                        "or invoke one of its pattern attributes."
+            raise AttributeError(message)
+        return parseMany(self, sources, workers, chunksize, ordered,
+                         factory, convert, stats)
+
+    ### incremental parse
+    def reparse(self, oldTree, edit, context=None):
+        ''' Parse again source of oldTree, after edit
+            (start, oldEnd, newText): yield the tree of parse
+            for the new source, reusing what the edit does not affect.
+            ~ Previous results are held by context, or by the thread's
+              incremental one --see module incremental.
+            ~ oldTree is consumed: its nodes are moved to the new tree
+              (when the reparse succeeds), do not use it anymore.
+            ~ The first reparse of a tree that context did not yield
+              parses in full (& seeds context); a parse in an
+              incremental context seeds it as well:
+                  context = ParseContext(incremental=True)
+                  tree = parser.parse(source, context)
+        '''
+        if not self.canMatch:
+            message = "This parser cannot match directly (yet).\n" \
+                        "Either first define a top pattern\n" \
+                        "or invoke one of its pattern attributes."
+            raise AttributeError(message)
+        return reparse(self.topPattern, oldTree, edit, context,
+                       self.registry)
+
+    ### streaming parse
+    def iterparse(self, fileobj, chunksize=CHUNK_SIZE):
+        ''' Read fileobj in chunks & yield each record (child node
+            of the top repetition) as soon as it is complete.
+            ~ node.offset: position of record in the whole text
+            ~ Read text & results of its checks are dropped:
+              memory does not depend on the size of the file.
+            ~ See module tail.
+        '''
+        if not self.canMatch:
+            message = "This parser cannot match directly (yet).\n" \
+                        "Either first define a top pattern\n" \
+                        "or invoke one of its pattern attributes."
+            raise AttributeError(message)
+        return iterparse(self.topPattern, fileobj, chunksize)
+
+    ### struct-of-arrays result
+    def parseTree(self, source, context=None):
+        ''' Parse source & return result as a Tree (parallel arrays)
+            instead of nodes.
+            ~ Beware: nodes are built by the parse, then converted.
+              Peak memory is the one of a parse (nodes & memo), not less:
+              only the result held afterwards is compact.
+            ~ Memo is reset before conversion, & nodes can be freed
+              after it.
+            ~ See module tree.
+        '''
+        node = self.parse(source, context)
+        self.topPattern._resetMemo(context=context)
+        return Tree(node)
+
     ### output
     def __str__(self):
         ''' parser's output form
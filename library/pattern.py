@@ -61,14 +61,26 @@ Patterns
         * character specific patterns:
           Char ('°'), Klass([...]), String ([...]*/+/{m,n})
         * Recursive -- implementation trick
-        * "stop condition": Until pattern wrapper (/)
+        * "stop condition": Until pattern wrapper (>)
         * value equality check: Equals pattern wrapper (=)
         * number repetition: Repetition ({n} or {m,n})
+        * commit point: Cut (^) -- no backtracking before it
 
     See also:
         * preprocessing module
         * value transformation and value object in Node module
 
+    Failures: checks return either a node or the FAIL sentinel
+    (or an Invalidation error raised by a match action).
+    Raw patterns record their failures in the failure record
+    of the running parse context, which keeps the farthest failure
+    position only & the patterns expected there.
+    Errors are built from it when a match method fails.
+
+    State: patterns never change during a match. Whatever a match
+    changes (memo, failures...) is held by a parse context instead
+    (see module context), so that a parser may run in several threads.
+
     Kind of patterns. There are basically:
         ~ Raw or 'terminal' patterns that actually match source characters
           (and can actually fail).
@@ -84,56 +96,13 @@ from tools import *
 
 from node import *
 from error import *
-from charset import charset as toCharset
+from charset import CharSet, ranges as toRanges
+from memo import MemoStore
+from charmap import CharMap
+from context import Stats, running
 from time import time   # for stats
 
 
-# object used to collect statistics on match checks
-class Stats(object):
-    ''' object used to collect statistics on match checks
-    '''
-    def __init__(self, start_time=None):
-        self.start_time = start_time
-        self.stop_time = None
-        self.trials = 0
-        self.memos = 0
-        self.checks = 0
-        self.failures = 0
-        self.matchFailures = 0
-        self.EOTs = 0
-        self.invalids = 0
-        self.successes = 0
-        self.branches = 0
-        self.leaves = 0
-
-    def time(self):
-        if self.start_time is None or self.stop_time is None:
-            return ""
-        runtime = self.stop_time - self.start_time
-        return "\nrun time: %.3f" % runtime
-
-    def __str__(self):
-        return ("\n=== parsing statistics:\n"
-                "match trials:          %s\n"
-                "   memos:              %s\n"
-                "   checks:             %s\n"
-                "       failures:       %s\n"
-                "           matchFails: %s\n"
-                "           EOTs:       %s\n"
-                "           invalids:   %s\n"
-                "       successes:      %s\n"
-                "           branches:   %s\n"
-                "           leaves:     %s\n"
-                "%s"
-                %(
-                self.trials,self.memos,self.checks,
-                self.failures,self.matchFailures,self.EOTs,self.invalids,
-                self.successes,self.branches,self.leaves,
-                self.time()
-                )
-        )
-
-
 ### super type ###
 class Pattern(object):
     ''' pattern object
@@ -149,9 +118,6 @@ class Pattern(object):
             * _fullStr: for full subpattern output format
     '''
 
-    # statistics on match checks --see class Stats
-    stats = Stats()
-
     ### config & constants
     # extensive output for sub-patterns, else name only
     FULL_OUTPUT = False
@@ -159,6 +125,12 @@ class Pattern(object):
     TEST_MODE = False
     # collect statistics on match checks
     DO_STATS = False
+    # use dense position-indexed memo tables instead of dicts
+    # (see module memo)
+    DENSE_MEMO = False
+    # map source chars to klass membership & runs before matching
+    # (see module charmap)
+    CHAR_MAP = False
     # unnamed pattern default name
     DEFAULT_NAME = "<?>"
 
@@ -180,23 +152,41 @@ class Pattern(object):
         self.actions = None      # --> node value transformation
         # parser is set later via parser.collectPatterns()
         self.parser = None          # unused yet
-        # memoization
-        self.memo = dict()          # --> packrat memoïzation
-        self.wrapped = []           # --> _resetMemo
+        # memoization (memo tables are held by parse contexts)
+        self.memoize = True         # --> analysis.selectMemo
+        self.regex = None           # --> analysis.selectRegex
+        self.wrapped = []           # --> analysis.subPatterns
 
     ### match methods
     # matchTest & parseTest methods perform in test mode:
     #   ~ in case of failure, output error and continue
     #   ~ very handy for sequence of tests
-    def match(self, source):
+    def match(self, source, context=None):
         ''' Match start of source text.
             Return result tree/node or raise MatchFailure error.
+            ~ State is held by context, or by the thread's default one.
         '''
-        # reset memoization of all patterns involved, recursively
-        self._resetMemo()
+        # set a fresh parse context for this thread
+        context = self._resetMemo(source, context)
 
         # match
-        return self._memoCheck(source, 0)
+        result = self._memoCheck(source, 0)
+        if not isinstance(result,Node):
+            if context.regexMatched:
+                result = self._checkAgain(source)
+            raise self._error(source, result)
+        return result
+
+    def _checkAgain(self, source):
+        ''' Check source again without regexes, so that failures
+            inside lowered patterns are recorded too (for errors).
+        '''
+        context = self._resetMemo(source, running.context)
+        context.regexOff = True
+        try:
+            return self._memoCheck(source, 0)
+        finally:
+            context.regexOff = False
 
     def matchTest(self, source):
         ''' Match in test mode. '''
@@ -207,27 +197,43 @@ class Pattern(object):
             print (e)
             return None
 
-    def parse(self, source):
+    def parse(self, source, context=None):
         ''' Match whole of source text.
             Return result tree/node or raise MatchFailure error.
+            ~ State is held by context, or by the thread's default one.
         '''
-        if Pattern.DO_STATS: Pattern.stats.__init__(time())
-        # reset memoization of all patterns involved, recursively
-        self._resetMemo()
+        # set a fresh parse context for this thread
+        context = self._resetMemo(source, context)
+        if Pattern.DO_STATS: context.stats.__init__(time())
 
         # parse
         result = self._memoCheck(source, 0)
         if Pattern.DO_STATS:
-            Pattern.stats.stop_time = time()
-            print Pattern.stats
+            context.stats.stop_time = time()
+            print context.stats
+        # case failure or partial match: check again for exact failures
+        if (not isinstance(result,Node) or result.end < len(source)) \
+                and context.regexMatched:
+            result = self._checkAgain(source)
+        # case failure
+        if not isinstance(result,Node):
+            raise self._error(source, result)
 
         # case whole of source text is matched
+        # (an incremental context holds the tree to reparse)
         pos = result.end
         if pos == len(source):
+            if context.incremental:
+                context.tree = result
             return result
 
         # case matching stopped before end of source text
-        raise IncompleteParse(self, source, pos, result)
+        # (farthest failure, if any, tells why)
+        failure = None
+        if context.failure.pos >= pos:
+            failure = self._error(source, FAIL)
+            failure.wrap = True
+        raise IncompleteParse(self, source, pos, result, failure)
 
     def parseTest(self, source):
         ''' Parse in test mode.
@@ -238,60 +244,59 @@ class Pattern(object):
             print (e)
             return None
 
-    def findFirst(self, source):
+    def findFirst(self, source, context=None):
         ''' Find & return first match for pattern in source.
             ~ case no match found, return None
         '''
-        # reset memoization of all patterns involved, recursively
-        self._resetMemo()
+        # set a fresh parse context for this thread
+        context = self._resetMemo(source, context)
 
         # lookup first occurrence
         length = len(source)
         pos = 0
         while pos < length:
-            try:
-                return self._memoCheck(source, pos)
-            except PijnuError:
-                pos += 1
+            node = self._memoCheck(source, pos)
+            if isinstance(node,Node):
+                return node
+            context.cutPosition = 0
+            pos += 1
         return None
 
-    def findAll(self, source):
+    def findAll(self, source, context=None):
         ''' Find & return all matches for pattern in source ~ findAll.
             ~ Case none is found, result is empty sequence.
             ~ Overlapping matches are not twice collected.
             ~ findAll does *not* collect nil nodes!
         '''
-        # reset memoization of all patterns involved, recursively
-        self._resetMemo()
+        # set a fresh parse context for this thread
+        context = self._resetMemo(source, context)
 
         # lookup all occurrences
         nodes = Seq()
         length = len(source)
         pos = 0
         while pos < length:
-            try:
-                node = self._memoCheck(source, pos)
-                # beware of successful node without advance !!! (eg Option)
-                if node.value == Node.NIL:
-                    pos +=1
-                else:
-                    pos = node.end
-                    nodes.append(node)
-            except PijnuError:
+            node = self._memoCheck(source, pos)
+            # case failure: try next position
+            if not isinstance(node,Node):
+                context.cutPosition = 0
                 pos += 1
+            # beware of successful node without advance !!! (eg Option)
+            elif node.value == Node.NIL:
+                pos +=1
+            else:
+                pos = node.end
+                nodes.append(node)
         return nodes
 
-    def replace(self, source, value):
+    def replace(self, source, value, context=None):
         ''' Find all matches for pattern in source
             & replace them with given value.
             ~ uses findAll
         '''
-        # reset memoization of all patterns involved, recursively
-        self._resetMemo()
-
         # lookup & replace
         result = ''
-        nodes = self.findAll(source)
+        nodes = self.findAll(source, context)
         pos = 0
         for node in nodes:
             result += source[pos:node.start] + value
@@ -300,20 +305,58 @@ class Pattern(object):
         return result
 
     # memoization reset
-    def _resetMemo(self, done=None):
-        ''' Reset memoization of all patterns involved, recursively.
+    def _resetMemo(self, source=None, context=None):
+        ''' Reset memoization & match state, before a match of source:
+            context, or the thread's default one, is reset & becomes
+            the running context of this thread. Return it.
+            ~ With config DENSE_MEMO, when source is given,
+              memo tables are held by a memo store for this source
+              (see module memo).
+            ~ With config CHAR_MAP, when source is given,
+              klasses & strings get their rows in a char map
+              for this source (see module charmap).
+            ~ Neither is used by incremental contexts.
         '''
-        if done is None: done = list()
-
-        # reset self memo
-        self.memo = dict()
-        done.append(self)
-
-        # recursive memo reset of not-yet-reset wrapped pattern(s)
-        # (works for recursive patterns as well)
-        for p in self.wrapped:
-            if p not in done:
-                p._resetMemo(done)
+        if context is None:
+            context = running.default
+        (store, charMap) = (None, None)
+        if source is not None and not context.incremental:
+            if Pattern.DENSE_MEMO:
+                store = MemoStore(source)
+            if Pattern.CHAR_MAP:
+                charMap = CharMap(source)
+        context.reset(source, store, charMap)
+        running.context = context
+        return context
+
+    # state of the running context, for inspection
+    @property
+    def memo(self):
+        ''' memo table in running context '''
+        context = running.context
+        memo = context.memos.get(self)
+        if memo is None:
+            memo = context.table(self)
+        return memo
+
+    @memo.setter
+    def memo(self, table):
+        memo = running.context.table(self)
+        for (pos, result) in table.items():
+            memo[pos] = result
+
+    @property
+    def memoStore(self):
+        ''' memo store of running context, case DENSE_MEMO '''
+        return running.context.memoStore
+
+    @property
+    def charRows(self):
+        ''' char map rows in running context, case CHAR_MAP
+            (klasses & strings only) '''
+        if not isinstance(self, (Klass, String)):
+            return None
+        return running.context.rows(self)
 
     ### test a pattern -- or a parser
     # 'test' performs test match using given method
@@ -454,58 +497,194 @@ class Pattern(object):
         ''' Wrapper func to implement packrat memoïzing algorithm.
             ~ Case check already done for this pos, use memo.
             ~ Else call _realCheck and memoize result.
+            ~ Outcome is returned, either node or error:
+              failures are not raised, since they are the common case
+              (only public match methods raise them).
+            ~ Patterns never checked twice at the same position
+              have memoize=False: no memo then (see module analysis).
         '''
-        if Pattern.DO_STATS: Pattern.stats.trials += 1
+        context = running.context
+        if context.incremental:
+            return self._trackCheck(source, pos, context)
+        stats = context.stats
+        if Pattern.DO_STATS: stats.trials += 1
+        memoize = self.memoize
 
         # case check result memoized for this position
-        if pos in self.memo:
-            if Pattern.DO_STATS: Pattern.stats.memos += 1
-            result = self.memo[pos]
-            # outcome was success
-            r = result if isinstance(result,Node) else "*fail*"
-            if isinstance(result,Node):
-                return result
-            # outcome was failure
-            raise result
+        if memoize:
+            memo = context.memos.get(self)
+            if memo is None:
+                memo = context.table(self)
+            if pos in memo:
+                if Pattern.DO_STATS: stats.memos += 1
+                return memo[pos]
 
         # case not memoized yet
-        if Pattern.DO_STATS: Pattern.stats.checks += 1
+        if Pattern.DO_STATS: stats.checks += 1
         try:
-            result = self._realCheck(source, pos)
+            if self.regex is None:
+                result = self._realCheck(source, pos)
+            else:
+                result = self._regexCheck(source, pos)
         except Invalidation, e:
             result = e
-        self.memo[pos] = result
+        if memoize:
+            memo[pos] = result
         # case success
         if isinstance(result,Node):
             if Pattern.DO_STATS:
-                Pattern.stats.successes += 1
+                stats.successes += 1
                 if result.kind == Node.BRANCH:
-                    Pattern.stats.branches += 1
+                    stats.branches += 1
                 else:
-                    Pattern.stats.leaves += 1
+                    stats.leaves += 1
             return result
         # case failure
         if Pattern.DO_STATS:
-            Pattern.stats.failures += 1
-            if isinstance(result, Invalidation):
-                Pattern.stats.invalids += 1
-            elif isinstance(result, EndOfText):
-                Pattern.stats.EOTs += 1
+            stats.failures += 1
+            if result is FAIL:
+                stats.matchFailures += 1
             else:
-                Pattern.stats.matchFailures += 1
-        raise result
+                stats.invalids += 1
+        return result
+
+    def _trackCheck(self, source, pos, context):
+        ''' Match check of incremental parse (see module incremental).
+            ~ Results are recorded together with the extent of source
+              text examined: this check's own (see _reach) & the ones
+              of sub patterns checked --as a span from pos.
+            ~ Results of the previous parse are reused when their
+              extent is out of the edited text.
+            ~ Leaves are cheap to check again: they are not recorded.
+            ~ A node a wrapper applied its actions to is not left
+              as the result of the wrapped patterns (see _unshare).
+        '''
+        # case leaf: only extent is kept track of
+        if not self.wrapped:
+            try:
+                result = self._realCheck(source, pos)
+            except Invalidation, e:
+                result = e
+            extent = self._reach(source, pos, result)
+            if extent > context.reach:
+                context.reach = extent
+            return result
+        # case recorded, in this parse or the previous one
+        table = context.entries.get(self)
+        if table is None:
+            table = context.entries[self] = dict()
+        entry = table.get(pos)
+        if entry is None and context.previous is not None:
+            entry = context.previous.lookup(self, pos)
+            if entry is not None:
+                table[pos] = entry
+        if entry is not None:
+            if pos + entry[1] > context.reach:
+                context.reach = pos + entry[1]
+            return entry[0]
+        # case not recorded yet: check, keeping track of extent
+        reach = context.reach
+        context.reach = pos
+        try:
+            result = self._realCheck(source, pos)
+        except Invalidation, e:
+            result = e
+        extent = max(context.reach, self._reach(source, pos, result))
+        table[pos] = (result, extent - pos)
+        context.reach = max(reach, extent)
+        if self.actions is not None and isinstance(result,Node) \
+                and result.pattern is not self:
+            self._unshare(context.entries, pos, result)
+        return result
+
+    def _reach(self, source, pos, result):
+        ''' End of source text examined by this check at pos itself,
+            apart from sub patterns (a char past the end stands
+            for end of text).
+            ~ By default, nothing: wrappers examine source
+              through sub patterns only.
+            * redefined on pattern types reading source themselves
+        '''
+        return pos
+
+    def _unshare(self, entries, pos, node):
+        ''' Drop entries of wrapped patterns yielding node at pos:
+            actions of self changed it.
+        '''
+        patterns = list(self.wrapped)
+        while patterns:
+            pattern = patterns.pop()
+            table = entries.get(pattern)
+            if table is not None and pos in table \
+                    and table[pos][0] is node:
+                del table[pos]
+                patterns.extend(pattern.wrapped)
+
+    def _regexCheck(self, source, pos):
+        ''' Match check using regex set by analysis.selectRegex.
+            ~ The node is built from matched text (possibly nil).
+            ~ On failure, use _realCheck to record expected patterns.
+              (Failures inside a successful match are not recorded:
+              match & parse check again without regexes if they fail.)
+        '''
+        context = running.context
+        if context.regexOff:
+            return self._realCheck(source, pos)
+        match = self.regex.match(source, pos)
+        if match is None:
+            if context.lookahead:
+                return FAIL
+            return self._realCheck(source, pos)
+        context.regexMatched = True
+        end = match.end()
+        # (as _realCheck: an empty string is nil at end of text only)
+        if end == pos and (type(self) is not String or pos >= len(source)):
+            return Node(self, Node.NIL, pos, pos, source)
+        return Node(self, source[pos:end], pos, end, source)
 
     def _realCheck(self, source, pos):
         ''' Real match check when no memo available at current pos.
-            ~ Outcome is either node or error.
+            ~ Outcome is either node or FAIL (or Invalidation error).
             ~ New position in source is a node attribute.
         '''
         raise NotImplementedError
 
+    def _fail(self, pos):
+        ''' Record failure at pos (unless inside a lookahead)
+            & return FAIL sentinel.
+            ~ used by raw patterns only
+        '''
+        context = running.context
+        if pos >= context.failure.pos and context.lookahead == 0:
+            context.failure.record(self, pos)
+        return FAIL
+
+    def _error(self, source, result):
+        ''' Error to raise for failed match outcome result,
+            built from farthest failure record.
+            ~ Its type is the one raised before failure records:
+              EndOfText only for a leaf pattern failing at end of text,
+              else MatchFailure (possibly located at end of text).
+        '''
+        # case invalidation by a match action: error is already there
+        if result is not FAIL:
+            return result
+        failure = running.context.failure
+        pos = max(failure.pos, 0)
+        expected = failure.expectedText() if failure.patterns else None
+        pattern = self
+        while isinstance(pattern, Recursive) and pattern.isDefined:
+            pattern = pattern.pattern
+        if pos >= len(source) \
+                and isinstance(pattern, (Word, Char, Klass, String, AnyChar)):
+            return EndOfText(self, source, expected=expected)
+        return MatchFailure(self, source, pos, expected=expected)
+
     def _message(self):
         ''' error message in case of failure
             * actually defined on each pattern type
             ~ used by errors together with view
+              (unless they hold a farthest failure message)
         '''
         return "<match failure>"
 
@@ -599,12 +778,16 @@ class Word(Pattern):
         end_pos = pos + self.length
         # case end of text
         if pos >= len(source):
-            return EndOfText(self, source, pos)
+            return self._fail(pos)
         # case success
         if source[startPos:end_pos] == self.word:
             return Node(self, self.word, startPos,end_pos,source)
         # case failure
-        return MatchFailure(self, source, pos)
+        return self._fail(pos)
+
+    def _reach(self, source, pos, result):
+        ''' end of source text examined '''
+        return pos + max(self.length, 1)
 
     def _message(self):
         ''' error message in case of failure '''
@@ -625,9 +808,11 @@ class Choice(Pattern):
     ''' ordered choice pattern :    "a / b"
         Case repeted pattern is a Klass (or simple Char),
         a String pattern is yielded instead, via __new__
+        Case patterns are words, a WordChoice is yielded instead.
     '''
     def __new__(cls, patterns, expression=None, name=None):
         ''' Yield a Klass pattern if all patterns are either klasses or chars.
+            Yield a WordChoice pattern if all patterns are words.
             Else yield standard Choice pattern.
         '''
         # Note: cls is Choice
@@ -635,18 +820,22 @@ class Choice(Pattern):
         # case patterns are Char-s or Klass-es
         if all( (isinstance(p,Klass) or isinstance(p,Char)) for p in patterns ):
             # compute data
-            chars_sets = []
+            charset = CharSet()
             for p in patterns:
                 if isinstance(p,Klass):
-                    chars_sets.append(p.charset)
+                    charset |= p.charset
                 else:
-                    chars_sets.append(p.char)
-            charset = "".join(chars_sets)
+                    charset |= CharSet.fromChars(p.char)
             expressions = [p._format() for p in patterns]
             expression = "[%s]" % "/".join(expressions)
             # yield Klass pattern
             self = Klass(charset, expression,name)
             return self
+        # case patterns are Word-s: yield WordChoice pattern
+        # (__init__ is then called as for a Choice)
+        if len(patterns) > 1 and all(type(p) is Word for p in patterns):
+            self = Pattern.__new__(WordChoice, patterns, expression, name)
+            return self
         # else a Choice
         self = Pattern.__new__(cls, patterns, expression, name)
         return self
@@ -657,39 +846,59 @@ class Choice(Pattern):
         self.patterns = patterns
         # define common attributes
         Pattern.__init__(self, expression, name)
-        self.wrapped = self.patterns    # --> _resetMemo
+        self.wrapped = self.patterns    # --> analysis
+        # alternatives to try according to current char
+        self.dispatch = None            # --> analysis.selectDispatch
+        self.dispatchEnd = None
 
     def _realCheck(self, source, pos):
         ''' Check pattern match at position pos in source string.
-            ~ successful iff one of sub patterns matches. '''
-        startPos = pos
-        sub_errors = []
+            ~ successful iff one of sub patterns matches.
+            ~ With a dispatch table, only sub patterns that may start
+              with current char are tried (see analysis.selectDispatch). '''
+        # select sub patterns to try
+        patterns = self.patterns
+        if self.dispatch is not None:
+            if pos < len(source):
+                patterns = self.dispatch.get(source[pos], patterns)
+            else:
+                patterns = self.dispatchEnd
         # try each sub pattern successively
-        for pattern in self.patterns:
+        for pattern in patterns:
+            node = pattern._memoCheck(source, pos)
             # case success: keep information, apply nested pattern &
             # choice pattern transfos, avoid useless nesting.
-            try:
-                node = pattern._memoCheck(source, pos)
+            if isinstance(node,Node):
                 # apply possible transformations stored on self
                 # (in addition to the ones on wrapped pattern)
-                if self.actions is not None:
+                if self.actions is None:
+                    return node
+                try:
                     node.doActions(self.actions)
-                return node
-            # case failure: collect error message used by _message
-            # Note: This allows displaing while *each* pattern has failed.
-            except PijnuError, e:
-                e.wrap = True
-                sub_errors.append(e)
+                    return node
+                except Invalidation:
+                    pass
+            # case failure: try next pattern
+            # -- unless a cut was passed: no backtracking before it
+            if pos < running.context.cutPosition:
+                break
         # case overall failure
-        self.sub_errors = sub_errors
-        return MatchFailure(self, source, pos)
+        # (skipped sub patterns are expected here as well)
+        context = running.context
+        if len(patterns) < len(self.patterns) and context.lookahead == 0 \
+                and pos >= context.failure.pos:
+            for pattern in self.patterns:
+                if pattern not in patterns:
+                    context.failure.record(pattern, pos)
+        return FAIL
+
+    def _reach(self, source, pos, result):
+        ''' end of source text examined: current char (dispatch) '''
+        return pos + 1
 
     def _message(self):
         ''' error message in case of failure '''
-        overall_message = ("Cannot match any pattern in choice.\n"
-                        "(wrapped pattern errors below)")
-        wrapped_message = '\n'.join(str(e) for e in self.sub_errors)
-        return "%s\n%s" %(overall_message, wrapped_message)
+        return "Cannot match any pattern in choice."
 
     def _format(self):
         ''' normal output format
@@ -704,6 +913,69 @@ class Choice(Pattern):
         return "(%s)" % ' / '.join(pat_formats)
 
 
+class WordChoice(Choice):
+    ''' ordered choice of words :    "abc" / "d" / "ab"
+        ~ yielded by Choice for a choice of words only
+        ~ Words are held in a trie: a single scan of source
+          finds all words matching at pos; the first listed one
+          is chosen, as for a standard ordered choice.
+        ~ The node is the chosen word's own node
+          (same tag & actions as if the word were checked).
+        ~ Engines not knowing this type simply see a Choice.
+    '''
+    # trie key for the index of the word ending at a trie node
+    END = None
+
+    def __init__(self, patterns, expression=None, name=None):
+        ''' Define name, patterns, memo, trie. '''
+        Choice.__init__(self, patterns, expression, name)
+        self.trie = dict()
+        self.length = max(len(pattern.word) for pattern in patterns)
+        for (index, pattern) in enumerate(patterns):
+            node = self.trie
+            for char in pattern.word:
+                node = node.setdefault(char, dict())
+            # a word listed twice is found at its first place
+            node.setdefault(WordChoice.END, index)
+
+    def _realCheck(self, source, pos):
+        ''' Check pattern match at position pos in source string.
+            ~ successful iff one of the words is found at pos. '''
+        length = len(source)
+        # Collect (index,end) of all words found at pos.
+        found = []
+        if pos < length:
+            node = self.trie
+            end = pos
+            while True:
+                if WordChoice.END in node:
+                    found.append((node[WordChoice.END], end))
+                if end == length or source[end] not in node:
+                    break
+                node = node[source[end]]
+                end += 1
+        # Try them in order (match actions may invalidate a node).
+        found.sort()
+        for (index, end) in found:
+            pattern = self.patterns[index]
+            try:
+                node = Node(pattern, pattern.word, pos,end,source)
+                # apply possible transformations stored on self
+                if self.actions is not None:
+                    node.doActions(self.actions)
+                return node
+            except Invalidation:
+                pass
+        # case failure: every word was expected here
+        for pattern in self.patterns:
+            pattern._fail(pos)
+        return FAIL
+
+    def _reach(self, source, pos, result):
+        ''' end of source text examined: up to longest word '''
+        return pos + max(self.length, 1)
+
+
 class Sequence(Pattern):
     ''' ordered sequence pattern :   a b
     '''
@@ -712,7 +984,7 @@ class Sequence(Pattern):
         self.patterns = patterns
         # define common attributes
         Pattern.__init__(self, expression, name)
-        self.wrapped = self.patterns    # --> _resetMemo
+        self.wrapped = self.patterns    # --> analysis
 
     def _realCheck(self, source, pos):
         ''' Check pattern match in source string.
@@ -721,25 +993,19 @@ class Sequence(Pattern):
         childNodes = Nodes()
         # try each sub pattern successively
         for pattern in self.patterns:
+            node = pattern._memoCheck(source, pos)
+            # case failure
+            if not isinstance(node,Node):
+                return FAIL
             # case success: append node to global value sequence
-            try:
-                node = pattern._memoCheck(source, pos)
-                pos = node.end
-                childNodes.append(node)
-            # case failure:
-            # record unsuccessful pattern error used by _message
-            except PijnuError, e:
-                e.wrap = True
-                self.sub_error = e
-                return MatchFailure(self, source, pos)
+            pos = node.end
+            childNodes.append(node)
         # case overall success
         return Node(self, childNodes, startPos,pos,source)
 
     def _message(self):
         ''' error message in case of failure '''
-        overall_message = ("Cannot match all patterns in sequence.\n"
-                        "(wrapped pattern error below)")
-        return "%s\n%s" % (overall_message,self.sub_error)
+        return "Cannot match all patterns in sequence."
 
     def _format(self):
         ''' normal output format
@@ -765,24 +1031,30 @@ class Option(Pattern):
         self.isOption = True
         # define common attributes
         Pattern.__init__(self, expression, name)
-        self.wrapped = [self.pattern]   # --> _resetMemo
+        self.wrapped = [self.pattern]   # --> analysis
 
     def _realCheck(self, source, pos):
         ''' Check pattern match in source string.
             ~ successful in all cases
             ~ returns nil node if wrapped pattern fails '''
         # Try matching wrapped pattern.
+        node = self.pattern._memoCheck(source, pos)
         # case success
-        try:
-            node = self.pattern._memoCheck(source, pos)
+        if isinstance(node,Node):
             # apply possible transformations stored on self
             # (in addition to the ones on wrapped pattern)
-            if self.actions is not None:
+            if self.actions is None:
+                return node
+            try:
                 node.doActions(self.actions)
-            return node
+                return node
+            except Invalidation:
+                pass
         # case failure: return nil node, pos does not move
-        except PijnuError, e:
-            return Node(self, Node.NIL, pos,pos,source)
+        # -- unless a cut was passed: no backtracking before it
+        if pos < running.context.cutPosition:
+            return FAIL
+        return Node(self, Node.NIL, pos,pos,source)
 
     def _message(self):
         ''' ### option cannot fail! '''
@@ -807,28 +1079,28 @@ class Next(Pattern):
         self.pattern = pattern
         # define common attributes
         Pattern.__init__(self, expression, name)
-        self.wrapped = [self.pattern]   # --> _resetMemo
+        self.wrapped = [self.pattern]   # --> analysis
 
     def _realCheck(self, source, pos):
         ''' Check pattern match at position pos in source string.
             ~ successful if wrapped pattern succeeds. '''
-        # Try matching wrapped pattern.
-        # case success: keep pos unchanged and drop node value
+        # Try matching wrapped pattern (cuts have no effect inside,
+        # failures inside are not recorded: self is instead).
+        context = running.context
+        context.lookahead += 1
         try:
             node = self.pattern._memoCheck(source, pos)
+        finally:
+            context.lookahead -= 1
+        # case success: keep pos unchanged and drop node value
+        if isinstance(node,Node):
             return Node(self, Node.NIL, pos,pos,source)
         # case failure
-        except PijnuError, e:
-            e.wrap = True
-            self.sub_error = e
-            return MatchFailure(self, source, pos)
+        return self._fail(pos)
 
     def _message(self):
         ''' error message in case of failure '''
-        overall_message = ( "Cannot match pattern:   %s.\n"
-                            "(wrapped pattern error below)"
-                            % self.pattern)
-        return "%s\n%s" % (overall_message,self.sub_error)
+        return "Cannot match pattern:   %s." % self.pattern
 
     def _format(self):
         ''' normal output format
@@ -849,20 +1121,25 @@ class NextNot(Pattern):
         self.pattern = pattern
         # define common attributes
         Pattern.__init__(self, expression, name)
-        self.wrapped = [self.pattern]   # --> _resetMemo
+        self.wrapped = [self.pattern]   # --> analysis
 
     def _realCheck(self, source, pos):
         ''' Check pattern match in source string.
             ~ successful if wrapped pattern fails. '''
-        # Try *NOT* matching wrapped pattern.
-        # case "success": failure
+        # Try *NOT* matching wrapped pattern (cuts have no effect inside,
+        # failures inside are not recorded: self is instead).
+        context = running.context
+        context.lookahead += 1
         try:
             node = self.pattern._memoCheck(source, pos)
-            return MatchFailure(self, source, pos)
+        finally:
+            context.lookahead -= 1
+        # case "success": failure
+        if isinstance(node,Node):
+            return self._fail(pos)
         # case "failure": success
         # -- return nil node, keep pos unchanged
-        except PijnuError, e:
-            return Node(self, Node.NIL, pos,pos,source)
+        return Node(self, Node.NIL, pos,pos,source)
 
     def _message(self):
         ''' error message in case of failure '''
@@ -882,7 +1159,6 @@ class NextNot(Pattern):
 
 
 ### repetitions ##############################
-### TODO: "Until" '>' stop condition
 class ZeroOrMore(Pattern):
     ''' zero-or-more repetition pattern :   p*
     '''
@@ -891,7 +1167,7 @@ class ZeroOrMore(Pattern):
         self.pattern = pattern
         # define common attributes
         Pattern.__init__(self, expression, name)
-        self.wrapped = [self.pattern]   # --> _resetMemo
+        self.wrapped = [self.pattern]   # --> analysis
 
     def _realCheck(self, source, pos):
         ''' Check pattern match in source string.
@@ -903,14 +1179,16 @@ class ZeroOrMore(Pattern):
         childNodes = Nodes()
         # Match wrapped pattern as many times as possible.
         while True:
-            # case success: append node to child-sequence value
-            try:
-                node = self.pattern._memoCheck(source, pos)
-                pos = node.end
-                childNodes.append(node)
+            node = self.pattern._memoCheck(source, pos)
             # case failure: stop
-            except PijnuError, e:
+            # -- unless a cut was passed: no backtracking before it
+            if not isinstance(node,Node):
+                if pos < running.context.cutPosition:
+                    return FAIL
                 break
+            # case success: append node to child-sequence value
+            pos = node.end
+            childNodes.append(node)
         return Node(self, childNodes, startPos,pos,source)
 
     def _message(self):
@@ -931,7 +1209,7 @@ class OneOrMore(Pattern):
         self.pattern = pattern
         # define common attributes
         Pattern.__init__(self, expression, name)
-        self.wrapped = [self.pattern]   # --> _resetMemo
+        self.wrapped = [self.pattern]   # --> analysis
 
     def _realCheck(self, source, pos):
         ''' Check pattern match in source string.
@@ -940,34 +1218,30 @@ class OneOrMore(Pattern):
             ~ node value is sequence of child nodes '''
         startPos = pos
         # First try matching wrapped pattern once.
-        # case success go on
-        try:
-            node = self.pattern._memoCheck(source, pos)
-            pos = node.end
-            childNodes = Nodes(node)
+        node = self.pattern._memoCheck(source, pos)
         # case failure
-        except PijnuError, e:
-            e.wrap = True
-            self.sub_error = e
-            return MatchFailure(self, source ,pos)
+        if not isinstance(node,Node):
+            return FAIL
+        # case success go on
+        pos = node.end
+        childNodes = Nodes(node)
         # Then match wrapped pattern as many times as possible.
         while True:
-            # case success: append node to child sequence = value
-            try:
-                node = self.pattern._memoCheck(source, pos)
-                pos = node.end
-                childNodes.append(node)
+            node = self.pattern._memoCheck(source, pos)
             # case failure: stop
-            except PijnuError, e:
+            # -- unless a cut was passed: no backtracking before it
+            if not isinstance(node,Node):
+                if pos < running.context.cutPosition:
+                    return FAIL
                 break
+            # case success: append node to child sequence = value
+            pos = node.end
+            childNodes.append(node)
         return Node(self, childNodes, startPos,pos,source)
 
     def _message(self):
         ''' error message in case of failure '''
-        overall_message = ( "Cannot match at all pattern:   %s.\n"
-                            "(wrapped pattern error below)"
-                            % self.pattern)
-        return "%s\n%s" % (overall_message,self.sub_error)
+        return "Cannot match at all pattern:   %s." % self.pattern
 
     def _format(self):
         ''' normal output format
@@ -1024,7 +1298,7 @@ class Repetition(Pattern):
         self.numMin,self.numMax = numMin,numMax
         # define common attributes
         Pattern.__init__(self, expression, name)
-        self.wrapped = [pattern]    # --> _resetMemo
+        self.wrapped = [pattern]    # --> analysis
 
     def _realCheck(self, source, pos):
         ''' Check pattern match in source string.
@@ -1038,32 +1312,30 @@ class Repetition(Pattern):
         startPos = pos
         numMax = self.numMax
         while True:
-            # case success: append node to child sequence
-            try:
-                node = self.pattern._memoCheck(source, pos)
-                pos = node.end
-                childNodes.append(node)
-                childNumber += 1
-                # case numMax reached: stop
-                if numMax and childNumber==numMax:
-                    break
+            node = self.pattern._memoCheck(source, pos)
             # case failure: stop
-            except PijnuError, e:
-                e.wrap=True
-                self.sub_error = e
+            # -- unless a cut was passed: no backtracking before it
+            if not isinstance(node,Node):
+                if pos < running.context.cutPosition:
+                    return FAIL
+                break
+            # case success: append node to child sequence
+            pos = node.end
+            childNodes.append(node)
+            childNumber += 1
+            # case numMax reached: stop
+            if numMax and childNumber==numMax:
                 break
         # check numMin condition whenever
         if self.numMin and childNumber < self.numMin:
-            return MatchFailure(self, source, pos)
+            return FAIL
         # result
         return Node(self, childNodes, startPos,pos,source)
 
     def _message(self):
         ''' error message in case of failure '''
-        overall_message = ( "Cannot match at least %s time(s) pattern %s.\n"
-                            "(wrapped pattern error below)"
-                            % (self.numMin, self.pattern) )
-        return "%s\n%s" % (overall_message,self.sub_error)
+        return ("Cannot match at least %s time(s) pattern %s."
+                % (self.numMin, self.pattern))
 
     def _format(self):
         ''' normal output format according to numMin/numMax case
@@ -1084,6 +1356,209 @@ class Repetition(Pattern):
         return '%s%s' % (self.pattern._shortForm(),repete)
 
 
+class Until(Pattern):
+    ''' repetition with stop condition :   p*>s  p+>s  p{m..n}>s
+        ~ Repetition stops where stop pattern s matches;
+          s must then match: its node follows the repetition's node.
+            [a..z]+>"HALT"   <==>   (!"HALT" [a..z])+ "HALT"
+        ~ Case repetition is a String, chars are not checked one by one:
+          ~ literal stop (word, char, positive lookahead or choice
+            of literal stops): next occurrence of stop
+            in source is found using str.find (& kept while pos is before)
+            then the run of klass chars is checked up to there;
+          ~ klass stop: run of chars of the repetition's klass
+            minus stop's klass is scanned.
+        ~ Else stop is tried before each check of the repeated pattern.
+    '''
+    def __init__(self, pattern, stop, expression=None, name=None):
+        ''' Define name, repetition, stop, repeated item, memo. '''
+        self.pattern = pattern
+        self.stop = stop
+        # repeated item & number of repetitions
+        if isinstance(pattern, (String, Repetition)):
+            (self.numMin,self.numMax) = (pattern.numMin,pattern.numMax)
+        elif isinstance(pattern, (ZeroOrMore, OneOrMore)):
+            (self.numMin,self.numMax) = (isinstance(pattern, OneOrMore),False)
+        else:
+            message = ( "Until pattern should wrap a repetition.\n"
+                        "Found %s:%s" %(pattern.__class__.__name__,pattern) )
+            raise TypeError(message)
+        self.item = pattern.klass if isinstance(pattern, String) \
+                    else pattern.pattern
+        # literal stop words, found using str.find
+        # --the last search is kept in parse context, see _next
+        self.words = Until._words(stop)
+        # chars scanned before a klass stop
+        self.charset = None
+        klass = stop.pattern if isinstance(stop, Next) else stop
+        if isinstance(pattern, String) and isinstance(klass, Klass):
+            self.charset = pattern.charset - klass.charset
+        # define common attributes
+        Pattern.__init__(self, expression, name)
+        self.wrapped = [pattern, stop]  # --> analysis
+
+    @staticmethod
+    def _words(stop):
+        ''' words of literal stop, or None
+            ~ A stop is literal if it matches exactly where one of its words
+              is found in source: it is a word or char, a positive lookahead
+              of a literal, or a choice of literals.
+        '''
+        if isinstance(stop, Word):
+            return [stop.word]
+        if isinstance(stop, Char):
+            return [stop.char]
+        if isinstance(stop, Next):
+            return Until._words(stop.pattern)
+        if isinstance(stop, Choice):
+            words = []
+            for pattern in stop.patterns:
+                subWords = Until._words(pattern)
+                if subWords is None:
+                    return None
+                words.extend(subWords)
+            return words
+        return None
+
+    def _realCheck(self, source, pos):
+        ''' Check pattern match at position pos in source string.
+            ~ successful if repeated pattern matches at least numMin times
+              before stop, & stop matches then
+            ~ returns sequential "branch" node: repetition, stop '''
+        startPos = pos
+        numMax = self.numMax
+        # case string: jump to stop
+        if isinstance(self.pattern, String):
+            stopPos = len(source)
+            if numMax and startPos + numMax < stopPos:
+                stopPos = startPos + numMax
+            if self.words is not None:
+                stopPos = min(stopPos, self._next(source, pos))
+                rows = running.context.rows(self.pattern)
+                if rows is not None:
+                    pos = min(rows[1][pos], stopPos)
+                else:
+                    pos = self.pattern.charset.span(source, pos, stopPos)
+            elif self.charset is not None:
+                pos = self.charset.span(source, pos, stopPos)
+            else:
+                pos = self._loopEnd(source, pos, stopPos)
+            count = pos - startPos
+            value = source[startPos:pos] if count else Node.NIL
+        # else: check stop, then item, as many times as possible
+        else:
+            count = 0
+            value = Nodes()
+            while not (numMax and count == numMax):
+                if self._stopsAt(source, pos):
+                    break
+                node = self.item._memoCheck(source, pos)
+                # case failure: stop
+                # -- unless a cut was passed: no backtracking before it
+                if not isinstance(node,Node):
+                    if pos < running.context.cutPosition:
+                        return FAIL
+                    break
+                pos = node.end
+                value.append(node)
+                count += 1
+        # check numMin
+        if self.numMin and count < self.numMin:
+            return self._fail(pos)
+        # stop must match now
+        stopNode = self.stop._memoCheck(source, pos)
+        if not isinstance(stopNode,Node):
+            # (stop may have failed first inside a lookahead)
+            self.stop._fail(pos)
+            if isinstance(self.pattern, String) and \
+                    not (numMax and count == numMax):
+                self.item._fail(pos)
+            return FAIL
+        repetition = Node(self.pattern, value, startPos,pos,source)
+        return Node(self, Nodes(repetition, stopNode),
+                    startPos,stopNode.end,source)
+
+    def _next(self, source, pos):
+        ''' position of next literal stop from pos on
+            (len(source) if none)
+            ~ The last search is kept: pos is often still before
+              the stop found (eg after inline markup).
+        '''
+        context = running.context
+        found = context.found.get(self)
+        if found is not None and found[0] is source \
+                and found[1] <= pos <= found[2]:
+            return found[2]
+        stopPos = len(source)
+        for word in self.words:
+            try:
+                index = source.find(word, pos, stopPos + len(word) - 1)
+            except UnicodeDecodeError:
+                # non-ascii str word never matches unicode source
+                continue
+            if index >= 0:
+                stopPos = index
+        context.found[self] = (source, pos, stopPos)
+        return stopPos
+
+    def _stopsAt(self, source, pos):
+        ''' whether stop matches at pos
+            (failures are not recorded: as for lookaheads)
+        '''
+        if self.words is not None:
+            # (no stop found: _next gives end of source)
+            return pos < len(source) and self._next(source, pos) == pos
+        context = running.context
+        context.lookahead += 1
+        try:
+            node = self.stop._memoCheck(source, pos)
+        finally:
+            context.lookahead -= 1
+        return isinstance(node,Node)
+
+    def _loopEnd(self, source, pos, stopPos):
+        ''' end of string's klass chars before stop, checking
+            stop at each position (case stop is neither literal nor klass)
+        '''
+        charset = self.pattern.charset
+        while pos < stopPos and source[pos] in charset \
+                and not self._stopsAt(source, pos):
+            pos += 1
+        return pos
+
+    def _reach(self, source, pos, result):
+        ''' end of source text examined: run of klass chars,
+            & next literal stop (else, end of text) '''
+        if not isinstance(self.pattern, String):
+            return pos
+        if self.words is not None:
+            stopPos = self._next(source, pos)
+            if stopPos == len(source):
+                return stopPos + 1
+            return stopPos + max(len(word) for word in self.words)
+        stopPos = len(source)
+        if self.numMax and pos + self.numMax < stopPos:
+            stopPos = pos + self.numMax
+        charset = self.pattern.charset if self.charset is None \
+                  else self.charset
+        return charset.span(source, pos, stopPos) + 1
+
+    def _message(self):
+        ''' error message in case of failure '''
+        return ("Cannot match at least %s time(s) pattern %s before %s."
+                % (self.numMin or 0, self.item, self.stop))
+
+    def _format(self):
+        ''' normal output format
+        '''
+        return '%s>%s' % (self.pattern._shortForm(),self.stop._shortForm())
+
+    def _fullFormat(self):
+        ''' extensive output format
+        '''
+        return '%s>%s' % (self.pattern._fullFormat(),self.stop._fullFormat())
+
+
 ### character specific ##############
 class Char(Pattern):
     ''' single char pattern :   'c'
@@ -1099,12 +1574,16 @@ class Char(Pattern):
             ~ successful if char is found at pos. '''
         # case end of text
         if pos >= len(source):
-            return EndOfText(self, source, pos)
+            return self._fail(pos)
         # case success
         if source[pos] == self.char:
             return Node(self, self.char, pos,pos+1,source)
         # case failure
-        return MatchFailure(self, source, pos)
+        return self._fail(pos)
+
+    def _reach(self, source, pos, result):
+        ''' end of source text examined: current char '''
+        return pos + 1
 
     def _message(self):
         ''' error message in case of failure '''
@@ -1126,21 +1605,24 @@ class Klass(Pattern):
             [a..z  A..Z  0..9  !!kq  B..Y  0] -->
             [abcdefghijlmnoprstuvwxyzAZ123456789]
         ~ Uses charset to parse charset expression
-          and expand possible ranges inside it.
+          into a CharSet: ranges inside it are not expanded.
           --> see charset module for more info
     '''
     def __init__(self, format, expression=None, name=None):
         ''' Define name, format, charset, memo. '''
-        # ~ From text grammar: format is an already computed charset.
+        # ~ From text grammar: format is an already computed charset,
+        #   either a string of chars or a CharSet.
         # ~ From source code: format is a klass format without brackets.
         #   In the latter case, we need to compute the charset
-        #   using the toCharset tool func from module charset.
+        #   using the toRanges tool func from module charset.
         #
         if expression is None:          # from code directly
-            self.charset = toCharset(format)
+            self.charset = CharSet(toRanges(format))
             expression = "[%s]" % format
-        else:                           # from text grammar
+        elif isinstance(format, CharSet):
             self.charset = format
+        else:                           # from text grammar
+            self.charset = CharSet.fromChars(format)
         # We need a clean text for format (see method _cleanRepr)
         expression = Klass._cleanRepr(expression)
         # define common attributes
@@ -1149,19 +1631,23 @@ class Klass(Pattern):
     def _realCheck(self, source, pos):
         ''' Check pattern match at position pos in source string.
             ~ successful if current char is in charset. '''
+        # case char map: member byte is 0 at end of text
+        rows = running.context.rows(self)
+        if rows is not None:
+            if rows[0][pos]:
+                return Node(self, source[pos], pos, pos+1, source)
+            return self._fail(pos)
         # case end of text
         if pos >= len(source):
-            return EndOfText(self, source, pos)
+            return self._fail(pos)
         # case success
+        # (the ascii set answers most checks, see charset.CharSet)
         char = source[pos]
-        
-        # This way, Unicode characters, previously treated as bytes,
-        # will pass; this is just a basic hack; a whole class allowing
-        # ranges of characters would be far better.
-        if char in self.charset or ord(char) > 255:
+        if char in self.charset.ascii or \
+                (char > '\x7f' and char in self.charset):
             return Node(self, char, pos, pos+1, source)
         # case failure
-        return MatchFailure(self, source, pos)
+        return self._fail(pos)
 
     def _format(self):
         ''' normal output format
@@ -1169,6 +1655,10 @@ class Klass(Pattern):
         # already computed by _cleanRepr(expression)
         return self.format
 
+    def _reach(self, source, pos, result):
+        ''' end of source text examined: current char '''
+        return pos + 1
+
     def _message(self):
         ''' error message in case of failure '''
         return "Cannot find any char member of class %s." % self
@@ -1195,7 +1685,7 @@ class String(Pattern):
             name : [a..z]+   will yield a string pattern
         ~ Allows *, +, {m..} as well as {n} or {m,n} repetitions.
           !!! By default, numMin=1, which corresponds to '+'.
-        ~ Possible "until" stop condition.
+        ~ Possible "until" stop condition: see Until.
         * Note: unlike Repetition, default numMin is 1!
         * Note: numMax is *not* a failure case, a max char number instead.
         (failure will be detected by next pattern anyway)
@@ -1220,7 +1710,7 @@ class String(Pattern):
         (self.numMin,self.numMax) = (numMin,numMax)
         # define common attributes
         Pattern.__init__(self, expression, name)
-        # Note: no wrapped pattern (for _reset_memo),
+        # Note: no wrapped pattern (for analysis),
         # cause we check the klass's charset directly.
 
     def _realCheck(self, source, pos):
@@ -1231,7 +1721,7 @@ class String(Pattern):
         if pos >= len(source):
             if self.numMin:
                 # error
-                return EndOfText(self, source, pos)
+                return self._fail(pos)
             return Node(self, Node.NIL, pos,pos,source)
         # Simply read as many valid chars as possible
         # -- up to numMax or end-of-text.
@@ -1241,16 +1731,18 @@ class String(Pattern):
             stopPos = startPos + self.numMax
         else:
             stopPos = len(source)
-        # looping
-        charset = self.charset
-        while (pos < stopPos) and (source[pos] in charset):
-            pos += 1
+        # looping -- or jump to end of run, case char map
+        rows = running.context.rows(self)
+        if rows is not None:
+            pos = min(rows[1][pos], stopPos)
+        else:
+            pos = self.charset.span(source, pos, stopPos)
         # result value:
         chars = source[startPos:pos]
         length = len(chars)
         # check numMin, case requested
         if (self.numMin) and (length < self.numMin):
-            return MatchFailure(self, source, pos)
+            return self._fail(pos)
         # result:
         # possibly NIL
         if length == 0:
@@ -1258,6 +1750,20 @@ class String(Pattern):
         node = Node(self, chars, startPos,pos,source)
         return node
 
+    def _reach(self, source, pos, result):
+        ''' end of source text examined: run of klass chars '''
+        if isinstance(result,Node):
+            return result.end + 1
+        return self.charset.span(source, pos, len(source)) + 1
+
+    def _regexCheck(self, source, pos):
+        ''' Match check using regex, unless a char map is available:
+            the latter is faster.
+        '''
+        if running.context.charMap is not None:
+            return self._realCheck(source, pos)
+        return Pattern._regexCheck(self, source, pos)
+
     def _message(self):
         ''' error message in case of failure '''
         return "Cannot find minimal number of characters (%s)\n" \
@@ -1295,11 +1801,22 @@ class AnyChar(Pattern):
 
     def __init__(self, expression=None, name=None):
         ''' Define name, memo.'''
-        if AnyChar.KLASS is not None:
-            self.wrapped = [AnyChar.KLASS]  # --> _resetMemo
         # define common attributes
         Pattern.__init__(self, expression, name)
 
+    @property
+    def wrapped(self):
+        ''' KLASS, if any --> analysis
+            (KLASS may be set after AnyChar patterns are created)
+        '''
+        if AnyChar.KLASS is None:
+            return []
+        return [AnyChar.KLASS]
+
+    @wrapped.setter
+    def wrapped(self, patterns):
+        pass
+
     def _realCheck(self, source, pos):
         ''' Check pattern match at position pos in source string.
             ~ if KLASS is None: successful if not at end of source text.
@@ -1309,7 +1826,7 @@ class AnyChar(Pattern):
         if KLASS is None:
             # case end of text
             if pos >= len(source):
-                return EndOfText(self, source, pos)
+                return self._fail(pos)
             # case else: read current char
             return Node(self, source[pos], pos,pos+1,source)
         # case KLASS defined: match char in KLASS
@@ -1321,6 +1838,10 @@ class AnyChar(Pattern):
                         "Found %s:%s" %(KLASS.__class__.__name__,KLASS) )
             raise TypeError(message)
 
+    def _reach(self, source, pos, result):
+        ''' end of source text examined: current char '''
+        return pos + 1
+
     def _message(self):
         ''' error message in case of failure '''
         return "Cannot find char: %s." % self.char
@@ -1333,6 +1854,53 @@ class AnyChar(Pattern):
 ANY_CHAR = AnyChar()
 
 
+class Cut(Pattern):
+    ''' cut (commit point) pattern :   ^
+        ~ Always matches, without moving pos.
+        ~ Once a cut is passed, parsing cannot backtrack before it:
+          a failure that would need to (in a choice, option or
+          repetition started before the cut) makes the parse fail.
+        ~ Memo entries for positions before the cut are then dropped,
+          so that long record-structured sources are parsed with
+          memo of bounded size.
+        ~ Cuts have no effect inside lookaheads.
+    '''
+    ''' example
+        record  : key '=' ^ value EOL
+        line    : record / comment
+        Once '=' is read, a line must be a valid record.
+    '''
+    def _realCheck(self, source, pos):
+        ''' Check pattern match at position pos in source string.
+            ~ always successful
+            ~ record cut position in parse context & drop memo behind it '''
+        context = running.context
+        if context.lookahead == 0 and pos > context.cutPosition:
+            context.cutPosition = pos
+            for memo in context.memos.values():
+                Cut._dropMemo(memo, pos)
+        return Node(self, Node.NIL, pos,pos,source)
+
+    @staticmethod
+    def _dropMemo(memo, pos):
+        ''' Forget memo entries for positions before pos. '''
+        if isinstance(memo, dict):
+            for key in memo.keys():
+                if key < pos:
+                    del memo[key]
+        else:
+            memo.drop(pos)
+
+    def _message(self):
+        ''' ### cut cannot fail! '''
+        pass
+
+    def _format(self):
+        ''' normal output format
+        '''
+        return "^"
+
+
 class Recursive(Pattern):
     ''' recursive pattern wrapper
         ~ only a trick to implement class recursivity
@@ -1383,7 +1951,7 @@ class Recursive(Pattern):
         # Record wrapped pattern.
         self.pattern = pattern
         self.pattern.name = '@%s@' % self.name
-        self.wrapped = [pattern]    # --> _resetMemo
+        self.wrapped = [pattern]    # --> analysis
 
         # Return self !!!
         self.isDefined = True
@@ -1396,12 +1964,7 @@ class Recursive(Pattern):
             message = "Recursive pattern format undefined yet: %s" %self.name
             raise ValueError(message)
         # simply check through wrapped pattern
-        try:
-            node = self.pattern._memoCheck(source, pos)
-            return node
-        except PijnuError, e:
-            e.pattern = self
-            return e
+        return self.pattern._memoCheck(source, pos)
 
     def _message(self):
         ''' error message in case of failure '''
@@ -0,0 +1,116 @@
+# -*- coding: utf8 -*-
+
+'''
+© 2009 Denis Derman (former developer) <denis.spir@gmail.com>
+© 2011 Peter Potrowl (current developer) <peter017@gmail.com>
+
+This file is part of PIJNU.
+
+PIJNU is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PIJNU is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PIJNU: see the file called 'GPL'.
+If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+Push
+
+Parse a source given in chunks, as they come (eg from a socket),
+expat-like:
+    push = PushParser(parser, handler)
+    push.feed(chunk) ...
+    push.close()
+calls handler with each top-level node as soon as it is complete
+(without handler, nodes are put in the push parser's queue).
+
+~ When the top pattern repeats records (eg lines : line+), top-level
+  nodes are the records: they are parsed by a tail parser, which holds
+  only the text of the record in progress (see module tail).
+  node.offset is the position of a record in the whole source.
+~ Else the top node is the only one: the whole source is held until
+  close, then parsed --which streaming sources should avoid.
+~ However the source is split, nodes are the ones of a parse of
+  the whole source (see test/push.py).
+~ Errors of the parse are raised by feed or close, as soon as they
+  are final: nodes completed before the error are handled first.
+'''
+
+### import/export
+import sys
+from collections import deque
+from error import PijnuError
+from tail import TailParser
+
+__all__ = ["PushParser"]
+
+
+class PushParser(object):
+    ''' parser of a source pushed in chunks -- see module doc
+        ~ handler: function called with each top-level node
+        ~ queue: nodes handled by default (a deque)
+        ~ tail: tail parser of records, if the top pattern repeats them
+        ~ Beware: when the top pattern does not repeat records
+          (tail is None), nothing is parsed before close: the whole
+          source is held until then, & its node is the only one.
+          Use a grammar which top pattern is a repetition (eg
+          docs : doc*) for sources that must not be held in full.
+    '''
+    def __init__(self, parser, handler=None):
+        ''' Define pattern, handler & queue, tail parser or buffer. '''
+        self.pattern = getattr(parser, "topPattern", parser)
+        self.queue = deque()
+        self.handler = self.queue.append if handler is None else handler
+        try:
+            self.tail = TailParser(self.pattern)
+        except TypeError:
+            self.tail = None
+        self.chunks = []
+        self.closed = False
+
+    def feed(self, chunk):
+        ''' Parse chunk of source: handle nodes it completes. '''
+        if self.closed:
+            raise ValueError("Push parser is closed.")
+        if self.tail is None:
+            self.chunks.append(chunk)
+        else:
+            self._handle(self.tail.feed, chunk)
+
+    def close(self):
+        ''' End of source: handle remaining nodes. '''
+        if self.closed:
+            raise ValueError("Push parser is closed.")
+        self.closed = True
+        if self.tail is None:
+            source = "".join(self.chunks)
+            self.chunks = []
+            node = self.pattern.parse(source)
+            node.offset = 0
+            self.handler(node)
+        else:
+            self._handle(self.tail.close)
+
+    def _handle(self, method, *args):
+        ''' Handle nodes returned by tail parser method
+            (or completed before the error it raises). '''
+        try:
+            nodes = method(*args)
+        except PijnuError, error:
+            self.closed = True
+            # (handlers may catch errors of their own: keep this one's
+            # traceback)
+            exc_info = sys.exc_info()
+            for node in getattr(error, "records", ()):
+                self.handler(node)
+            raise exc_info[0], exc_info[1], exc_info[2]
+        for node in nodes:
+            self.handler(node)
@@ -0,0 +1,202 @@
+# -*- coding: utf8 -*-
+
+'''
+© 2009 Denis Derman (former developer) <denis.spir@gmail.com>
+© 2011 Peter Potrowl (current developer) <peter017@gmail.com>
+
+This file is part of PIJNU.
+
+PIJNU is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PIJNU is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PIJNU: see the file called 'GPL'.
+If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+Tail
+
+Parse text appended to a growing source, such as a log, with a grammar
+which top pattern is a repetition of records (eg lines : line+):
+    tail = TailParser(parser)
+    for record in tail.feed(newText): ...
+    for record in tail.close(): ...
+yields the records (child nodes) of parser.parse for the whole text
+fed, each one as soon as it is complete. Over a file, iterparse
+(see also Parser.iterparse) reads it in chunks & yields records:
+    for record in parser.iterparse(open("big.log")): ...
+
+~ Only the tail after the last committed record is held, together
+  with text appended: committed text is dropped, & so are the results
+  of its checks.
+~ Records are matched in an incremental parse context, which records
+  the extent of source text each check examined (see Pattern._reach).
+  A record is committed when its match (& the checks it ran) did not
+  examine the end of text: text appended later cannot change it.
+  The record after it is matched again at next feed.
+~ A record failure that does not depend on the end of text is final:
+  feed raises the error of the parse. Else the record is left pending;
+  close matches it at end of text.
+~ Record nodes are positioned in the text of the feed that yielded
+  them (node.source); node.offset is their position in the whole
+  text fed.
+~ Cost of a feed: checks of the text appended, & of the pending
+  record again. It does not depend on the size of committed text.
+~ Memory: a feed holds its text & the results of one record's checks;
+  a record holds the text of its feed (node.source). Thus iterparse
+  needs memory for a chunk & the records not freed yet by the caller,
+  whatever the size of the file. (A record longer than a chunk is
+  matched again at each chunk: choose chunks larger than records.)
+~ Limitations: actions of the top pattern are not applied (there is
+  no top node). Errors are positioned in the pending text. As for
+  reparses, actions reading source out of their node, or keeping
+  state between calls, may yield records that differ from a parse.
+'''
+
+### import/export
+import sys
+from pattern import (ZeroOrMore, OneOrMore, Repetition, String,
+                     Recursive, FAIL)
+from node import Node
+from error import PijnuError, IncompleteParse
+from context import ParseContext
+
+__all__ = ["TailParser", "iterparse"]
+
+# size of chunks read by iterparse
+CHUNK_SIZE = 1 << 16
+
+
+class TailParser(object):
+    ''' parser of text appended to a growing source -- see module doc
+        ~ parser: parser (or pattern) which top pattern repeats records
+        ~ offset: position in whole text of the pending tail
+        ~ count: number of records committed
+    '''
+    def __init__(self, parser):
+        ''' Define top & record patterns, pending text, context. '''
+        top = getattr(parser, "topPattern", parser)
+        while isinstance(top, Recursive):
+            top = top.pattern
+        if isinstance(top, String) \
+                or not isinstance(top, (ZeroOrMore, OneOrMore, Repetition)) \
+                or getattr(top, "numMax", False):
+            message = ("Tail parsing requires a top pattern repeating "
+                       "records with no max number, not:\n   %s" % top)
+            raise TypeError(message)
+        self.top = top
+        self.record = top.pattern
+        if isinstance(top, OneOrMore):
+            self.numMin = 1
+        else:
+            self.numMin = getattr(top, "numMin", False) or 0
+        self.context = ParseContext(incremental=True)
+        self.pending = ""
+        self.offset = 0
+        self.count = 0
+        self.closed = False
+
+    def feed(self, text):
+        ''' Append text: return the list of records it completes.
+            ~ Raises the error of the parse, as soon as it is final;
+              error.records holds the records completed before it.
+        '''
+        if self.closed:
+            raise ValueError("Tail parser is closed.")
+        return self._records(self.pending + text, False)
+
+    def close(self):
+        ''' End of text: return the list of remaining records.
+            ~ Raises the error of the parse if text is left unmatched
+              or records are less than the top pattern's min number
+              (with error.records, as for feed).
+        '''
+        if self.closed:
+            raise ValueError("Tail parser is closed.")
+        records = self._records(self.pending, True)
+        self.closed = True
+        if self.count < self.numMin:
+            # (for the farthest failure)
+            self.record._resetMemo(self.pending, self.context)
+            self.record._memoCheck(self.pending, 0)
+            error = self.top._error(self.pending, FAIL)
+            error.records = records
+            raise error
+        return records
+
+    def _records(self, source, final):
+        ''' Match records in pending text source: commit the ones
+            which do not depend on end of text (all when final).
+        '''
+        context = self.context
+        record = self.record
+        record._resetMemo(source, context)
+        (length, pos, records) = (len(source), 0, [])
+        while pos < length:
+            context.reach = pos
+            # results of committed records are not needed anymore
+            context.entries = dict()
+            result = record._memoCheck(source, pos)
+            if context.reach > length and not final:
+                break
+            if not isinstance(result, Node) or result.end == pos:
+                error = self._error(source, pos, result)
+                error.records = records
+                self.closed = True
+                raise error
+            result.offset = self.offset + pos
+            records.append(result)
+            self.count += 1
+            pos = result.end
+        context.entries = dict()
+        self.pending = source[pos:]
+        self.offset += pos
+        return records
+
+    def _error(self, source, pos, result):
+        ''' Error of a parse, for record failing at pos. '''
+        if isinstance(result, Node):
+            result = FAIL
+        if result is not FAIL:
+            return result
+        if self.count < self.numMin:
+            return self.top._error(source, FAIL)
+        failure = None
+        if self.context.failure.pos >= pos:
+            failure = self.record._error(source, FAIL)
+            failure.wrap = True
+        return IncompleteParse(self.top, source, pos, None, failure)
+
+
+def iterparse(parser, fileobj, chunksize=CHUNK_SIZE):
+    ''' Read fileobj in chunks of chunksize & parse its text with
+        parser (or pattern), which top pattern repeats records.
+        Yield each record as soon as it is complete.
+        ~ node.offset: position of record in the whole text
+        ~ Raises the error of the parse, as soon as it is final.
+    '''
+    tail = TailParser(parser)
+    return _records(tail, fileobj, chunksize)
+
+def _records(tail, fileobj, chunksize):
+    ''' records of text of fileobj, parsed by tail parser '''
+    while not tail.closed:
+        chunk = fileobj.read(chunksize)
+        try:
+            records = tail.feed(chunk) if chunk else tail.close()
+        except PijnuError, error:
+            # (after records completed before it, with its traceback)
+            exc_info = sys.exc_info()
+            for record in error.records:
+                yield record
+            raise exc_info[0], exc_info[1], exc_info[2]
+        for record in records:
+            yield record
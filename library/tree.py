@@ -0,0 +1,290 @@
+# -*- coding: utf8 -*-
+
+'''
+© 2009 Denis Derman (former developer) <denis.spir@gmail.com>
+© 2011 Peter Potrowl (current developer) <peter017@gmail.com>
+
+This file is part of PIJNU.
+
+PIJNU is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PIJNU is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PIJNU: see the file called 'GPL'.
+If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+'''
+Tree
+
+Parse tree stored as parallel arrays, an alternative to Node objects
+for big results held after a parse (see Parser.parseTree).
+
+~ A tree is converted from nodes: matching still builds them first.
+  So the peak memory of a parse is not lowered, only the memory
+  of results held afterwards (about 52 bytes per node, against
+  120 for slotted nodes --see test/nodeMemory.py).
+
+~ Nodes are numbered in document order (preorder): node 0 is the root,
+  the nodes of a subtree follow their root.
+~ For each node, the arrays hold:
+  tag id, start & end in source, parent, first child & next sibling
+  (-1 for none) & a value slot.
+~ The value slot holds a leaf's value, or None for branches
+  and for leaves which value is still the matched snippet
+  (then read from source on access).
+~ TreeNode is a light Node-like view on one node of a tree,
+  created on access: it supports tag, value, snippet, kind,
+  iteration on child nodes, treeView & leaves.
+  Other attributes set on nodes by match actions are not kept.
+~ Bulk traversal does not need views: see spans().
+'''
+
+### import/export
+from array import array
+from itertools import izip
+from node import Node
+
+__all__ = ["Tree", "TreeNode"]
+
+
+class Tree(object):
+    ''' parse tree as parallel arrays
+    '''
+    def __init__(self, node):
+        ''' Store tree of nodes rooted at node. '''
+        self.source = node.source
+        self.tagNames = []          # tag id --> tag
+        tagIds = {}                 # tag --> tag id
+        self.tags = tags = array('H')
+        self.starts = starts = array('l')
+        self.ends = ends = array('l')
+        self.parents = parents = array('l')
+        self.firstChilds = firstChilds = array('l')
+        self.nextSiblings = nextSiblings = array('l')
+        self.values = values = []
+        # last child of each node, while building
+        lastChilds = array('l')
+        source = self.source
+        stack = [(node, -1)]
+        while stack:
+            (node, parent) = stack.pop()
+            index = len(starts)
+            tag = node.tag
+            if tag not in tagIds:
+                tagIds[tag] = len(self.tagNames)
+                self.tagNames.append(tag)
+            tags.append(tagIds[tag])
+            (start, end) = (node.start, node.end)
+            starts.append(start)
+            ends.append(end)
+            parents.append(parent)
+            firstChilds.append(-1)
+            nextSiblings.append(-1)
+            lastChilds.append(-1)
+            # link to parent
+            if parent >= 0:
+                last = lastChilds[parent]
+                if last < 0:
+                    firstChilds[parent] = index
+                else:
+                    nextSiblings[last] = index
+                lastChilds[parent] = index
+            # value: children are stored after node, in order
+            value = node.value
+            if node.kind is Node.BRANCH:
+                values.append(None)
+                for child in reversed(value):
+                    stack.append((child, index))
+            elif isinstance(value, basestring) \
+                    and value == source[start:end]:
+                values.append(None)
+            else:
+                values.append(value)
+
+    def __len__(self):
+        ''' number of nodes '''
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        ''' view on node at index '''
+        if not 0 <= index < len(self.starts):
+            raise IndexError(index)
+        return TreeNode(self, index)
+
+    @property
+    def root(self):
+        ''' view on root node '''
+        return TreeNode(self, 0)
+
+    def children(self, index):
+        ''' indices of node's child nodes '''
+        child = self.firstChilds[index]
+        nextSiblings = self.nextSiblings
+        while child >= 0:
+            yield child
+            child = nextSiblings[child]
+
+    def spans(self, tag=None):
+        ''' Yield (tag, start, end) of all nodes in document order,
+            or (start, end) of nodes with given tag.
+        '''
+        tagNames = self.tagNames
+        if tag is None:
+            for (tagId, start, end) in izip(self.tags, self.starts,
+                                            self.ends):
+                yield (tagNames[tagId], start, end)
+            return
+        if tag not in tagNames:
+            return
+        tagId = tagNames.index(tag)
+        for (t, start, end) in izip(self.tags, self.starts, self.ends):
+            if t == tagId:
+                yield (start, end)
+
+    def treeView(self):
+        ''' tree view of root node '''
+        return self.root.treeView()
+
+
+class TreeNode(object):
+    ''' Node-like view on one node of a Tree
+    '''
+    __slots__ = ("tree", "index")
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    ### node data
+    @property
+    def tag(self):
+        tree = self.tree
+        return tree.tagNames[tree.tags[self.index]]
+
+    @property
+    def start(self):
+        return self.tree.starts[self.index]
+
+    @property
+    def end(self):
+        return self.tree.ends[self.index]
+
+    @property
+    def snippet(self):
+        ''' matched source text snippet '''
+        (tree, index) = (self.tree, self.index)
+        return tree.source[tree.starts[index]:tree.ends[index]]
+
+    @property
+    def kind(self):
+        if self.tree.firstChilds[self.index] >= 0:
+            return Node.BRANCH
+        return Node.LEAF
+
+    @property
+    def value(self):
+        ''' leaf value, or list of child node views '''
+        (tree, index) = (self.tree, self.index)
+        if tree.firstChilds[index] >= 0:
+            return list(self)
+        value = tree.values[index]
+        if value is None:
+            return self.snippet
+        return value
+
+    @property
+    def parent(self):
+        ''' view on parent node, or None for root '''
+        parent = self.tree.parents[self.index]
+        if parent < 0:
+            return None
+        return TreeNode(self.tree, parent)
+
+    ### iteration on child nodes
+    def __iter__(self):
+        tree = self.tree
+        for child in tree.children(self.index):
+            yield TreeNode(tree, child)
+
+    def __getitem__(self, index):
+        return list(self)[index]
+
+    def __len__(self):
+        return sum(1 for child in self.tree.children(self.index))
+
+    def __eq__(self, other):
+        return isinstance(other, TreeNode) \
+                and (self.tree, self.index) == (other.tree, other.index)
+
+    def __ne__(self, other):
+        return not self == other
+
+    ### output -- same formats as Node
+    # (explicit stacks over child & sibling links:
+    # nesting depth is not limited)
+    def _children(self, index):
+        ''' indices of node's child nodes, last first (for a stack) '''
+        children = list(self.tree.children(index))
+        children.reverse()
+        return children
+
+    def __repr__(self):
+        tree = self.tree
+        texts = []
+        # (isText, item): text, or index of node
+        stack = [(False, self.index)]
+        while stack:
+            (isText, item) = stack.pop()
+            if isText:
+                texts.append(item)
+            elif tree.firstChilds[item] < 0:
+                node = TreeNode(tree, item)
+                texts.append("%s:%s" % (node.tag, repr(node.value)))
+            else:
+                texts.append("%s:[" % tree.tagNames[tree.tags[item]])
+                stack.append((True, "]"))
+                children = self._children(item)
+                for (number, child) in enumerate(children):
+                    if number > 0:
+                        stack.append((True, ", "))
+                    stack.append((False, child))
+        return "".join(texts)
+
+    def treeView(self, level=0):
+        ''' tree view '''
+        TAB = "   "
+        tree = self.tree
+        lines = []
+        stack = [(self.index, level)]
+        while stack:
+            (index, level) = stack.pop()
+            format = "%s%s:" % (level * TAB, tree.tagNames[tree.tags[index]])
+            if tree.firstChilds[index] < 0:
+                lines.append("%s%s" % (format, TreeNode(tree, index).value))
+            else:
+                lines.append(format)
+                stack.extend((child, level + 1)
+                             for child in self._children(index))
+        return "\n".join(lines)
+
+    def leaves(self):
+        ''' concatenated leaf values '''
+        tree = self.tree
+        texts = []
+        stack = [self.index]
+        while stack:
+            index = stack.pop()
+            if tree.firstChilds[index] < 0:
+                texts.append("%s" % (TreeNode(tree, index).value))
+            else:
+                stack.extend(self._children(index))
+        return "".join(texts)
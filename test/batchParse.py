@@ -0,0 +1,60 @@
+# -*- coding: utf8 -*-
+
+'''
+© 2009 Denis Derman (former developer) <denis.spir@gmail.com>
+© 2011 Peter Potrowl (current developer) <peter017@gmail.com>
+
+This file is part of PIJNU.
+
+PIJNU is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PIJNU is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PIJNU: see the file called 'GPL'.
+If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+'''
+Batch benchmark -- throughput of Parser.parseMany vs number of workers
+
+Documents are independent: throughput should grow close to
+linearly with workers, up to the number of cpus.
+'''
+
+from multiprocessing import cpu_count
+from pijnu import makeParser
+from pijnu.library import BatchStats
+
+
+def benchmark():
+    grammar = r"""
+batch_formulas
+<definition>
+    ADD         : '+'                   : drop
+    MULT        : '*'                   : drop
+    LPAREN      : '('                   : drop
+    RPAREN      : ')'                   : drop
+    number      : [0..9]+ ('.' [0..9]+)?    : join
+    group       : LPAREN addition RPAREN    : liftNode
+    operand     : group / number
+    mult        : operand (MULT operand)*
+    addition    : mult (ADD mult)*          : @
+"""
+    parser = makeParser(grammar)()
+    document = "+".join(["(12.5*3+(4+5.25)*6)*7"] * 100)
+    documents = [document] * 200 + ["1+"] * 10
+    for workers in sorted(set([1, 2, cpu_count()])):
+        stats = BatchStats()
+        for result in parser.parseMany(documents, workers, stats=stats):
+            pass
+        print stats
+
+benchmark()
@@ -0,0 +1,72 @@
+# -*- coding: utf8 -*-
+
+'''
+© 2009 Denis Derman (former developer) <denis.spir@gmail.com>
+© 2011 Peter Potrowl (current developer) <peter017@gmail.com>
+
+This file is part of PIJNU.
+
+PIJNU is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PIJNU is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PIJNU: see the file called 'GPL'.
+If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+Iterparse benchmark -- peak memory of Parser.iterparse vs file size
+
+Logs of growing size are read from a generated file object (no text
+held but the chunk read). Records are counted & dropped: peak memory
+of the process should not grow with log size.
+'''
+
+from resource import getrusage, RUSAGE_SELF
+from time import time
+from pijnu import makeParser
+
+
+class Log(object):
+    ''' read-only file of size lines, made on the fly '''
+    line = "2011-05-17 INFO request served, status=200 time=12\n"
+
+    def __init__(self, size):
+        self.lines = size
+
+    def read(self, size):
+        count = min(self.lines, max(size // len(self.line), 1))
+        self.lines -= count
+        return self.line * count
+
+
+def benchmark():
+    grammar = r"""
+iterparse_log
+<definition>
+    SEP         : '\n'                          : drop
+    SPACE       : ' '                           : drop
+    date        : [0..9]+ '-' [0..9]+ '-' [0..9]+   : join
+    level       : "INFO" / "WARN" / "ERROR"
+    message     : [a..z  A..Z  0..9  ,.=\x20]+
+    entry       : date SPACE level SPACE message SEP
+    log         : entry*
+"""
+    parser = makeParser(grammar)()
+    for size in (10000, 50000, 200000):
+        (count, start) = (0, time())
+        for record in parser.iterparse(Log(size)):
+            count += 1
+        assert count == size
+        peak = getrusage(RUSAGE_SELF).ru_maxrss / 1024.
+        print ("%6s lines (%5.1fMB): %6.2fs   peak memory %6.1fMB"
+               % (size, size * len(Log.line) / 1e6, time() - start, peak))
+
+benchmark()
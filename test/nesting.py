@@ -0,0 +1,79 @@
+# -*- coding: utf8 -*-
+
+'''
+© 2009 Denis Derman (former developer) <denis.spir@gmail.com>
+© 2011 Peter Potrowl (current developer) <peter017@gmail.com>
+
+This file is part of PIJNU.
+
+PIJNU is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PIJNU is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PIJNU: see the file called 'GPL'.
+If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+'''
+Nesting benchmark -- time per char of deeply nested vs shallow sources
+
+The machine (explicit stack of frames, held in a list on the heap)
+parses both at the same speed, whatever the nesting depth;
+the interpreter (recursive method calls) stops at Python's
+recursion limit.
+'''
+
+from sys import getrecursionlimit
+from time import time
+from pijnu import makeParser
+
+
+def bestTime(parse, source, n=5):
+    ''' best time of n parses of source '''
+    times = []
+    for i in range(n):
+        t0 = time()
+        parse(source)
+        times.append(time() - t0)
+    return min(times)
+
+
+def benchmark():
+    grammar = r"""
+nesting
+<definition>
+    ADD         : '+'                   : drop
+    LPAREN      : '('                   : drop
+    RPAREN      : ')'                   : drop
+    number      : [0..9]+
+    group       : LPAREN addition RPAREN    : liftNode
+    operand     : group / number
+    addition    : operand (ADD operand)*    : @
+"""
+    parser = makeParser(grammar)()
+    machine = parser.compile()
+    depth = 20 * getrecursionlimit()
+    # same items, nested 10 levels deep or all the way down:
+    # "(1+(1+(...)))+(1+(1+(...)))+..." vs "(1+(1+(1+(...))))"
+    shallow = "+".join(["(1+" * 10 + "1" + ")" * 10] * (depth // 10))
+    nested = "(1+" * depth + "1" + ")" * depth
+    print "nesting depth:               %s" % depth
+    for (name, source) in [("shallow", shallow), ("nested", nested)]:
+        t = bestTime(machine.parse, source)
+        print "%-8s machine (us/char):  %.2f" % (name,
+                                                t * 1e6 / len(source))
+    try:
+        parser.parse(nested)
+        print "nested   interpreter:        ok"
+    except RuntimeError:
+        print "nested   interpreter:        recursion limit exceeded"
+
+benchmark()
@@ -0,0 +1,113 @@
+# -*- coding: utf8 -*-
+
+'''
+© 2009 Denis Derman (former developer) <denis.spir@gmail.com>
+© 2011 Peter Potrowl (current developer) <peter017@gmail.com>
+
+This file is part of PIJNU.
+
+PIJNU is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PIJNU is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PIJNU: see the file called 'GPL'.
+If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+'''
+Node memory benchmark -- bytes per node of a parse tree
+
+Compares the slotted Node type with a node type storing
+the same information in a per-instance dict,
+with an eagerly sliced snippet & form (former Node layout),
+and with a Tree (parse tree as parallel arrays).
+'''
+
+from sys import getsizeof
+from pijnu import makeParser
+from pijnu.library import Node, Tree
+
+
+class DictNode(object):
+    ''' former node layout: attributes in __dict__, snippet sliced '''
+    def __init__(self, node):
+        self.tag = node.tag
+        self.value = node.value
+        self.pattern = node.pattern
+        self.form = node.value
+        self.kind = node.kind
+        self.source = node.source
+        self.start, self.end = node.start, node.end
+        self.snippet = node.source[node.start:node.end]
+
+
+def nodes(node):
+    ''' all nodes of tree '''
+    yield node
+    if node.kind is Node.BRANCH:
+        for child in node.value:
+            for sub in nodes(child):
+                yield sub
+
+
+def dictNodeSize(node):
+    ''' bytes held by a DictNode copy of node
+        (snippet counted unless it is an interned single char) '''
+    dictNode = DictNode(node)
+    size = getsizeof(dictNode) + getsizeof(dictNode.__dict__)
+    if len(dictNode.snippet) > 1:
+        size += getsizeof(dictNode.snippet)
+    return size
+
+
+def nodeSize(node):
+    ''' bytes held by node itself '''
+    size = getsizeof(node)
+    if "__dict__" in dir(node) and node.__dict__:
+        size += getsizeof(node.__dict__)
+    return size
+
+
+def treeSize(tree):
+    ''' bytes held by tree arrays (leaf values not counted) '''
+    return sum(getsizeof(array) for array in (tree.tags, tree.starts,
+            tree.ends, tree.parents, tree.firstChilds, tree.nextSiblings,
+            tree.values))
+
+
+def benchmark():
+    grammar = r"""
+nodeMemory
+<definition>
+    SEP         : ' '                   : drop
+    DOT         : '.'
+    digit       : [0..9]
+    integer     : digit+
+    real        : integer DOT integer?
+    number      : real / integer
+    word        : [a..z]+
+    item        : number / word
+    items       : item (SEP item)*      : extract
+"""
+    parser = makeParser(grammar)()
+    source = "abc 12.34 de 5 fghij 678.9 " * 200 + "end"
+    tree = parser.parse(source)
+    allNodes = list(nodes(tree))
+    count = len(allNodes)
+    slotted = sum(nodeSize(node) for node in allNodes)
+    former = sum(dictNodeSize(node) for node in allNodes)
+    print "nodes:                       %s" % count
+    print "dict node (bytes/node):      %.1f" % (float(former) / count)
+    print "slotted node (bytes/node):   %.1f" % (float(slotted) / count)
+    print "tree (bytes/node):           %.1f" % (float(treeSize(Tree(tree)))
+                                                 / count)
+
+benchmark()
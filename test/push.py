@@ -0,0 +1,66 @@
+# -*- coding: utf8 -*-
+
+'''
+© 2009 Denis Derman (former developer) <denis.spir@gmail.com>
+© 2011 Peter Potrowl (current developer) <peter017@gmail.com>
+
+This file is part of PIJNU.
+
+PIJNU is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PIJNU is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PIJNU: see the file called 'GPL'.
+If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+Push benchmark -- PushParser over a source split in chunks of any size
+
+The same document is pushed in chunks of sizes from 1 char to the
+whole of it: nodes handled (& their offsets) must be the same every
+time, & the ones of a full parse. Time per size shows the cost of
+small chunks (the record in progress is matched again at each chunk).
+'''
+
+from time import time
+from pijnu import makeParser
+from pijnu.library import PushParser
+
+
+def benchmark():
+    grammar = r"""
+push_messages
+<definition>
+    SEP         : '\n'                          : drop
+    SPACE       : ' '                           : drop
+    key         : [a..z]+
+    value       : [a..z  0..9  .]+
+    field       : key '=' value                 : liftValue
+    message     : "MSG" (SPACE field)+ SEP
+    messages    : message*
+"""
+    parser = makeParser(grammar)()
+    document = "MSG from=host1.example to=x id=42\nMSG id=43 size=2048\n" \
+               * 1000
+    expected = [(node.treeView(), node.start)
+                for node in parser.parse(document).value]
+    for size in (1, 7, 64, 1000, 65536, len(document)):
+        start = time()
+        push = PushParser(parser)
+        for pos in range(0, len(document), size):
+            push.feed(document[pos:pos + size])
+        push.close()
+        nodes = [(node.treeView(), node.offset) for node in push.queue]
+        assert nodes == expected
+        print ("chunks of %6s chars: %5s nodes, same as full parse  %6.2fs"
+               % (size, len(nodes), time() - start))
+
+benchmark()
@@ -0,0 +1,78 @@
+# -*- coding: utf8 -*-
+
+'''
+© 2009 Denis Derman (former developer) <denis.spir@gmail.com>
+© 2011 Peter Potrowl (current developer) <peter017@gmail.com>
+
+This file is part of PIJNU.
+
+PIJNU is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PIJNU is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PIJNU: see the file called 'GPL'.
+If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+'''
+Reparse benchmark -- keystroke latency of Parser.reparse vs full parse
+
+A char is typed then erased at random places (in plain text)
+of documents of growing size. Only checks the edit affects run again:
+latency should stay far below the one of a full parse. (It still grows
+with document size: the list of lines is checked again, looking up
+every line; nodes are moved only when reused or read.)
+'''
+
+from random import Random
+from time import time
+from pijnu import makeParser
+from pijnu.library import ParseContext
+
+
+def benchmark():
+    grammar = r"""
+reparse_document
+<definition>
+    EOL         : '\n'                          : drop
+    STAR        : "**"                          : drop
+    SLASH       : "//"                          : drop
+    text        : [a..z  A..Z  0..9  ,.\x20]+
+    bold        : STAR text STAR                : liftValue
+    italic      : SLASH text SLASH              : liftValue
+    inline      : bold / italic / text
+    line        : inline* EOL
+    lines       : line*
+"""
+    parser = makeParser(grammar)()
+    random = Random(1)
+    paragraph = "Some text, **bold** words and //italic// ones.\n"
+    for size in (100, 1000, 5000):
+        document = paragraph * size
+        start = time()
+        parser.parse(document)
+        full = time() - start
+        # (seeds the context for reparses)
+        context = ParseContext(incremental=True)
+        tree = parser.parse(document, context)
+        (count, start) = (50, time())
+        for i in range(count):
+            # (in plain text: the document stays valid)
+            pos = random.randrange(size) * len(paragraph)
+            pos += random.randint(0, 9)
+            tree = parser.reparse(tree, (pos, pos, "x"), context)
+            tree = parser.reparse(tree, (pos, pos + 1, ""), context)
+        latency = (time() - start) / (2 * count)
+        assert tree.source == document
+        print ("%5s lines: full parse %8.2fms   reparse %7.2fms"
+               % (size, full * 1000, latency * 1000))
+
+benchmark()
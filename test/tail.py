@@ -0,0 +1,67 @@
+# -*- coding: utf8 -*-
+
+'''
+© 2009 Denis Derman (former developer) <denis.spir@gmail.com>
+© 2011 Peter Potrowl (current developer) <peter017@gmail.com>
+
+This file is part of PIJNU.
+
+PIJNU is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PIJNU is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PIJNU: see the file called 'GPL'.
+If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+Tail benchmark -- update cost of TailParser.feed vs full parse
+
+Lines are appended to logs of growing size. A tail parse only
+checks the text appended: its cost per update should not depend
+on log size, while the one of a full parse does.
+'''
+
+from time import time
+from pijnu import makeParser
+from pijnu.library import TailParser
+
+
+def benchmark():
+    grammar = r"""
+tail_log
+<definition>
+    SEP         : '\n'                          : drop
+    SPACE       : ' '                           : drop
+    date        : [0..9]+ '-' [0..9]+ '-' [0..9]+   : join
+    level       : "INFO" / "WARN" / "ERROR"
+    message     : [a..z  A..Z  0..9  ,.=\x20]+
+    entry       : date SPACE level SPACE message SEP
+    log         : entry*
+"""
+    parser = makeParser(grammar)()
+    line = "2011-05-17 INFO request served, status=200 time=12\n"
+    update = line * 10
+    for size in (1000, 10000, 50000):
+        log = line * size
+        start = time()
+        parser.parse(log + update)
+        full = time() - start
+        tail = TailParser(parser)
+        tail.feed(log)
+        (count, start) = (50, time())
+        for i in range(count):
+            records = tail.feed(update)
+        latency = (time() - start) / count
+        assert len(records) == 10 and tail.offset == len(log + update * 50)
+        print ("%6s lines: full parse %8.2fms   tail update %6.2fms"
+               % (size, full * 1000, latency * 1000))
+
+benchmark()
@@ -0,0 +1,76 @@
+from pijnu.tests import ParserTestCase
+from pijnu import makeParser
+from pijnu.library import Tree, ParseResult, BatchStats
+from pijnu.tests.test_regex import identifier_grammar
+from pijnu.tests.test_until import until_grammar
+
+
+SOURCES = ["if x_1 -2.5 else ^ab2 3", "if 1.", "x -", "abc def", "^1",
+           "else 12"] * 5
+
+
+def leaves(node):
+    """Picklable conversion of result trees."""
+    return node.leaves()
+
+
+class BatchTests(ParserTestCase):
+    """Tests for batch parsing in worker processes"""
+
+    def expected(self, parser, source):
+        try:
+            return (parser.parse(source).treeView(), None)
+        except Exception, error:
+            return (None, error.__class__.__name__)
+
+    def test_same_results(self):
+        """Workers yield the trees & failures of sequential parses."""
+        parser = makeParser(identifier_grammar)()
+        expected = [self.expected(parser, source) for source in SOURCES]
+        for workers in (1, 2):
+            results = list(parser.parseMany(SOURCES, workers, chunksize=4))
+            self.assertEquals([result.index for result in results],
+                              range(len(SOURCES)))
+            for (result, (tree, errorType)) in zip(results, expected):
+                self.assertTrue(isinstance(result, ParseResult))
+                self.assertEquals(result.errorType, errorType)
+                if result.ok:
+                    self.assertTrue(isinstance(result.value, Tree))
+                    self.assertEquals(result.value.treeView(), tree)
+                else:
+                    self.assertTrue(result.value is None and result.error)
+
+    def test_unordered(self):
+        """Unordered results come with their index."""
+        parser = makeParser(identifier_grammar)()
+        results = parser.parseMany(SOURCES, 2, chunksize=3, ordered=False)
+        results = sorted(results, key=lambda result: result.index)
+        self.assertEquals([result.ok for result in results],
+                          [result.ok for result in
+                           parser.parseMany(SOURCES, 1)])
+
+    def test_factory_and_convert(self):
+        """Workers may build the parser & convert trees themselves."""
+        make_parser = makeParser(until_grammar)
+        parser = make_parser()
+        sources = ["**ab c**", "//abc//12,", "**ab"]
+        results = list(parser.parseMany(sources, 2, factory=make_parser,
+                                        convert=leaves))
+        self.assertEquals(results[0].value, leaves(parser.parse(sources[0])))
+        self.assertEquals(results[1].value, leaves(parser.parse(sources[1])))
+        self.assertFalse(results[2].ok)
+
+    def test_stats(self):
+        """Stats count sources, failures & chars."""
+        parser = makeParser(identifier_grammar)()
+        stats = BatchStats()
+        for result in parser.parseMany(SOURCES, 2, stats=stats):
+            pass
+        self.assertEquals(stats.sources, len(SOURCES))
+        self.assertEquals(stats.failures, 3 * 5)
+        self.assertEquals(stats.chars, sum(map(len, SOURCES)))
+        self.assertTrue("sources/s:" in str(stats))
+        # batch left before its end
+        for result in parser.parseMany(SOURCES * 20, 2, stats=stats):
+            break
+        self.assertTrue(stats.stop_time is not None)
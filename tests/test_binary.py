@@ -0,0 +1,78 @@
+from sys import getrecursionlimit
+from pijnu.tests import ParserTestCase
+from pijnu import makeParser
+from pijnu.library import Word, Node, binary
+from pijnu.library.node import Nodes
+from pijnu.tests.test_machine import wiki_inline_grammar, formula_grammar
+from pijnu.tests.test_regex import identifier_grammar
+from pijnu.tests.test_until import until_grammar
+
+
+class BinaryTests(ParserTestCase):
+    """Tests for the compact binary encoding of node trees"""
+
+    def assertSameTree(self, node, other):
+        self.assertEquals(other.treeView(), node.treeView())
+        self.assertEquals(repr(other), repr(node))
+        self.assertEquals(other.snippet, node.snippet)
+
+    def test_round_trip(self):
+        """Trees are the same after dumps & loads."""
+        for (grammar, sources) in [
+                (identifier_grammar, ["if x_1 -2.5 else ^ab2 3"]),
+                (wiki_inline_grammar, ["abc //def **gh** i// j~*",
+                                       u"caf\xe9 //d\xe9f **gh** i// j~*"]),
+                (formula_grammar, ["9*8+01*2.3+45*67*(89+01.2)"]),
+                (until_grammar, ["**ab**//a b//9."])]:
+            parser = makeParser(grammar)()
+            for source in sources:
+                node = parser.parse(source)
+                data = binary.dumps(node)
+                other = binary.loads(data)
+                self.assertSameTree(node, other)
+                self.assertEquals(type(other.source), type(source))
+                self.assertTrue(other.pattern is None)
+                # once more
+                self.assertEquals(binary.dumps(other), data)
+
+    def test_without_source(self):
+        """Source may be left out, then given to loads."""
+        node = makeParser(identifier_grammar)().parse("if x_1 else 3")
+        data = binary.dumps(node, withSource=False)
+        self.assertTrue(len(data) < len(binary.dumps(node)))
+        self.assertSameTree(node, binary.loads(data, "if x_1 else 3"))
+        self.assertRaises(ValueError, binary.loads, data)
+        self.assertRaises(ValueError, binary.loads, "not a tree")
+
+    def test_values(self):
+        """Leaf values of any type are kept."""
+        source = "abcdefgh"
+        word = Word("ab", name="word")
+        values = [Node.NIL, "ab", u"\xe9", "", 0, 300, -70000, 2 ** 70,
+                  2.5, -0.0, True, False, None, (1, [2, "x"]), set([3])]
+        children = []
+        for value in values:
+            child = Node(word, "ab", 0, 2, source)
+            child.value = value
+            child.defineKind()
+            children.append(child)
+        # (set after creation: nil children would be dropped)
+        node = Node(word, "abcdefgh", 0, 8, source)
+        node.value = Nodes(children)
+        node.defineKind()
+        node.extra = "not kept"
+        other = binary.loads(binary.dumps(node))
+        for (child, value) in zip(other, values):
+            self.assertEquals(child.value, value)
+            self.assertEquals(type(child.value), type(value))
+        self.assertTrue(other[0].value is Node.NIL)
+        self.assertFalse(hasattr(other, "extra"))
+
+    def test_deep_tree(self):
+        """Nesting depth is not limited by Python's recursion limit."""
+        depth = 2 * getrecursionlimit()
+        machine = makeParser(formula_grammar)().compile()
+        source = "(1+" * depth + "2" + ")" * depth + "+3"
+        node = machine.parse(source)
+        self.assertEquals(binary.loads(binary.dumps(node)).treeView(),
+                          node.treeView())
@@ -0,0 +1,103 @@
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from pijnu.tests import ParserTestCase
+from pijnu import makeParser
+from pijnu.library import (ParseCache, Parser, Word, Klass, String,
+                           Sequence, PijnuError, join)
+from pijnu.tests.test_regex import identifier_grammar
+from pijnu.tests.test_machine import wiki_inline_grammar
+
+
+class CacheTests(ParserTestCase):
+    """Tests for the persistent cache of parse results"""
+
+    def setUp(self):
+        self.folder = mkdtemp()
+        self.path = os.path.join(self.folder, "results.db")
+
+    def tearDown(self):
+        rmtree(self.folder)
+
+    def test_hits(self):
+        """Cached trees are the ones of fresh parses."""
+        parser = makeParser(wiki_inline_grammar)()
+        cache = ParseCache(parser, self.path)
+        sources = ["abc //def **gh** i// j~*", u"caf\xe9 ~~ **x**"]
+        for source in sources * 2:
+            self.assertEquals(cache.parse(source).treeView(),
+                              parser.parse(source).treeView())
+        self.assertEquals((cache.hits, cache.misses), (2, 2))
+        self.assertEquals(len(cache), 2)
+        self.assertTrue("hits:" in str(cache))
+        cache.close()
+        # results persist, for this grammar only
+        cache = ParseCache(parser, self.path)
+        node = cache.parse(sources[1])
+        self.assertEquals(cache.hits, 1)
+        self.assertEquals(type(node.snippet), unicode)
+        other = makeParser(identifier_grammar)()
+        self.assertNotEquals(other.grammarHash, parser.grammarHash)
+        cache = ParseCache(other, self.path)
+        cache.parse("abc")
+        self.assertEquals((cache.hits, cache.misses), (0, 1))
+
+    def test_failures(self):
+        """Failures raise & are not cached."""
+        parser = makeParser(identifier_grammar)()
+        cache = ParseCache(parser, self.path)
+        for i in range(2):
+            self.assertRaises(PijnuError, cache.parse, "if 1.")
+        self.assertEquals((cache.hits, cache.misses, len(cache)), (0, 2, 0))
+
+    def test_eviction(self):
+        """Least recently used trees are dropped beyond max size."""
+        parser = makeParser(identifier_grammar)()
+        cache = ParseCache(parser, self.path, maxSize=2000)
+        sources = ["x%s if y%s" % (i, i) for i in range(100)]
+        for source in sources:
+            cache.parse(source)
+        self.assertTrue(0 < cache.size <= 2000)
+        self.assertTrue(0 < len(cache) < 100)
+        cache.parse(sources[-1])
+        self.assertEquals(cache.hits, 1)
+        cache.parse(sources[0])
+        self.assertEquals(cache.misses, 101)
+        cache.clear()
+        self.assertEquals((len(cache), cache.size), (0, 0))
+
+    def test_code_parser(self):
+        """Parsers from code are keyed by their pattern graph."""
+        def makeCodeParser(chars):
+            name = String(Klass(chars))(join)
+            names = Sequence([name, Word("!")])
+            return Parser(locals(), "names")
+        cache = ParseCache(makeCodeParser("a..z"), self.path)
+        self.assertEquals(cache.parse("ab!").treeView(),
+                          makeCodeParser("a..z").parse("ab!").treeView())
+        cache = ParseCache(makeCodeParser("a..z"), self.path)
+        cache.parse("ab!")
+        self.assertEquals(cache.hits, 1)
+        cache = ParseCache(makeCodeParser("a..y"), self.path)
+        cache.parse("ab!")
+        self.assertEquals(cache.misses, 1)
+
+    def test_external_actions(self):
+        """Parsers of one grammar with other actions do not share results."""
+        grammar = r"""
+test_cache_external_actions
+<definition>
+    number      : [0..9]+               : convert
+"""
+        def half(node):
+            node.value = int(node.value) // 2
+        def double(node):
+            node.value = int(node.value) * 2
+        make_parser = makeParser(grammar)
+        results = []
+        for convert in (half, double, half):
+            # (same name, other code)
+            convert.__name__ = "convert"
+            cache = ParseCache(make_parser({"convert": convert}), self.path)
+            results.append((cache.parse("12").value, cache.hits))
+        self.assertEquals(results, [(6, 0), (24, 0), (6, 1)])
@@ -0,0 +1,92 @@
+from unittest import skipIf
+from pijnu.tests import ParserTestCase
+from pijnu import makeParser
+from pijnu.library import (Klass, String, Sequence, AnyChar, Pattern,
+                           PijnuError)
+from pijnu.library import charmap
+from pijnu.library.charmap import CharMap
+from pijnu.library.charset import CharSet, ranges
+from pijnu.tests.test_machine import wiki_inline_grammar, formula_grammar
+from pijnu.tests.test_regex import identifier_grammar
+from pijnu.tests.test_charset import CJK
+
+
+class CharMapTests(ParserTestCase):
+    """Tests for char maps precomputed per source"""
+
+    def tearDown(self):
+        Pattern.CHAR_MAP = False
+
+    def parse(self, pattern, source, charMap):
+        Pattern.CHAR_MAP = charMap
+        try:
+            return pattern.parse(source)
+        finally:
+            Pattern.CHAR_MAP = False
+
+    def test_rows(self):
+        """Rows hold membership & run ends, for str & unicode sources."""
+        letters = CharSet(ranges("a..z"))
+        for source in ("ab1 cd", u"ab1 cd"):
+            (members, runEnds) = CharMap(source).rows(letters)
+            self.assertEquals(list(members), [1, 1, 0, 0, 1, 1, 0])
+            self.assertEquals(list(runEnds), [2, 2, 2, 3, 6, 6, 6])
+        wide = CharSet(ranges(CJK))
+        source = u"a" + unichr(0x4e00) + unichr(0x9fff) + unichr(0xa000)
+        self.assertEquals(list(CharMap(source).rows(wide)[1]),
+                          [0, 3, 3, 3, 4])
+
+    @skipIf(charmap.numpy is None, "NumPy is not available")
+    def test_numpy_rows(self):
+        """NumPy & regex rows are the same."""
+        chars = CharSet(ranges(r"a..z  \xe9  " + CJK))
+        for source in ("ab1 c\xe9d", u"ab\xe9" + unichr(0x4e01) + u"1 x"):
+            map = CharMap(source)
+            self.assertEquals(map._numpyRows(chars, map._codes()),
+                              map._regexRows(chars))
+
+    def test_same_trees(self):
+        """Trees & errors are the same with & without char map."""
+        for (grammar, sources) in [
+                (identifier_grammar, ["if x_1 -2.5 else ^ab2 3"]),
+                (wiki_inline_grammar, [u"caf\xe9 //def **gh** i// j~*"]),
+                (formula_grammar, ["9*8+01*2.3+45*67*(89+01.2)"])]:
+            parser = makeParser(grammar)()
+            for source in sources:
+                self.assertEquals(
+                    self.parse(parser.topPattern, source, True).treeView(),
+                    self.parse(parser.topPattern, source, False).treeView())
+        parser = makeParser(identifier_grammar)()
+        for source in ["if 1.", "x -"]:
+            messages = []
+            for charMap in (True, False):
+                try:
+                    self.parse(parser.topPattern, source, charMap)
+                except PijnuError, error:
+                    messages.append(str(error))
+            self.assertEquals(messages[0], messages[1])
+
+    def test_strings_and_klasses(self):
+        """Strings jump to the end of runs, up to their max length."""
+        (digit, letter) = (Klass("0..9"), Klass("a..z"))
+        pattern = Sequence([String(letter, numMax=3), String(digit),
+                            letter, AnyChar()])
+        for charMap in (True, False):
+            node = self.parse(pattern, "abc123x!", charMap)
+            self.assertEquals([child.value for child in node],
+                              ["abc", "123", "x", "!"])
+            self.assertRaises(PijnuError, self.parse, pattern, "abcd1x!",
+                              charMap)
+            self.assertEquals(pattern.patterns[0].charRows is not None,
+                              charMap)
+
+    def test_any_char_klass(self):
+        """AnyChar's KLASS, set after creation, gets its rows too."""
+        anyChar = AnyChar()
+        AnyChar.KLASS = Klass("a..z")
+        try:
+            self.assertEquals(self.parse(anyChar, "x", True).value, "x")
+            self.assertTrue(AnyChar.KLASS.charRows is not None)
+            self.assertRaises(PijnuError, self.parse, anyChar, "1", True)
+        finally:
+            AnyChar.KLASS = None
@@ -0,0 +1,65 @@
+from pijnu.tests import ParserTestCase
+from pijnu import makeParser
+from pijnu.library import (Klass, String, Choice, Char, MatchFailure,
+                           IncompleteParse)
+from pijnu.library.charset import CharSet, ranges, charset
+from pijnu.tests.test_machine import wiki_inline_grammar
+from pijnu.tests.test_rule_functions import makeRuleParsers
+
+# klass expressions with unicode ordinals
+CJK = r"\u4e00..\u9fff"
+SMILEY = r"\U0001f600"
+
+
+class CharSetTests(ParserTestCase):
+    """Tests for klass char sets"""
+
+    def test_ranges(self):
+        """Expressions give merged code ranges, without expansion."""
+        self.assertEquals(ranges("a..c  b..e  x"), [(97, 101), (120, 120)])
+        self.assertEquals(ranges("[a..z  !!b..y]"), [(97, 97), (122, 122)])
+        self.assertEquals(ranges("3..3  3..2  3..1"), [(51, 51)])
+        self.assertEquals(ranges(CJK + "  " + SMILEY),
+                          [(0x4e00, 0x9fff), (0x1f600, 0x1f600)])
+        self.assertEquals(len(CharSet(ranges(CJK))), 0x9fff - 0x4e00 + 1)
+        self.assertEquals(charset(r"a..c  \x31"), "1abc")
+
+    def test_membership(self):
+        """Membership holds for str & unicode chars, in or beyond latin-1."""
+        chars = CharSet(ranges(r"a..c  \xe9  " + CJK + "  " + SMILEY))
+        for char in ("a", u"c", "\xe9", u"\xe9",
+                     unichr(0x4e00), unichr(0x9fff), unichr(0x1f600)):
+            self.assertTrue(char in chars)
+        for char in ("d", u"\xea", "\xff", unichr(0x4dff), unichr(0xa000)):
+            self.assertFalse(char in chars)
+        self.assertEquals(chars.latin(), "abc\xe9")
+
+    def test_klass(self):
+        """Chars beyond latin-1 only match klasses holding them."""
+        klass = Klass("a..z")
+        self.assertRaises(MatchFailure, klass.match, unichr(0x4e01))
+        cjk = Klass(CJK)
+        self.assertEquals(cjk.match(unichr(0x4e01)).value, unichr(0x4e01))
+        self.assertRaises(MatchFailure, cjk.match, u"a")
+        both = Choice([klass, cjk, Char(u"\xe9")])
+        self.assertTrue(isinstance(both, Klass))
+        self.assertEquals(both.match(u"\xe9").value, u"\xe9")
+        source = u"ab" + unichr(0x4e01) + u"\xe9c" + unichr(0x1f600)
+        self.assertEquals(String(both).match(source).value, source[:-1])
+
+    def test_unicode_source(self):
+        """Pattern, machine & rule functions agree on unicode sources."""
+        (parser, ruleParser) = makeRuleParsers(wiki_inline_grammar)
+        machine = parser.compile()
+        source = u"caf\xe9 **th\xe9** //x//"
+        tree = parser.parse(source)
+        self.assertEquals(tree.treeView(), machine.parse(source).treeView())
+        self.assertEquals(tree.treeView(), ruleParser.parse(source).treeView())
+        self.assertEquals(tree.value,
+                          u'caf\xe9 <span class="importantText">th\xe9</span> '
+                          u'<span class="distinctText">x</span>')
+        # validChar only holds latin-1 chars
+        wide = u"a" + unichr(0x4e01)
+        self.assertRaises(IncompleteParse, parser.parse, wide)
+        self.assertRaises(IncompleteParse, machine.parse, wide)
+        self.assertRaises(IncompleteParse, ruleParser.parse, wide)
@@ -0,0 +1,118 @@
+import gc
+import sys
+from weakref import ref
+from threading import Thread
+from pijnu.tests import ParserTestCase
+from pijnu import makeParser
+from pijnu.library import (ParseContext, PijnuError, Parser, Word, Klass,
+                           String, Sequence, Choice, join)
+from pijnu.library.analysis import graphOf
+from pijnu.tests.test_regex import identifier_grammar
+from pijnu.tests.test_until import until_grammar, SOURCES
+from pijnu.tests.test_cut import record_grammar
+
+
+def outcome(method, source):
+    """Return tree view or error message of method for source."""
+    try:
+        return method(source).treeView()
+    except PijnuError, error:
+        return str(error)
+
+
+class ContextTests(ParserTestCase):
+    """Tests for parse state held by parse contexts"""
+
+    def test_explicit_context(self):
+        """A given context holds the state of the parse."""
+        parser = makeParser(identifier_grammar)()
+        context = ParseContext()
+        self.assertRaises(PijnuError, parser.parse, "if 1.", context)
+        self.assertEquals(context.failure.pos, 5)
+        self.assertEquals(context.source, "if 1.")
+        # context is reset by the next parse
+        self.assertEquals(parser.parse("if x", context).end, 4)
+        self.assertEquals(context.source, "if x")
+        self.assertTrue(context.failure.pos < 5)
+        self.assertTrue(context.memos)
+
+    def test_reset_tables(self):
+        """Each reset drops the tables of the previous match: they are
+        made again at first use."""
+        parser = makeParser(until_grammar)()
+        context = ParseContext()
+        parser.parse("**ab c**", context)
+        memo = context.memos[parser.item]
+        self.assertEquals(sorted(memo), [0, 8])
+        self.assertEquals(parser.bold.match("**xy**", context).value,
+                          "**xy**")
+        self.assertFalse(parser.item in context.memos)
+        self.assertEquals(len(parser.item.memo), 0)
+        self.assertTrue(context.memos[parser.item] is not memo)
+
+    def test_no_leak(self):
+        """Contexts do not keep patterns of previous matches alive."""
+        def makeCodeParser(chars):
+            name = String(Klass(chars))(join)
+            bang = Sequence([name, Word("!")])
+            ask = Sequence([name, Word("?")])
+            names = Choice([bang, ask])
+            return Parser(locals(), "names")
+        refs = []
+        for chars in ("a..z", "a..y", "a..x", "a..w"):
+            parser = makeCodeParser(chars)
+            parser.parse("ab?")
+            self.assertRaises(PijnuError, parser.parse, "ab")
+            refs.append(ref(parser.topPattern))
+        del parser
+        sys.exc_clear()
+        gc.collect()
+        # (the last match state is kept until the next one)
+        self.assertEquals([r() is None for r in refs],
+                          [True, True, True, False])
+        makeCodeParser("a..v").parse("ab!")
+        gc.collect()
+        self.assertTrue(refs[-1]() is None)
+
+    def test_registry(self):
+        """A parser records the patterns of its graph once."""
+        parser = makeParser(until_grammar)()
+        registry = parser.registry
+        self.assertTrue(registry[0] is parser.topPattern)
+        self.assertEquals(len(set(map(id, registry))), len(registry))
+        self.assertEquals(registry, graphOf(parser.topPattern))
+        for name in ("bold", "italic", "number", "markup", "STAR"):
+            self.assertTrue(getattr(parser, name) in registry)
+
+    def test_threads(self):
+        """Threads sharing one parser get the results of sequential parses."""
+        parser = makeParser(until_grammar)()
+        other = makeParser(identifier_grammar)()
+        machine = other.compile()
+        cut = makeParser(record_grammar)()
+        jobs = [(parser.parse, source) for source in SOURCES + ["**ab"]]
+        jobs += [(method, source)
+                 for method in (other.parse, other.match, machine.parse)
+                 for source in ("if x_1 -2.5 else ^ab2 3", "if 1.", "x -")]
+        jobs += [(cut.parse, "a=1\nbc=22\nde\n"), (cut.parse, "a=1\nb=c\n")]
+        expected = [outcome(method, source) for (method, source) in jobs]
+
+        results = {}
+        def run(number):
+            for turn in range(20):
+                for (i, (method, source)) in enumerate(jobs):
+                    results[number, turn, i] = outcome(method, source)
+        interval = sys.getcheckinterval()
+        sys.setcheckinterval(1)
+        try:
+            threads = [Thread(target=run, args=(number,))
+                       for number in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setcheckinterval(interval)
+        for ((number, turn, i), result) in results.items():
+            self.assertEquals(result, expected[i])
+        self.assertEquals(len(results), 4 * 20 * len(jobs))
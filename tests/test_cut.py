@@ -0,0 +1,67 @@
+from pijnu.tests import ParserTestCase
+from pijnu import makeParser
+from pijnu.library import PijnuError, Cut, ParseContext
+from pijnu.library.analysis import selectMemo
+
+
+record_grammar = r"""
+test_cut_records
+<definition>
+    SEP         : '\n'                  : drop
+    key         : [a..z]+
+    value       : [0..9]+
+    record      : key '=' ^ value SEP
+    other       : [a..z  =]+ SEP
+    line        : record / other
+    lines       : line+
+"""
+
+lookahead_grammar = r"""
+test_cut_lookahead
+<definition>
+    item        : (&("a" ^ "b") "ab") / "ac"
+"""
+
+
+class CutTests(ParserTestCase):
+    """Tests for the cut operator '^'"""
+
+    def test_grammar(self):
+        """'^' in a grammar yields a cut pattern."""
+        parser = makeParser(record_grammar)()
+        self.assertTrue(isinstance(parser.record.patterns[2], Cut))
+
+    def test_same_tree(self):
+        """A cut does not change the result of a successful parse."""
+        parser = makeParser(record_grammar)()
+        uncut = makeParser(record_grammar.replace(" ^", "")
+                           .replace("test_cut_records", "test_cut_uncut"))()
+        source = "a=1\nbc=22\nde\n"
+        self.assertEquals(parser.parse(source).treeView(),
+                          uncut.parse(source).treeView())
+
+    def test_no_backtracking(self):
+        """A failure after a cut cannot be recovered by a choice."""
+        parser = makeParser(record_grammar)()
+        uncut = makeParser(record_grammar.replace(" ^", "")
+                           .replace("test_cut_records", "test_cut_uncut"))()
+        source = "a=1\nb=c\n"
+        self.assertEquals(uncut.parse(source)[1].tag, "other")
+        self.assertRaises(PijnuError, parser.parse, source)
+
+    def test_memo_dropped(self):
+        """Memo entries behind the last cut are dropped."""
+        parser = makeParser(record_grammar)()
+        source = "abc=123\n" * 50
+        context = ParseContext()
+        parser.parse(source, context)
+        lastCut = len(source) - len("123\n")
+        self.assertEquals(context.cutPosition, lastCut)
+        for pattern in selectMemo(parser.topPattern):
+            self.assertTrue(all(pos >= lastCut - len("abc=")
+                                for pos in context.memos.get(pattern, ())))
+
+    def test_lookahead(self):
+        """Cuts have no effect inside lookaheads."""
+        parser = makeParser(lookahead_grammar)()
+        self.assertEquals(parser.parse("ac").value, "ac")
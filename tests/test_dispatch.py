@@ -0,0 +1,70 @@
+from pijnu.tests import ParserTestCase
+from pijnu import makeParser
+from pijnu.library import (Word, Char, Klass, String, Sequence, Choice,
+                           Option, NextNot, IncompleteParse, Parser)
+from pijnu.library.analysis import firstSet
+from pijnu.tests.test_machine import wiki_inline_grammar
+
+
+dispatch_grammar = r"""
+test_dispatch_statements
+<definition>
+    SEP         : ' '                           : drop
+    name        : [a..z]+
+    number      : [0..9]+
+    keyword     : "if" / "else"
+    value       : number / name
+    call        : name '(' value ')'
+    statement   : keyword / call / value / '?'
+    statements  : statement (SEP statement)*    : extract
+"""
+
+
+class DispatchTests(ParserTestCase):
+    """Tests for choices dispatching on FIRST char sets"""
+
+    def test_first_sets(self):
+        """First char sets are computed through sequences & options."""
+        (a, b) = (Word("ab"), Char("c"))
+        digit = Klass("0..9")
+        self.assertEquals(firstSet(a), frozenset("a"))
+        self.assertEquals(firstSet(Choice([a, digit])),
+                          frozenset("a0123456789"))
+        self.assertEquals(firstSet(Sequence([Option(a), b])),
+                          frozenset("ac"))
+        self.assertEquals(firstSet(Sequence([NextNot(a), b])),
+                          frozenset("c"))
+        self.assertTrue(firstSet(Option(a)) is None)
+        self.assertTrue(firstSet(String(digit, numMin=False)) is None)
+
+    def test_same_trees(self):
+        """Dispatching choices keep PEG ordered choice results."""
+        parser = makeParser(dispatch_grammar)()
+        self.assertTrue(parser.statement.dispatch is not None)
+        Parser.FIRST_DISPATCH = False
+        try:
+            plain = makeParser(dispatch_grammar.replace(
+                    "test_dispatch_statements", "test_dispatch_plain"))()
+        finally:
+            Parser.FIRST_DISPATCH = True
+        self.assertTrue(plain.statement.dispatch is None)
+        for source in ["if f(1) else x 12 ?", "g(else) 3 ?"]:
+            self.assertEquals(parser.parse(source).treeView(),
+                              plain.parse(source).treeView())
+        wiki = makeParser(wiki_inline_grammar.replace(
+                "test_machine_wiki_inline", "test_dispatch_wiki"))()
+        self.assertEquals(wiki.parse("abc //def **gh** i// j~*").leaves(),
+                          'abc <span class="distinctText">def '
+                          '<span class="importantText">gh</span> i</span> j~*')
+
+    def test_expected_alternatives(self):
+        """Skipped alternatives are still reported as expected."""
+        parser = makeParser(dispatch_grammar)()
+        try:
+            parser.parse("if !")
+        except IncompleteParse, e:
+            self.assertEquals(e.failure.pos, 3)
+            for expected in ("keyword", "call", "value", "'?'"):
+                self.assertTrue(expected in e.failure.expected)
+        else:
+            self.fail("IncompleteParse not raised")
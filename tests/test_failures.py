@@ -0,0 +1,89 @@
+from pijnu.tests import ParserTestCase
+from pijnu import makeParser
+from pijnu.library import (MatchFailure, EndOfText, IncompleteParse, Node,
+                           FAIL)
+
+
+failure_grammar = r"""
+test_failures_items
+<definition>
+    SEP         : ' '                   : drop
+    word        : [a..z]+
+    number      : [0..9]+
+    item        : word / number
+    items       : item (SEP item)*      : extract
+"""
+
+expected_grammar = r"""
+test_failures_expected
+<definition>
+    SEP         : ' '                   : drop
+    name        : [a..z]+
+    number      : [0..9]+
+    sum         : number ('+' number)*
+    assignment  : name SEP? '=' SEP? sum
+"""
+
+
+class FailureTests(ParserTestCase):
+    """Tests for failures returned by checks & raised by match methods"""
+
+    def test_returned_failure(self):
+        """Internal checks return FAIL instead of raising errors."""
+        parser = makeParser(failure_grammar)()
+        parser.items._resetMemo(source="!")
+        self.assertTrue(parser.items._memoCheck("!", 0) is FAIL)
+        parser.items._resetMemo(source="ab 12")
+        result = parser.items._memoCheck("ab 12", 0)
+        self.assertTrue(isinstance(result, Node))
+
+    def test_raised_failure(self):
+        """Public match methods still raise errors."""
+        parser = makeParser(failure_grammar)()
+        self.assertRaises(MatchFailure, parser.parse, "!")
+        self.assertRaises(MatchFailure, parser.match, "!")
+        self.assertRaises(IncompleteParse, parser.parse, "ab 12 !")
+        self.assertEquals(parser.item.findFirst("! ab").value, "ab")
+        self.assertEquals([node.value for node in parser.item.findAll("a!1")],
+                          ["a", "1"])
+
+    def test_farthest_failure(self):
+        """Errors point at the farthest failure & what was expected there."""
+        parser = makeParser(expected_grammar)()
+        try:
+            parser.parse("x = ")
+        except MatchFailure, e:
+            self.assertEquals(e.pos, 4)
+            self.assertTrue("number" in str(e))
+            self.assertTrue("end of source text" in str(e))
+        else:
+            self.fail("MatchFailure not raised")
+        try:
+            parser.parse("x y")
+        except MatchFailure, e:
+            self.assertEquals(e.pos, 2)
+            self.assertTrue("'='" in str(e))
+            self.assertTrue("SEP" not in e.expected)
+        else:
+            self.fail("MatchFailure not raised")
+
+    def test_error_types(self):
+        """Error types are the ones raised before failure records:
+        EndOfText only for a leaf pattern at end of text."""
+        parser = makeParser(expected_grammar)()
+        for source in ("x = ", "x", "", "x y", "x =+"):
+            self.assertRaises(MatchFailure, parser.parse, source)
+        self.assertRaises(MatchFailure, parser.number.parse, "a")
+        self.assertRaises(EndOfText, parser.number.parse, "")
+        self.assertRaises(EndOfText, parser.SEP.match, "")
+
+    def test_incomplete_parse(self):
+        """Incomplete parse errors tell about the farthest failure."""
+        parser = makeParser(expected_grammar)()
+        try:
+            parser.parse("x = 1+a")
+        except IncompleteParse, e:
+            self.assertEquals((e.pos, e.failure.pos), (5, 6))
+            self.assertTrue("number" in str(e))
+        else:
+            self.fail("IncompleteParse not raised")
@@ -0,0 +1,150 @@
+from random import Random
+from copy import copy
+from pijnu.tests import ParserTestCase
+from pijnu import makeParser
+from pijnu.library import ParseContext, PijnuError, Node
+from pijnu.library.incremental import Shifted
+from pijnu.tests.test_machine import wiki_inline_grammar, nesting_grammar
+from pijnu.tests.test_regex import identifier_grammar
+from pijnu.tests.test_until import until_grammar
+from pijnu.tests.test_cut import record_grammar
+
+
+def spans(tree):
+    """(tag, start, end, value) of nodes in tree."""
+    (nodes, result) = ([tree], [])
+    while nodes:
+        node = nodes.pop()
+        if node.kind is Node.BRANCH:
+            result.append((node.tag, node.start, node.end))
+            nodes.extend(node.value)
+        else:
+            result.append((node.tag, node.start, node.end, node.value))
+    return result
+
+
+def outcome(method, *args):
+    """Return node spans or error message of method for args."""
+    try:
+        return spans(method(*args))
+    except PijnuError, error:
+        return str(error)
+
+
+class IncrementalTests(ParserTestCase):
+    """Tests for reparse after an edit"""
+
+    def test_random_edits(self):
+        """Reparses yield the trees & errors of full parses."""
+        random = Random(7)
+        for (grammar, chars, source) in [
+                (wiki_inline_grammar, "ab/*~ ", "abc //def **gh** i// j~*"),
+                (nesting_grammar, "()ab", "(a(b)c((a)(b(c))))"),
+                (identifier_grammar, "ab1 ^.-", "if x_1 -2.5 else ^ab2 3"),
+                (until_grammar, "*/ab .1,", "**ab c**//abc//12,abc **d**9."),
+                (record_grammar, "ab=1\n", "a=1\nbc=22\nde=3\n")]:
+            parser = makeParser(grammar)()
+            context = ParseContext()
+            tree = parser.parse(source)
+            for turn in range(100):
+                source = tree.source
+                start = random.randint(0, len(source))
+                end = min(len(source), start + random.choice([0, 1, 3]))
+                if random.random() < 0.3:
+                    # some text of source, elsewhere
+                    pos = random.randint(0, len(source))
+                    text = source[pos:pos + random.randint(1, 6)]
+                else:
+                    text = "".join(random.choice(chars)
+                                   for i in range(random.randint(0, 2)))
+                new = source[:start] + text + source[end:]
+                expected = outcome(parser.parse, new)
+                self.assertEquals(outcome(parser.reparse, tree,
+                                          (start, end, text), context),
+                                  expected)
+                if not isinstance(expected, str):
+                    tree = context.tree
+                    self.assertEquals(tree.source, new)
+
+    def test_reuse(self):
+        """Nodes out of the edit are moved to the new tree."""
+        parser = makeParser(until_grammar)()
+        context = ParseContext(incremental=True)
+        source = "**ab c**//abc//12,ab cd end" * 20
+        tree = parser.parse(source, context)
+        (first, last) = (tree[0], tree[-1])
+        (start, value) = (last.start, last.treeView())
+        new = parser.reparse(tree, (27 * 10 + 3, 27 * 10 + 3, "xy"), context)
+        self.assertEquals(new.source,
+                          source[:273] + "xy" + source[273:])
+        self.assertTrue(new[0] is first and new[-1] is last)
+        self.assertEquals(last.start, start + 2)
+        self.assertEquals(last.treeView(), value)
+        self.assertTrue(last.source is new.source)
+        self.assertEquals(spans(new), spans(parser.parse(new.source)))
+
+    def test_lazy_moves(self):
+        """Child nodes of a reused node are moved when read."""
+        parser = makeParser(until_grammar)()
+        context = ParseContext(incremental=True)
+        source = "**ab c**//abc//12,ab cd end" * 20
+        tree = parser.parse(source, context)
+        last = tree[-1]
+        child = last.form[0]
+        (start, childStart) = (last.start, child.start)
+        new = parser.reparse(tree, (5, 5, "xy"), context)
+        self.assertTrue(isinstance(last, Shifted))
+        self.assertEquals((last.start, last.source), (start + 2, new.source))
+        # (not read yet)
+        self.assertTrue(child.source is source)
+        self.assertEquals(last.form[0].start, childStart + 2)
+        self.assertFalse(isinstance(last, Shifted))
+        self.assertTrue(child.source is new.source)
+        # several edits before reading
+        for index in (10, 0, 3):
+            pos = new.source.find(" c**", 27 * index) + 1
+            new = parser.reparse(new, (pos, pos + 1, "zz"), context)
+        self.assertEquals(spans(new), spans(parser.parse(new.source)))
+        self.assertEquals(copy(new[-1]).treeView(), new[-1].treeView())
+
+    def test_failure(self):
+        """A failed reparse leaves the old tree as it was."""
+        parser = makeParser(wiki_inline_grammar)()
+        context = ParseContext(incremental=True)
+        source = "abc //def **gh** i// j~*" * 5
+        tree = parser.parse(source, context)
+        expected = spans(tree)
+        try:
+            parser.parse(source[:30] + "**" + source[30:])
+        except PijnuError, error:
+            message = str(error)
+        else:
+            self.fail()
+        self.assertEquals(outcome(parser.reparse, tree, (30, 30, "**"),
+                                  context), message)
+        self.assertEquals(spans(tree), expected)
+        self.assertTrue(context.tree is tree)
+        # the old tree is still the one to reparse
+        new = parser.reparse(tree, (30, 30, "**x**"), context)
+        self.assertEquals(spans(new),
+                          spans(parser.parse(new.source)))
+
+    def test_full_reparse(self):
+        """Other trees are parsed in full; so are edits out of source."""
+        parser = makeParser(identifier_grammar)()
+        context = ParseContext()
+        tree = parser.parse("if x else y")
+        new = parser.reparse(tree, (3, 4, "abc"), context)
+        self.assertEquals(new.source, "if abc else y")
+        self.assertTrue(context.tree is new)
+        # (which seeds the context: no priming)
+        last = new[-1]
+        newer = parser.reparse(new, (0, 0, "z"), context)
+        self.assertTrue(newer[-1] is last)
+        other = parser.reparse(tree, (0, 2, "x"), context)
+        self.assertEquals(spans(other), spans(parser.parse("x x else y")))
+        # the thread's incremental context, by default
+        self.assertEquals(spans(parser.reparse(tree, (0, 0, "z"))),
+                          spans(parser.parse("zif x else y")))
+        self.assertRaises(ValueError, parser.reparse, tree, (5, 3, ""))
+        self.assertRaises(ValueError, parser.reparse, tree, (0, 12, ""))
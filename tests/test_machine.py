@@ -0,0 +1,199 @@
+from sys import getrecursionlimit
+from pijnu.tests import ParserTestCase
+from pijnu import makeParser
+from pijnu.library import Machine, PijnuError, IncompleteParse, join
+
+
+wiki_inline_grammar = r"""
+test_machine_wiki_inline
+<toolset>
+def styledSpan(node):
+    node.value = '<span class="%s">%s</span>' % (node.tag, node.value)
+<definition>
+    ESCAPE         : '~'
+    DISTINCT       : "//"                                : drop
+    IMPORTANT      : "**"                                : drop
+    styleCode      : (DISTINCT / IMPORTANT)
+    escChar        : ESCAPE ('*' / '!' / '/' / ESCAPE)   : join
+    validChar      : [\x20..\xff  !!/!*~]
+    rawText        : (escChar / (!styleCode validChar))+ : join
+    distinctText   : DISTINCT inlineText DISTINCT        : liftValue
+    importantText  : IMPORTANT inlineText IMPORTANT      : liftValue
+    styledText     : distinctText / importantText        : styledSpan
+    inlineText     : (styledText / rawText)+             : @ join
+"""
+
+formula_grammar = r"""
+test_machine_formula
+<definition>
+    digit       : [0..9.]
+    number      : digit+                                        : join
+    ADD         : '+'                                           : drop
+    MULT        : '*'                                           : drop
+    LPAREN      : '('                                           : drop
+    RPAREN      : ')'                                           : drop
+    mult        : (grup/number) MULT (grup/mult/number)         : @
+    add         : (grup/mult/number) ADD (grup/add/mult/number) : @
+    grup        : LPAREN (add / mult) RPAREN                    : @ liftNode
+    formula     : add / mult / number
+"""
+
+repetition_grammar = r"""
+test_machine_repetition
+<definition>
+    SEP         : ' '                   : drop
+    letter      : [a..z]
+    word        : letter{2..4}
+    code        : ("ab" / "cd"){1..2}
+    tail        : SEP &"X" "X"? "Y"*
+    item        : code / word
+    items       : item (SEP item)*      : extract
+    line        : items tail
+"""
+
+
+nesting_grammar = r"""
+test_machine_nesting
+<definition>
+    LPAREN      : '('                   : drop
+    RPAREN      : ')'                   : drop
+    letter      : [a..z]
+    list        : LPAREN item*>RPAREN
+    item        : list / letter         : @
+"""
+
+
+invalidation_grammar = r"""
+test_machine_invalidation
+<toolset>
+def noAB(node):
+    if node.value == "ab":
+        raise Invalidation("no ab")
+def noB(node):
+    if node.value == "b":
+        raise Invalidation("no b")
+<definition>
+    letter      : [a..z]
+    two         : letter letter         : join
+    pick        : two / letter          : noAB
+    all         : pick+
+    maybe       : letter?               : noB
+    pair        : maybe letter
+"""
+
+
+class MachineTests(ParserTestCase):
+    """Tests for the compiled pattern machine"""
+
+    def assertSameParse(self, parser, sources):
+        machine = parser.compile()
+        for source in sources:
+            expected = parser.parse(source).treeView()
+            self.assertEquals(machine.parse(source).treeView(), expected)
+
+    def test_recursive_grammar(self):
+        """The machine yields the same trees on a recursive grammar."""
+        parser = makeParser(wiki_inline_grammar)()
+        self.assertSameParse(parser, [
+            "abc",
+            "abc //def **gh** i// j~*",
+            "//a//**b**//c **d** e//",
+            "~~~/~!",
+        ])
+
+    def test_left_factored_recursion(self):
+        """Backtracking through recursive choices gives the same trees."""
+        parser = makeParser(formula_grammar)()
+        self.assertSameParse(parser, [
+            "1",
+            "1+2",
+            "9*8+01*2.3+45*67*(89+01.2)",
+            "(1+2)*3",
+        ])
+
+    def test_repetitions_and_lookahead(self):
+        """Numbered repetitions, options & lookaheads are supported."""
+        parser = makeParser(repetition_grammar)()
+        self.assertSameParse(parser, [
+            "abcd ef XYYY",
+            "ab cdab ghij X",
+            "abab cd XY",
+        ])
+
+    def test_failures(self):
+        """Failures raise the same errors as the interpreter does."""
+        parser = makeParser(formula_grammar)()
+        machine = parser.compile()
+        self.assertRaises(PijnuError, machine.parse, "+1")
+        self.assertRaises(IncompleteParse, machine.parse, "1+2)")
+        self.assertEquals(machine.match("1+2)").treeView(),
+                          parser.match("1+2)").treeView())
+
+    def test_invalidation(self):
+        """Actions of choices & options invalidating a result: next
+        alternative, or nil node, as in the interpreter."""
+        parser = makeParser(invalidation_grammar)()
+        for (name, source) in [("all", "ab"), ("all", "abc"),
+                               ("pair", "bc"), ("pair", "ac"),
+                               ("pair", "b")]:
+            pattern = getattr(parser, name)
+            (machine, outcomes) = (Machine(pattern), [])
+            for matcher in (pattern, machine):
+                try:
+                    outcomes.append(matcher.parse(source).treeView())
+                except PijnuError, error:
+                    outcomes.append((type(error), str(error)))
+            self.assertEquals(outcomes[1], outcomes[0])
+        self.assertEquals(Machine(parser.all).parse("ab").treeView(),
+                          parser.all.parse("ab").treeView())
+        self.assertEquals([node.value for node in
+                           Machine(parser.all).parse("ab")], ["a", "b"])
+        self.assertRaises(IncompleteParse, Machine(parser.pair).parse, "bc")
+
+    def test_error_messages(self):
+        """Error messages are the same as the interpreter's."""
+        for (grammar, sources) in [
+                (formula_grammar, ["+1", "1+2)", "(1+2", "1*(2+)", ""]),
+                (wiki_inline_grammar, ["a **b", "//a**b//**", "~"]),
+                (repetition_grammar, ["ab x", "abcd X", "a", "ab XZ"]),
+                (nesting_grammar, ["(ab", "(a(b)1", "x"])]:
+            parser = makeParser(grammar)()
+            machine = parser.compile()
+            for source in sources:
+                for method in ("match", "parse"):
+                    messages = []
+                    for matcher in (parser, machine):
+                        try:
+                            getattr(matcher, method)(source)
+                        except PijnuError, error:
+                            messages.append(str(error))
+                    if messages:
+                        self.assertEquals(messages[0], messages[1])
+
+    def test_deep_nesting(self):
+        """Nesting depth is not limited by Python's recursion limit."""
+        depth = 2 * getrecursionlimit()
+        parser = makeParser(formula_grammar)()
+        machine = parser.compile()
+        source = "(1+" * depth + "2" + ")" * depth + "+3"
+        tree = machine.parse(source)
+        self.assertEquals(tree.end, len(source))
+        self.assertEquals(len(tree.treeView().splitlines()), 2 * depth + 3)
+        self.assertEquals(repr(tree).count("number:"), depth + 2)
+        join(tree)
+        self.assertEquals(tree.value, "1" * depth + "23")
+        self.assertRaises(IncompleteParse, machine.parse, source + ")")
+        self.assertRaises(PijnuError, machine.parse, source[:-3] + "+")
+        self.assertRaises(RuntimeError, parser.parse, source)
+        # untils of wrapping patterns as well
+        machine = makeParser(nesting_grammar)().compile()
+        source = "(a" * depth + ")" * depth
+        self.assertEquals(len(machine.parse(source).leaves()), depth)
+        self.assertRaises(PijnuError, machine.parse, source[:-1])
+
+    def test_pattern_machine(self):
+        """A machine can also be built for any single pattern."""
+        parser = makeParser(repetition_grammar)()
+        machine = Machine(parser.word)
+        self.assertEquals([node.value for node in machine.findAll("ab c defgh")],
+                          [node.value for node in parser.word.findAll("ab c defgh")])
@@ -0,0 +1,121 @@
+from sys import getsizeof
+
+from pijnu.tests import ParserTestCase
+from pijnu import makeParser
+from pijnu.library import Pattern, Parser, PijnuError, Word, Node, FAIL
+from pijnu.library.memo import MemoTable
+from pijnu.library.analysis import selectMemo
+from pijnu.tests.test_machine import wiki_inline_grammar, formula_grammar
+from pijnu.tests.test_regex import identifier_grammar
+
+
+class DenseMemoTests(ParserTestCase):
+    """Tests for compact memo tables"""
+
+    def tearDown(self):
+        Pattern.DENSE_MEMO = False
+        Parser.LOWER_REGEX = True
+
+    def parse(self, parser, source, dense):
+        Pattern.DENSE_MEMO = dense
+        try:
+            return parser.parse(source)
+        finally:
+            Pattern.DENSE_MEMO = False
+
+    def test_same_trees(self):
+        """Dense memo tables yield the same trees as memo dicts."""
+        for (grammar, source) in [
+                (wiki_inline_grammar, "abc //def **gh** i// j~* " * 3),
+                (formula_grammar, "9*8+01*2.3+45*67*(89+01.2)")]:
+            parser = makeParser(grammar)()
+            self.assertEquals(self.parse(parser, source, True).treeView(),
+                              self.parse(parser, source, False).treeView())
+
+    def test_failures(self):
+        """Memoized failures are rebuilt as errors."""
+        parser = makeParser(formula_grammar)()
+        Pattern.DENSE_MEMO = True
+        self.assertRaises(PijnuError, parser.parse, "1+*2")
+        self.assertEquals(parser.match("1+2)").end, 3)
+
+    def test_memory_report(self):
+        """The memo store reports entries & size, smaller than dicts."""
+        # without regexes, text is matched char by char: many entries
+        Parser.LOWER_REGEX = False
+        grammar = wiki_inline_grammar.replace("test_machine_wiki_inline",
+                                              "test_memo_wiki_inline")
+        parser = makeParser(grammar)()
+        source = "abc ~* def ~! " * 100
+        self.parse(parser, source, False)
+        patterns = selectMemo(parser.topPattern)
+        entries = sum(len(pattern.memo) for pattern in patterns)
+        dictSize = sum(getsizeof(pattern.memo) for pattern in patterns)
+        self.parse(parser, source, True)
+        store = parser.topPattern.memoStore
+        self.assertEquals(store.entries(), entries)
+        self.assertTrue(0 < store.size() < dictSize)
+        self.assertTrue("entries:" in str(store))
+        for table in store.tables:
+            self.assertTrue(table.pattern in patterns)
+
+    def test_smaller_by_default(self):
+        """With default settings, the store is smaller than memo dicts."""
+        parser = makeParser(identifier_grammar)()
+        source = " ".join(["if x_1 -2.5 else ^ab2 3"] * 1000)
+        self.parse(parser, source, False)
+        patterns = selectMemo(parser.topPattern)
+        entries = sum(len(pattern.memo) for pattern in patterns)
+        # (int keys of dicts not counted)
+        dictSize = sum(getsizeof(pattern.memo) for pattern in patterns)
+        self.parse(parser, source, True)
+        store = parser.topPattern.memoStore
+        self.assertEquals(store.entries(), entries)
+        self.assertTrue(store.size() * 2 < dictSize)
+
+    def test_failure_bits(self):
+        """Dense failures are packed as bits; sparse ones are not."""
+        pattern = Word("ab")
+        source = "x" * 1000
+        node = Node(pattern, "ab", 500, 502, source)
+        table = MemoTable(pattern, source)
+        for pos in (700, 3, 500):
+            table[pos] = node if pos == 500 else FAIL
+        self.assertTrue(table.bits is None)
+        self.assertEquals((len(table), table[3], table[500]), (3, FAIL, node))
+        self.assertFalse(10 in table)
+        for pos in range(100, 120):
+            table[pos] = FAIL
+        self.assertTrue(table.bits is not None)
+        self.assertEquals(list(table.positions), [500])
+        self.assertEquals(len(table), 23)
+        self.assertTrue(all(pos in table and table[pos] is FAIL
+                            for pos in [3, 700] + range(100, 120)))
+        self.assertFalse(99 in table or 120 in table)
+        # (cut)
+        table.drop(110)
+        self.assertEquals(len(table), 12)
+        self.assertFalse(3 in table or 109 in table)
+        self.assertTrue(110 in table and table[500] is node)
+        self.assertRaises(KeyError, table.__getitem__, 5)
+
+    def test_drops(self):
+        """Drops keep the count of failures right, bits or not."""
+        pattern = Word("ab")
+        source = "x" * 1000
+        table = MemoTable(pattern, source)
+        for pos in range(0, 1000, 3):
+            table[pos] = FAIL
+        self.assertTrue(table.bits is not None)
+        node = Node(pattern, "ab", 500, 502, source)
+        table[500] = node
+        for cut in range(0, 1001, 37) + [1000]:
+            table.drop(cut)
+            failures = len(range(cut + (-cut) % 3, 1000, 3))
+            self.assertEquals(table.failures, failures)
+            self.assertEquals(len(table), failures + (cut <= 500))
+        self.assertEquals(table.cleared, 1000)
+        # (a failure behind the last drop)
+        table[10] = FAIL
+        table.drop(20)
+        self.assertEquals((len(table), 10 in table), (0, False))
@@ -0,0 +1,52 @@
+import pickle
+from copy import deepcopy
+from pijnu.tests import ParserTestCase
+from pijnu.library import Word, Sequence, Node, Nodes, join
+
+
+class NodeTests(ParserTestCase):
+    """Tests for slotted nodes"""
+
+    def makeNode(self):
+        (a, b) = (Word("ab", name="a"), Word("cd", name="b"))
+        pattern = Sequence([a, b], name="seq")
+        return pattern.match("abcdef")
+
+    def test_lazy_snippet(self):
+        """Snippet is computed from source & range."""
+        node = self.makeNode()
+        self.assertEquals(node.snippet, "abcd")
+        self.assertEquals(node[1].snippet, "cd")
+        self.assertFalse("snippet" in node.__dict__)
+
+    def test_form(self):
+        """Form is the value the node was created with."""
+        node = self.makeNode()
+        self.assertEquals(node.form, node.value)
+        form = node.form
+        node.doActions([join])
+        self.assertEquals(node.value, "abcd")
+        self.assertTrue(node.form is form)
+        self.assertTrue(isinstance(node.form, Nodes))
+        # whatever changes the value
+        leaf = form[0]
+        leaf.value = 11
+        self.assertEquals(leaf.form, "ab")
+
+    def test_custom_attributes(self):
+        """Actions can still set any attribute on a node."""
+        node = self.makeNode()
+        node.extra = 1
+        self.assertEquals(node.extra, 1)
+
+    def test_pickle_and_copy(self):
+        """Nodes can be pickled & copied with any protocol."""
+        node = self.makeNode()
+        node.extra = 1
+        for protocol in (0, 2):
+            other = pickle.loads(pickle.dumps(node, protocol))
+            self.assertEquals(other.treeView(), node.treeView())
+            self.assertEquals((other.snippet, other.extra), ("abcd", 1))
+        other = deepcopy(node)
+        self.assertEquals((other.tag, other.start, other.end),
+                          ("seq", 0, 4))
@@ -0,0 +1,75 @@
+import sys
+import traceback
+from random import Random
+from Queue import Queue
+from pijnu.tests import ParserTestCase
+from pijnu import makeParser
+from pijnu.library import PushParser, IncompleteParse, PijnuError
+from pijnu.tests.test_tail import log_grammar
+from pijnu.tests.test_regex import identifier_grammar
+
+
+def pushed(parser, chunks):
+    """(tree view, offset) of nodes handled for chunks, or None."""
+    push = PushParser(parser)
+    try:
+        for chunk in chunks:
+            push.feed(chunk)
+        push.close()
+    except PijnuError:
+        return None
+    return [(node.treeView(), node.offset) for node in push.queue]
+
+
+class PushTests(ParserTestCase):
+    """Tests for parsing a source pushed in chunks"""
+
+    def test_any_split(self):
+        """Nodes do not depend on how the source is split."""
+        random = Random(5)
+        for (grammar, source, offsets) in [
+                (log_grammar, "ab 1\ncd 22 e\nf\n", [0, 5, 13]),
+                (identifier_grammar, "if x_1 -2.5 else ^ab2 3", [0])]:
+            parser = makeParser(grammar)()
+            expected = pushed(parser, [source])
+            # records of a repetition, else the top node
+            self.assertEquals([offset for (view, offset) in expected],
+                              offsets)
+            for turn in range(30):
+                cuts = sorted(random.randint(0, len(source))
+                              for i in range(random.randint(0, 8)))
+                chunks = [source[start:end] for (start, end)
+                          in zip([0] + cuts, cuts + [len(source)])]
+                self.assertEquals(pushed(parser, chunks), expected)
+
+    def test_handler(self):
+        """Nodes are handled as soon as complete, until an error."""
+        parser = makeParser(log_grammar)()
+        queue = Queue()
+        push = PushParser(parser, queue.put)
+        push.feed("ab 1\ncd")
+        self.assertEquals(queue.get_nowait().snippet, "ab 1\n")
+        self.assertTrue(queue.empty())
+        self.assertRaises(IncompleteParse, push.feed, " 2\n-\n")
+        self.assertEquals(queue.get_nowait().snippet, "cd 2\n")
+        self.assertRaises(ValueError, push.feed, "x\n")
+        # the error keeps its traceback, whatever handlers do
+        def handler(node):
+            try:
+                parser.parse("-")
+            except PijnuError:
+                pass
+        push = PushParser(parser, handler)
+        try:
+            push.feed("ab 1\n-\n")
+        except IncompleteParse:
+            frames = traceback.extract_tb(sys.exc_info()[2])
+            self.assertTrue(frames[-1][0].endswith("tail.py"))
+        else:
+            self.fail()
+        # the top node, at close
+        push = PushParser(makeParser(identifier_grammar)())
+        push.feed("if x")
+        self.assertFalse(push.queue)
+        push.close()
+        self.assertEquals(push.queue[0].snippet, "if x")
@@ -0,0 +1,154 @@
+import pickle
+from copy import deepcopy
+from pijnu.tests import ParserTestCase
+from pijnu import makeParser
+from pijnu.library import (Node, Word, Char, Klass, String, Sequence,
+                           Choice, Option, ZeroOrMore, OneOrMore, NextNot,
+                           Recursive, PijnuError, Parser, ParseContext, join, drop)
+from pijnu.library.analysis import regexOf, selectRegex
+from pijnu.tests.test_machine import wiki_inline_grammar, formula_grammar
+
+
+identifier_grammar = r"""
+test_regex_identifiers
+<toolset>
+def toUpper(node):
+    node.value = node.value.upper()
+<definition>
+    SEP         : ' '                                   : drop
+    letter      : [a..z  A..Z  _]
+    name        : letter (letter / [0..9])*             : join
+    number      : '-'? [0..9]+ ('.' [0..9]+)?           : join toFloat
+    upper       : '^' name                              : join toUpper
+    word        : "if" / "else" / number / name / upper
+    words       : word (SEP word)*                      : extract
+"""
+
+
+empty_string_grammar = r"""
+test_regex_empty_string
+<definition>
+    lower       : [a..z]*
+    digits      : [0..9]+
+    pair        : lower ':' digits?
+"""
+
+
+def plainParser(grammar, title):
+    """Return a parser for grammar without regexes."""
+    Parser.LOWER_REGEX = False
+    try:
+        return makeParser(grammar.replace(title, title + "_plain"))()
+    finally:
+        Parser.LOWER_REGEX = True
+
+
+class RegexTests(ParserTestCase):
+    """Tests for patterns lowered to regexes"""
+
+    def test_lowered_patterns(self):
+        """Only strings & joined regular sub-graphs are lowered."""
+        (a, digits) = (Word("ab"), String(Klass("0..9")))
+        self.assertTrue(regexOf(digits) is not None)
+        self.assertTrue(regexOf(Sequence([a, digits])) is None)
+        self.assertTrue(regexOf(Sequence([a, digits])(join)) is not None)
+        self.assertTrue(regexOf(Sequence([a, Word("cd")(drop)])(join))
+                        is None)
+        self.assertTrue(regexOf(Sequence([a, Recursive()])(join)) is None)
+        parser = makeParser(identifier_grammar)()
+        for name in ("name", "number", "upper"):
+            self.assertTrue(getattr(parser, name).regex is not None)
+        for name in ("word", "words", "letter"):
+            self.assertTrue(getattr(parser, name).regex is None)
+
+    def test_peg_semantics(self):
+        """Choices, options & repetitions never backtrack once matched."""
+        (a, ab, b, c) = (Word("a"), Word("ab"), Char("b"), Char("c"))
+        letters = String(Klass("a..z"), numMin=False)
+        for (patterns, source) in [
+                (lambda: [Choice([a, ab]), c], "abc"),
+                (lambda: [Choice([ab, a]), c], "abc"),
+                (lambda: [letters, c], "abc"),
+                (lambda: [Option(ab), b, c], "abc"),
+                (lambda: [ZeroOrMore(a), Option(a), c], "aac"),
+                (lambda: [OneOrMore(Choice([a, ab])), b], "abab"),
+                (lambda: [NextNot(ab), Word("abc")], "abc"),
+                (lambda: [NextNot(a), letters], "bcd")]:
+            (pattern, lowered) = (Sequence(patterns())(join),
+                                  Sequence(patterns())(join))
+            selectRegex(lowered)
+            self.assertTrue(lowered.regex is not None)
+            try:
+                expected = pattern.match(source).value
+            except PijnuError, error:
+                self.assertRaises(type(error), lowered.match, source)
+            else:
+                self.assertEquals(lowered.match(source).value, expected)
+
+    def test_same_trees(self):
+        """Trees are the same with & without regexes, in both engines."""
+        for (grammar, title, sources) in [
+                (identifier_grammar, "test_regex_identifiers",
+                 ["if x_1 -2.5 else ^ab2 3", u"caf else 12"]),
+                (wiki_inline_grammar, "test_machine_wiki_inline",
+                 ["abc //def **gh** i// j~*", u"caf\xe9 ~~ **x**"]),
+                (formula_grammar, "test_machine_formula",
+                 ["9*8+01*2.3+45*67*(89+01.2)"])]:
+            parser = makeParser(grammar)()
+            plain = plainParser(grammar, title)
+            machine = parser.compile()
+            for source in sources:
+                tree = plain.parse(source).treeView()
+                self.assertEquals(parser.parse(source).treeView(), tree)
+                self.assertEquals(machine.parse(source).treeView(), tree)
+
+    def test_same_errors(self):
+        """Failures record the same expected patterns."""
+        parser = makeParser(identifier_grammar)()
+        plain = plainParser(identifier_grammar, "test_regex_identifiers")
+        for source in ["if 1.", "x -", "^1"]:
+            self.assertRaises(PijnuError, parser.parse, source)
+            try:
+                plain.parse(source)
+            except PijnuError, error:
+                message = str(error)
+            try:
+                parser.parse(source)
+            except PijnuError, error:
+                self.assertEquals(str(error), message)
+
+    def test_pickle_and_copy(self):
+        """Nodes of lowered patterns can be pickled & copied."""
+        letter = Klass("a..z")
+        name = Sequence([letter, ZeroOrMore(Choice([letter, Klass("0..9")]))],
+                        name="name")(join)
+        selectRegex(name)
+        node = name.match("ab1 c")
+        self.assertEquals(node.value, "ab1")
+        other = pickle.loads(pickle.dumps(node, 2))
+        self.assertEquals(other.pattern.regex.match("x2").end(), 2)
+        self.assertEquals(deepcopy(node).treeView(), node.treeView())
+
+    def test_empty_string(self):
+        """An empty string is a leaf with value '' out of end of text."""
+        letters = String(Klass("a..z"), numMin=False, name="s")
+        top = Sequence([letters, Char(';', name="semi")], name="top")
+        selectRegex(top)
+        self.assertTrue(letters.regex is not None)
+        self.assertEquals([(node.tag, node.value) for node in top.parse(";")],
+                          [("s", ""), ("semi", ";")])
+        self.assertEquals(letters.parse("").value, Node.NIL)
+        parser = makeParser(empty_string_grammar)()
+        plain = plainParser(empty_string_grammar, "test_regex_empty_string")
+        machine = parser.compile()
+        functions = makeParser(empty_string_grammar.replace(
+                "test_regex_empty_string", "test_regex_empty_functions"),
+                ruleFunctions=True)()
+        for source in [":11", "ab:", ":"]:
+            tree = plain.parse(source).treeView()
+            self.assertEquals(parser.parse(source).treeView(), tree)
+            self.assertEquals(machine.parse(source).treeView(), tree)
+            self.assertEquals(functions.parse(source).treeView(), tree)
+            # (incremental contexts use no regex)
+            self.assertEquals(parser.reparse(parser.parse(source), (0, 0, ""),
+                                             ParseContext()).treeView(), tree)
@@ -0,0 +1,90 @@
+from pijnu.tests import ParserTestCase
+from pijnu import makeParser
+from pijnu.library import PijnuError, IncompleteParse
+from pijnu.tests.test_machine import (wiki_inline_grammar, formula_grammar,
+                                      repetition_grammar,
+                                      invalidation_grammar)
+from pijnu.tests.test_word_choice import keyword_grammar
+
+
+def makeRuleParsers(grammar):
+    """Return a pattern parser and a rule function parser for grammar."""
+    title = grammar.split()[0]
+    grammar = grammar.replace(title, "%s_rules" % title, 1)
+    return (makeParser(grammar)(),
+            makeParser(grammar.replace(title, "%s_functions" % title, 1),
+                       ruleFunctions=True)())
+
+
+class RuleFunctionsTests(ParserTestCase):
+    """Tests for parsers generated with one function per rule"""
+
+    def assertSameParse(self, grammar, sources):
+        (parser, ruleParser) = makeRuleParsers(grammar)
+        self.assertTrue(ruleParser.rules is not None)
+        for source in sources:
+            self.assertEquals(ruleParser.parse(source).treeView(),
+                              parser.parse(source).treeView())
+
+    def test_recursive_grammar(self):
+        """Rule functions yield the same trees on a recursive grammar."""
+        self.assertSameParse(wiki_inline_grammar, [
+            "abc",
+            "abc //def **gh** i// j~*",
+            "//a//**b**//c **d** e//",
+            "~~~/~!",
+        ])
+
+    def test_left_factored_recursion(self):
+        """Backtracking through recursive choices gives the same trees."""
+        self.assertSameParse(formula_grammar, [
+            "1",
+            "9*8+01*2.3+45*67*(89+01.2)",
+            "(1+2)*3",
+        ])
+
+    def test_repetitions_and_lookahead(self):
+        """Numbered repetitions, options & lookaheads are supported."""
+        self.assertSameParse(repetition_grammar, [
+            "abcd ef XYYY",
+            "ab cdab ghij X",
+            "abab cd XY",
+        ])
+
+    def test_failures(self):
+        """Failures raise the same errors as the patterns do."""
+        (parser, ruleParser) = makeRuleParsers(formula_grammar)
+        self.assertRaises(PijnuError, ruleParser.parse, "+1")
+        self.assertRaises(IncompleteParse, ruleParser.parse, "1+2)")
+        self.assertEquals(ruleParser.match("1+2)").treeView(),
+                          parser.match("1+2)").treeView())
+
+    def test_invalidation(self):
+        """Choice actions invalidating an alternative's result let the
+        next one be tried, as in patterns."""
+        for (grammar, sources) in [
+                (keyword_grammar, ["else", "if else", "elif e", "x else"]),
+                (invalidation_grammar, ["ab", "abc", "bc", "ac", "b"])]:
+            (parser, ruleParser) = makeRuleParsers(grammar)
+            for source in sources:
+                outcomes = []
+                for matcher in (parser, ruleParser):
+                    try:
+                        outcomes.append(matcher.parse(source).treeView())
+                    except PijnuError, error:
+                        outcomes.append((type(error), str(error)))
+                self.assertEquals(outcomes[1], outcomes[0])
+        self.assertRaises(IncompleteParse,
+                          makeRuleParsers(keyword_grammar)[1].parse, "else")
+
+    def test_actions_argument(self):
+        """Actions passed to make_parser are used by rule functions."""
+        grammar = formula_grammar.replace("test_machine_formula",
+                                          "test_rule_functions_actions")
+        make_parser = makeParser(grammar, ruleFunctions=True)
+
+        def toNumber(node):
+            node.value = float(node.snippet)
+        parser = make_parser({"join": toNumber})
+        self.assertEquals([node.value for node in parser.parse("1.5+2")],
+                          [1.5, 2.0])
@@ -0,0 +1,130 @@
+from random import Random
+from StringIO import StringIO
+from pijnu.tests import ParserTestCase
+from pijnu import makeParser
+from pijnu.library import (TailParser, PijnuError, IncompleteParse,
+                           MatchFailure, Node)
+from pijnu.tests.test_until import until_grammar
+from pijnu.tests.test_cut import record_grammar
+from pijnu.tests.test_regex import identifier_grammar
+
+
+log_grammar = r"""
+test_tail_log
+<definition>
+    SEP         : '\n'                  : drop
+    word        : [a..z]+
+    number      : [0..9]+
+    field       : word / number
+    entry       : field (' ' field)* SEP
+    log         : entry+
+"""
+
+
+def records(parser, source):
+    """(tree view, offset) of records of a full parse, or None."""
+    try:
+        tree = parser.parse(source)
+    except PijnuError:
+        return None
+    if tree.value == Node.NIL:
+        return []
+    return [(node.treeView(), node.start) for node in tree.value]
+
+
+def tailRecords(parser, chunks):
+    """(tree view, offset) of records of a tail parse, or None."""
+    tail = TailParser(parser)
+    try:
+        nodes = []
+        for chunk in chunks:
+            nodes.extend(tail.feed(chunk))
+        nodes.extend(tail.close())
+    except PijnuError:
+        return None
+    return [(node.treeView(), node.offset) for node in nodes]
+
+
+class TailTests(ParserTestCase):
+    """Tests for parsing text appended to a growing source"""
+
+    def test_random_chunks(self):
+        """Records are the ones of a full parse, however text is split."""
+        random = Random(3)
+        for (grammar, pieces) in [
+                (log_grammar, ["ab 1\n", "x\n", "12 c d\n"]),
+                (record_grammar, ["a=1\n", "bc=22\n", "ab\n"]),
+                (until_grammar, ["**ab c**", "//abc//", "12,", "ab "])]:
+            parser = makeParser(grammar)()
+            for turn in range(50):
+                source = "".join(random.choice(pieces)
+                                 for i in range(random.randint(0, 8)))
+                if random.random() < 0.3:
+                    pos = random.randint(0, len(source))
+                    source = source[:pos] + random.choice(" a1\n*") \
+                             + source[pos + 1:]
+                (chunks, pos) = ([], 0)
+                while pos < len(source):
+                    size = random.randint(0, 6)
+                    chunks.append(source[pos:pos + size])
+                    pos += size
+                self.assertEquals(tailRecords(parser, chunks),
+                                  records(parser, source))
+
+    def test_commit(self):
+        """Records are yielded once text appended cannot change them."""
+        parser = makeParser(log_grammar)()
+        tail = TailParser(parser)
+        [node] = tail.feed("ab 1\ncd 2")
+        self.assertEquals(node.treeView(),
+                          parser.entry.parse("ab 1\n").treeView())
+        self.assertEquals((tail.pending, tail.offset, tail.count),
+                          ("cd 2", 5, 1))
+        self.assertEquals(tail.feed("3"), [])
+        [node] = tail.feed("\nef")
+        self.assertEquals((node.offset, node.start, node.snippet),
+                          (5, 0, "cd 23\n"))
+        self.assertEquals(tail.pending, "ef")
+        [node] = tail.feed(" 4\n")
+        self.assertEquals((node.offset, tail.count), (11, 3))
+        self.assertEquals(tail.close(), [])
+        self.assertRaises(ValueError, tail.feed, "x")
+
+    def test_errors(self):
+        """Failures are raised as soon as text appended cannot fix them."""
+        parser = makeParser(log_grammar)()
+        tail = TailParser(parser)
+        tail.feed("ab 1\n")
+        try:
+            tail.feed("cd 2\nab -1\n")
+        except IncompleteParse, error:
+            # with records completed before the failure
+            self.assertEquals([node.offset for node in error.records], [5])
+        else:
+            self.fail()
+        self.assertRaises(ValueError, tail.close)
+        # left pending until the end of text
+        tail = TailParser(parser)
+        self.assertEquals(len(tail.feed("ab 1\ncd ")), 1)
+        self.assertRaises(IncompleteParse, tail.close)
+        # no record at all, for 'entry+'
+        self.assertRaises(MatchFailure, TailParser(parser).close)
+        self.assertRaises(TypeError, TailParser,
+                          makeParser(identifier_grammar)())
+
+    def test_iterparse(self):
+        """Records of a file are yielded, read in chunks."""
+        parser = makeParser(log_grammar)()
+        source = "ab 1\ncd 22 e\n" * 500
+        expected = records(parser, source)
+        nodes = list(parser.iterparse(StringIO(source), 100))
+        self.assertEquals([(node.treeView(), node.offset) for node in nodes],
+                          expected)
+        # records hold the text of one chunk only
+        self.assertTrue(max(len(node.source) for node in nodes) < 120)
+        # errors are raised once final
+        stream = parser.iterparse(StringIO("ab 1\ncd -\n" + source), 10)
+        self.assertEquals(stream.next().snippet, "ab 1\n")
+        self.assertRaises(IncompleteParse, stream.next)
+        other = makeParser(identifier_grammar)()
+        self.assertRaises(TypeError, other.iterparse, StringIO(source))
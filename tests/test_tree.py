@@ -0,0 +1,75 @@
+from pijnu.tests import ParserTestCase
+from pijnu import makeParser
+from pijnu.library import Tree, Node
+from pijnu.tests.test_machine import wiki_inline_grammar, nesting_grammar
+
+
+tree_grammar = r"""
+test_tree_items
+<toolset>
+def toInt(node):
+    node.value = int(node.value)
+<definition>
+    SEP         : ' '                   : drop
+    word        : [a..z]+
+    number      : [0..9]+               : toInt
+    pair        : word SEP number
+    item        : pair / word
+    items       : item (SEP item)*      : extract
+"""
+
+
+class TreeTests(ParserTestCase):
+    """Tests for parse trees stored as parallel arrays"""
+
+    def test_same_tree_view(self):
+        """Tree views show the same tree as nodes do."""
+        parser = makeParser(tree_grammar)()
+        source = "ab cd 12 ef gh 3"
+        node = parser.parse(source)
+        tree = Tree(node)
+        self.assertEquals(tree.treeView(), node.treeView())
+        self.assertEquals(tree.root.leaves(), node.leaves())
+        self.assertEquals(len(tree), 12)
+
+    def test_recursive_tree(self):
+        """Deeply nested trees are stored without recursion."""
+        parser = makeParser(wiki_inline_grammar)()
+        source = "abc //def **gh** i// j~*"
+        self.assertEquals(parser.parseTree(source).treeView(),
+                          parser.parse(source).treeView())
+
+    def test_deep_tree(self):
+        """Views of deeply nested trees do not recurse."""
+        parser = makeParser(nesting_grammar)()
+        depth = 3000
+        node = parser.compile().parse("(" * depth + "a" + ")" * depth)
+        tree = Tree(node)
+        self.assertEquals(tree.treeView(), node.treeView())
+        self.assertEquals(tree.root.leaves(), node.leaves())
+        self.assertEquals(repr(tree.root), repr(node))
+
+    def test_views(self):
+        """Node views give tags, spans, values & links."""
+        parser = makeParser(tree_grammar)()
+        tree = parser.parseTree("ab cd 12")
+        root = tree.root
+        self.assertEquals([child.tag for child in root], ["word", "<?>"])
+        pair = root[1][0]
+        self.assertEquals((pair.start, pair.end, pair.snippet),
+                          (3, 8, "cd 12"))
+        self.assertEquals(pair.kind, Node.BRANCH)
+        self.assertEquals([child.value for child in pair], ["cd", 12])
+        self.assertEquals(pair[0].parent, pair)
+        self.assertTrue(root.parent is None)
+
+    def test_spans(self):
+        """Spans are read in bulk, possibly for a single tag."""
+        parser = makeParser(tree_grammar)()
+        tree = parser.parseTree("ab cd 12 ef")
+        self.assertEquals(list(tree.spans("word")),
+                          [(0, 2), (3, 5), (9, 11)])
+        self.assertEquals(list(tree.spans("number")), [(6, 8)])
+        self.assertEquals(list(tree.spans())[:2],
+                          [("items", 0, 11), ("word", 0, 2)])
+        self.assertEquals(list(tree.spans("nothing")), [])
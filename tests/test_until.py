@@ -0,0 +1,147 @@
+from warnings import catch_warnings, simplefilter
+from pijnu.tests import ParserTestCase
+from pijnu import makeParser
+from pijnu.library import (Word, Char, Klass, String, Sequence, Choice,
+                           ZeroOrMore, OneOrMore, Repetition, Next, NextNot,
+                           Until, Pattern, Node, PijnuError, MatchFailure)
+from pijnu.tests.test_rule_functions import makeRuleParsers
+from pijnu.tests.test_regex import plainParser
+
+
+until_grammar = r"""
+test_until_markup
+<definition>
+    STAR        : "**"
+    SLASH       : "//"
+    markup      : STAR / SLASH
+    letter      : [a..z  A..Z  \x20]
+    bold        : STAR letter+>STAR                 : join
+    italic      : SLASH letter{1..5}>(&SLASH) SLASH : join
+    number      : [0..9]+>[.,]                      : join
+    names       : ([a..z]+ ' ')*>"end"              : join
+    text        : [a..z  \x20]+>(&markup / &'.')    : join
+    item        : bold / italic / number / names / text
+    items       : item+
+"""
+
+# the same grammar, without until
+lookahead_grammar = r"""
+test_until_lookahead
+<definition>
+    STAR        : "**"
+    SLASH       : "//"
+    markup      : STAR / SLASH
+    letter      : [a..z  A..Z  \x20]
+    bold        : STAR (!STAR letter)+ STAR                 : join
+    italic      : SLASH (!SLASH letter){1..5} &SLASH SLASH  : join
+    number      : (![.,] [0..9])+ [.,]                      : join
+    names       : (!"end" [a..z]+ ' ')* "end"               : join
+    text        : (!(&markup / &'.') [a..z  \x20])+ (&markup / &'.')    : join
+    item        : bold / italic / number / names / text
+    items       : item+
+"""
+
+SOURCES = ["**ab c**", "//abc//12,", "ab cd end", "**ab**//a b//9.",
+           "abc **d**9.", u"ab **cd**"]
+
+
+class UntilTests(ParserTestCase):
+    """Tests for repetitions with a stop condition"""
+
+    def tearDown(self):
+        Pattern.CHAR_MAP = False
+
+    def test_same_as_lookahead(self):
+        """Until yields the values of its lookahead equivalent."""
+        parser = makeParser(until_grammar)()
+        plain = plainParser(until_grammar, "test_until_markup")
+        other = makeParser(lookahead_grammar)()
+        for source in SOURCES + ["**ab", "12", "ab cd", "//abcdef//"]:
+            try:
+                expected = [node.value for node in other.parse(source)]
+            except PijnuError, error:
+                self.assertRaises(type(error), parser.parse, source)
+                self.assertRaises(type(error), plain.parse, source)
+            else:
+                self.assertEquals([node.value for node in
+                                   parser.parse(source)], expected)
+                self.assertEquals([node.value for node in
+                                   plain.parse(source)], expected)
+
+    def test_engines(self):
+        """Patterns, regexes, machine & rule functions yield the same trees."""
+        (parser, ruleParser) = makeRuleParsers(until_grammar)
+        plain = plainParser(until_grammar, "test_until_markup")
+        machine = parser.compile()
+        self.assertTrue(parser.names.regex is not None)
+        for source in SOURCES:
+            tree = parser.parse(source).treeView()
+            self.assertEquals(plain.parse(source).treeView(), tree)
+            self.assertEquals(machine.parse(source).treeView(), tree)
+            self.assertEquals(ruleParser.parse(source).treeView(), tree)
+            Pattern.CHAR_MAP = True
+            self.assertEquals(plain.parse(source).treeView(), tree)
+            Pattern.CHAR_MAP = False
+
+    def test_stops(self):
+        """Words, chars, klasses & other patterns stop repetitions."""
+        (letters, digit) = (String(Klass("a..z"), numMin=0), Klass("0..9"))
+        for (stop, source, snippets) in [
+                (Word("end"), "abcendx", ["abc", "end"]),
+                (Char("x"), "abcx", ["abc", "x"]),
+                (Choice([Word("yz"), Word("cd")]), "abcdyz", ["ab", "cd"]),
+                (Next(Word("cd")), "abcd", ["ab"]),
+                (Klass("c..e"), "abcd", ["ab", "c"]),
+                (digit, "ab1", ["ab", "1"]),
+                (Sequence([Char("c"), digit]), "abcc1", ["abc", "c1"]),
+                (Word("end"), "end", ["end"])]:
+            node = Until(letters, stop).match(source)
+            self.assertEquals([child.snippet for child in node], snippets)
+        # stop must match where repetition stops
+        for (stop, source) in [(Word("end"), "ab1end"), (Char("x"), "abc"),
+                               (Klass("c..e"), "ab1")]:
+            self.assertRaises(PijnuError, Until(letters, stop).match,
+                              source)
+
+    def test_repetitions(self):
+        """Numbers of repetitions are checked before stop."""
+        (ab, letter) = (Word("ab"), Klass("a..z"))
+        halt = Word("HALT")
+        for (repetition, source, count) in [
+                (ZeroOrMore(ab), "ababHALT", 2),
+                (OneOrMore(ab), "abHALT", 1),
+                (Repetition(ab, numMin=2, numMax=3), "ababHALT", 2),
+                (String(letter, numMin=1, numMax=3), "abcHALT", 3)]:
+            node = Until(repetition, halt).match(source)
+            self.assertEquals(len(node[0].value), count)
+            self.assertEquals(node.end, len(source))
+        for (repetition, source) in [
+                (OneOrMore(ab), "HALT"),
+                (Repetition(ab, numMin=2, numMax=3), "ababababHALT"),
+                (String(letter, numMin=2), "aHALT"),
+                (String(letter, numMax=2), "abcHALT")]:
+            self.assertRaises(PijnuError, Until(repetition, halt).match,
+                              source)
+
+    def test_literal_search(self):
+        """The next literal stop is searched again for another source."""
+        until = Until(String(Klass("a..z  \x20")), Word("."))
+        self.assertEquals(until.findAll("ab. cd. ef.")[1].snippet, " cd.")
+        self.assertEquals(until.match("xyz.").end, 4)
+        self.assertRaises(PijnuError, until.match, "xyz")
+        self.assertEquals(until.match(u"ab.").end, 3)
+        # a non-ascii str word never matches a unicode source
+        until = Until(String(Klass("a..z")), Word("\xe9"))
+        with catch_warnings():
+            simplefilter("ignore", UnicodeWarning)
+            self.assertRaises(MatchFailure, until.match, u"ab\xe9")
+
+    def test_failures(self):
+        """Errors tell the stop & the item expected."""
+        parser = makeParser(until_grammar)()
+        try:
+            parser.bold.match("**ab1")
+        except MatchFailure, error:
+            self.assertTrue("Expected:   STAR  /  letter" in str(error))
+        else:
+            self.fail()
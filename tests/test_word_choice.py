@@ -0,0 +1,57 @@
+from pijnu.tests import ParserTestCase
+from pijnu import makeParser
+from pijnu.library import (Word, Choice, WordChoice, Invalidation,
+                           MatchFailure)
+
+
+keyword_grammar = r"""
+test_word_choice_keywords
+<toolset>
+def notElse(node):
+    if node.value == "else":
+        raise Invalidation("no else here")
+<definition>
+    SEP         : ' '                               : drop
+    DISTINCT    : "//"                              : drop
+    IMPORTANT   : "**"
+    code        : DISTINCT / IMPORTANT / "!!"
+    keyword     : "if" / "else" / "elif" / "e"      : notElse
+    name        : [a..z]+
+    token       : code / keyword / name
+    tokens      : token (SEP token)*                : extract
+"""
+
+
+class WordChoiceTests(ParserTestCase):
+    """Tests for choices of words held in a trie"""
+
+    def test_yielded(self):
+        """A choice of words yields a WordChoice, which is a Choice."""
+        choice = Choice([Word("ab"), Word("c")])
+        self.assertTrue(isinstance(choice, WordChoice))
+        self.assertTrue(isinstance(choice, Choice))
+        parser = makeParser(keyword_grammar)()
+        self.assertTrue(isinstance(parser.code, WordChoice))
+        self.assertFalse(isinstance(parser.token, WordChoice))
+
+    def test_ordered_choice(self):
+        """The first listed matching word is chosen."""
+        (a, ab) = (Word("a", name="a"), Word("ab", name="ab"))
+        self.assertEquals(Choice([a, ab]).match("abc").tag, "a")
+        self.assertEquals(Choice([ab, a]).match("abc").tag, "ab")
+        self.assertEquals(Choice([ab, a]).match("acb").tag, "a")
+        self.assertRaises(MatchFailure, Choice([ab, a]).match, "b")
+
+    def test_same_trees(self):
+        """Word nodes & actions are the same as with a standard choice."""
+        parser = makeParser(keyword_grammar)()
+        machine = parser.compile()
+        source = "// ** !! if elif e x"
+        self.assertEquals(parser.parse(source).treeView(),
+                          machine.parse(source).treeView())
+        self.assertEquals(parser.parse(source).leaves(), "**!!ifelifex")
+
+    def test_invalidation(self):
+        """A word invalidated by an action lets next words be tried."""
+        parser = makeParser(keyword_grammar)()
+        self.assertEquals(parser.keyword.match("else").value, "e")